@@ -0,0 +1,90 @@
+"""
+Throughput of the transcription service with concurrent uploads, and the cost of switching models.
+
+Uses the service's ModelCache and JobQueue in process (no HTTP), so the
+numbers are the CPU cost of transcription and model loading alone.
+
+    python bench_transcriber.py --audio ../Chatbot/final.wav --sizes tiny base --uploads 8 --workers 1 2 4
+    TRANSCRIBE_ENGINE=stub python bench_transcriber.py     # offline, simulated models
+
+1. Model switching: load time per size (cold), a cache hit, and a reload
+   after eviction when only one model fits.
+2. Throughput: --uploads jobs submitted at once, for each worker count,
+   with the cores split between workers. Reports wall time, audio seconds
+   transcribed per second and per-job latency. The stub sleeps instead of
+   using the CPU, so its scaling with workers is an upper bound.
+3. Mixed sizes: uploads alternating between the first two sizes with room
+   for one model against room for two, which is what the LRU cache saves.
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import wait
+
+from job_queue import Job, JobQueue
+from transcriber import TRANSCRIBE_ENGINE, ModelCache, transcribe
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run_batch(cache, audio, sizes, uploads, workers):
+    """Submits uploads jobs at once (sizes taken in turn); returns (wall seconds, audio seconds, latencies)."""
+    durations = []
+
+    def run_job(job):
+        segments, info = transcribe(cache.get(job.model_size), job.audio_path, job.language)
+        durations.append(info.duration)
+        return {}
+
+    jobs = JobQueue(run_job, workers=workers, max_pending=uploads)
+    start = time.perf_counter()
+    submitted = [jobs.submit(Job(audio, audio, sizes[i % len(sizes)], 30, "en")) for i in range(uploads)]
+    wait([job.future for job in submitted])
+    wall = time.perf_counter() - start
+    return wall, sum(durations), [job.finished - job.created for job in submitted]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", default=TRANSCRIBE_ENGINE)
+    parser.add_argument("--audio", default=os.path.join("..", "Chatbot", "final.wav"))
+    parser.add_argument("--sizes", nargs="+", default=["tiny", "base"])
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+    print(f"engine {args.engine}, {cores} cores, audio {args.audio}")
+
+    print("\n1. Model switching")
+    cache = ModelCache(args.engine, max_models=1, cpu_threads=cores)
+    for size in args.sizes:
+        print(f"  {size:<9} cold load {timed(lambda: cache.get(size)):7.2f}s   "
+              f"cache hit {timed(lambda: cache.get(size)) * 1e6:6.1f}us")
+    if len(args.sizes) > 1:
+        reload = timed(lambda: cache.get(args.sizes[0]))
+        print(f"  {args.sizes[0]:<9} reload after eviction {reload:.2f}s (max_models=1)")
+
+    print(f"\n2. Throughput, {args.uploads} concurrent uploads, model {args.sizes[0]}")
+    print(f"  {'workers':>7}{'wall s':>9}{'audio s/s':>11}{'p50 latency s':>15}{'max latency s':>15}")
+    for workers in args.workers:
+        cache = ModelCache(args.engine, max_models=1, cpu_threads=max(1, cores // workers))
+        cache.get(args.sizes[0])
+        wall, audio_seconds, latencies = run_batch(cache, args.audio, args.sizes[:1], args.uploads, workers)
+        print(f"  {workers:>7}{wall:>9.2f}{audio_seconds / wall:>11.1f}"
+              f"{statistics.median(latencies):>15.2f}{max(latencies):>15.2f}")
+
+    if len(args.sizes) > 1:
+        print(f"\n3. Mixed sizes ({args.sizes[0]}/{args.sizes[1]} alternating), 1 worker")
+        for max_models in (1, 2):
+            cache = ModelCache(args.engine, max_models=max_models, cpu_threads=cores)
+            wall, _, _ = run_batch(cache, args.audio, args.sizes[:2], args.uploads, 1)
+            print(f"  max_models={max_models}: {wall:.2f}s wall, {cache.loads} loads, {cache.evictions} evictions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    """One transcription request and where it has got to."""
+
+    def __init__(self, filename, audio_path, model_size, chunk_minutes, language):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.audio_path = audio_path
+        self.model_size = model_size
+        self.chunk_minutes = chunk_minutes
+        self.language = language
+        self.status = "queued"
+        self.progress = 0.0
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.future = Future()
+
+    def to_dict(self):
+        """
+        The job as the API returns it: "state" is queued, running, done or
+        failed; "status" is the line the TranscribeView shows.
+        """
+        status = {
+            "queued": "Queued",
+            "running": f"Transcribing ({self.progress:.0%})",
+            "failed": f"Failed: {self.error}",
+        }.get(self.status, "Done")
+        data = {
+            "job_id": self.id,
+            "filename": self.filename,
+            "model_size": self.model_size,
+            "state": self.status,
+            "status": status,
+            "progress": round(self.progress, 3),
+        }
+        if self.started is not None:
+            data["queued_seconds"] = round(self.started - self.created, 2)
+        if self.finished is not None:
+            data["run_seconds"] = round(self.finished - self.started, 2)
+        if self.result is not None:
+            data.update(self.result)
+        return data
+
+
+class JobQueue:
+    """
+    Runs jobs on a fixed number of worker threads, first come first served.
+
+    At most max_pending jobs wait; submit() raises QueueFull beyond that, so
+    uploads are turned away instead of piling up behind hours of audio.
+    Finished jobs are kept (the latest keep_finished of them) so their status
+    can still be read.
+    """
+
+    def __init__(self, run_job, workers=1, max_pending=16, keep_finished=200):
+        self.run_job = run_job
+        self.workers = workers
+        self.keep_finished = keep_finished
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"transcribe-worker-{i}", daemon=True).start()
+
+    def submit(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        try:
+            self._pending.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+                self.rejected += 1
+            raise QueueFull(f"{self._pending.maxsize} transcriptions are already waiting; try again later")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job):
+        """How many jobs are ahead of a queued job (0 once it is running)."""
+        with self._lock:
+            if job.status != "queued":
+                return 0
+            return sum(1 for other in self._jobs.values() if other.status == "queued" and other.created < job.created)
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._pending.get()
+            job.status = "running"
+            job.started = time.time()
+            failure = None
+            try:
+                job.result = self.run_job(job)
+                job.status = "done"
+                job.progress = 1.0
+                with self._lock:
+                    self.completed += 1
+            except Exception as e:
+                logger.exception(f"Transcription job {job.id} failed")
+                failure = e
+                job.error = str(e) or type(e).__name__
+                job.status = "failed"
+                with self._lock:
+                    self.failed += 1
+            job.finished = time.time()
+            if failure is None:
+                job.future.set_result(job)
+            else:
+                job.future.set_exception(failure)
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == "running")
+            return {
+                "workers": self.workers,
+                "queued": self._pending.qsize(),
+                "max_pending": self._pending.maxsize,
+                "running": running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
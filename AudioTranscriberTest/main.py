@@ -0,0 +1,161 @@
+"""
+Batch transcription service behind the frontend's TranscribeView.
+
+    pip install -r requirements.txt
+    uvicorn main:app --port 8000
+
+Uploads are transcribed on the CPU by local Whisper models (faster-whisper),
+one job per worker, with the models kept loaded between jobs. POST
+/transcribe/ waits for the transcript (what the view does); POST /jobs/
+returns at once and GET /jobs/{job_id} reports progress.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse
+
+from job_queue import Job, JobQueue, QueueFull
+from transcriber import MODEL_SIZES, ModelCache, UnreadableAudio, format_timestamp, format_transcript, transcribe
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = os.environ.get("TRANSCRIBE_UPLOAD_DIR", "uploads")
+OUTPUT_DIR = os.environ.get("TRANSCRIBE_OUTPUT_DIR", "transcripts")
+# Whisper is CPU-bound, so one worker that uses every core is usually fastest;
+# more workers share the cores and let short jobs overtake long ones.
+TRANSCRIBE_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", "1"))
+TRANSCRIBE_MAX_PENDING = int(os.environ.get("TRANSCRIBE_MAX_PENDING", "8"))
+TRANSCRIBE_CPU_THREADS = max(1, (os.cpu_count() or 1) // TRANSCRIBE_WORKERS)
+# Matches the limit shown in the view.
+MAX_UPLOAD_BYTES = int(os.environ.get("TRANSCRIBE_MAX_UPLOAD_BYTES", str(800 * 1024 * 1024)))
+CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "*").split(",")
+
+model_cache = ModelCache(cpu_threads=TRANSCRIBE_CPU_THREADS)
+
+
+def run_job(job):
+    """Transcribes a queued upload, writes the transcript file and returns the response fields."""
+    try:
+        start = time.perf_counter()
+        model = model_cache.get(job.model_size)
+        loaded = time.perf_counter()
+
+        def on_progress(fraction):
+            job.progress = fraction
+
+        segments, info = transcribe(model, job.audio_path, job.language, on_progress)
+        done = time.perf_counter()
+    finally:
+        os.remove(job.audio_path)
+
+    transcript = format_transcript(segments, job.chunk_minutes, info.duration)
+    stem = os.path.splitext(os.path.basename(job.filename))[0] or "audio"
+    name = f"{stem}_{job.id[:8]}.md"
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    # Written under a temporary name so a download never sees a partial file.
+    fd, tmp_path = tempfile.mkstemp(dir=OUTPUT_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(transcript)
+    os.replace(tmp_path, os.path.join(OUTPUT_DIR, name))
+
+    return {
+        "transcript": transcript,
+        "output_file": f"{OUTPUT_DIR}/{name}",
+        "status": (
+            f"Transcribed {format_timestamp(info.duration)} of {info.language} audio "
+            f"with Whisper {job.model_size} in {done - start:.1f}s"
+        ),
+        "timings": {
+            "model_load_ms": round((loaded - start) * 1000, 1),
+            "transcribe_ms": round((done - loaded) * 1000, 1),
+            "audio_seconds": round(info.duration, 1),
+        },
+    }
+
+
+job_queue = JobQueue(run_job, workers=TRANSCRIBE_WORKERS, max_pending=TRANSCRIBE_MAX_PENDING)
+
+app = FastAPI(title="Audio Transcriber")
+app.add_middleware(CORSMiddleware, allow_origins=CORS_ORIGINS, allow_methods=["*"], allow_headers=["*"])
+
+
+def _save_upload(audio_file):
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, uuid.uuid4().hex + os.path.splitext(audio_file.filename or "")[1].lower())
+    with open(path, "wb") as f:
+        shutil.copyfileobj(audio_file.file, f, 1024 * 1024)
+    if os.path.getsize(path) > MAX_UPLOAD_BYTES:
+        os.remove(path)
+        raise HTTPException(status_code=413, detail=f"Audio files are limited to {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    return path
+
+
+async def _queue_job(audio_file, model_size, chunk_minutes, language):
+    if model_size not in MODEL_SIZES:
+        raise HTTPException(status_code=400, detail=f"Unknown model size: {model_size}")
+    if chunk_minutes < 1:
+        raise HTTPException(status_code=400, detail="chunk_minutes must be at least 1")
+    path = await asyncio.to_thread(_save_upload, audio_file)
+    job = Job(audio_file.filename or "audio", path, model_size, chunk_minutes, language)
+    try:
+        return job_queue.submit(job)
+    except QueueFull as e:
+        os.remove(path)
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.post("/transcribe/")
+async def transcribe_audio(
+    audio_file: UploadFile = File(...),
+    model_size: str = Form("base"),
+    chunk_minutes: int = Form(30),
+    language: str = Form("en"),
+):
+    job = await _queue_job(audio_file, model_size, chunk_minutes, language)
+    try:
+        await asyncio.wrap_future(job.future)
+    except UnreadableAudio as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception:
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {job.error}")
+    return job.to_dict()
+
+
+@app.post("/jobs/", status_code=202)
+async def submit_job(
+    audio_file: UploadFile = File(...),
+    model_size: str = Form("base"),
+    chunk_minutes: int = Form(30),
+    language: str = Form("en"),
+):
+    job = await _queue_job(audio_file, model_size, chunk_minutes, language)
+    return {**job.to_dict(), "queue_position": job_queue.position(job)}
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return {**job.to_dict(), "queue_position": job_queue.position(job)}
+
+
+@app.get("/download/{filename}")
+def download(filename: str):
+    path = os.path.join(OUTPUT_DIR, filename)
+    if os.path.basename(filename) != filename or not filename.endswith(".md") or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Transcript not found")
+    return FileResponse(path, media_type="text/markdown", filename=filename)
+
+
+@app.get("/metrics")
+def metrics():
+    return {"jobs": job_queue.stats(), "models": model_cache.stats()}
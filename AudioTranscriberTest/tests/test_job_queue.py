@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from job_queue import Job, JobQueue, QueueFull
+
+
+def make_job(name="talk.wav"):
+    return Job(name, f"/uploads/{name}", "tiny", 10, None)
+
+
+def test_jobs_run_and_report_their_result():
+    jobs = JobQueue(lambda job: {"transcript": f"text of {job.filename}"})
+    job = jobs.submit(make_job())
+    assert job.future.result(timeout=5) is job
+    data = job.to_dict()
+    assert (data["state"], data["status"], data["progress"]) == ("done", "Done", 1.0)
+    assert data["transcript"] == "text of talk.wav"
+    assert "queued_seconds" in data and "run_seconds" in data
+    assert jobs.get(job.id) is job
+    assert jobs.stats()["completed"] == 1
+
+
+def test_a_failed_job_keeps_its_exception():
+    def run_job(job):
+        raise ValueError("not audio")
+
+    jobs = JobQueue(run_job)
+    job = jobs.submit(make_job())
+    with pytest.raises(ValueError, match="not audio"):
+        job.future.result(timeout=5)
+    assert job.to_dict()["status"] == "Failed: not audio"
+    assert jobs.stats()["failed"] == 1
+
+
+def test_jobs_run_in_order_and_report_their_position():
+    release = threading.Event()
+    order = []
+
+    def run_job(job):
+        release.wait(5)
+        order.append(job.filename)
+        return {}
+
+    jobs = JobQueue(run_job, workers=1, max_pending=4)
+    first = jobs.submit(make_job("a.wav"))
+    second, third = jobs.submit(make_job("b.wav")), jobs.submit(make_job("c.wav"))
+    while first.status != "running":
+        time.sleep(0.01)
+    # Only waiting jobs count; the running one is not ahead of anyone.
+    assert [jobs.position(job) for job in (first, second, third)] == [0, 0, 1]
+    assert jobs.stats()["running"] == 1
+    release.set()
+    third.future.result(timeout=5)
+    assert order == ["a.wav", "b.wav", "c.wav"]
+
+
+def test_a_full_queue_rejects_uploads():
+    release = threading.Event()
+    jobs = JobQueue(lambda job: release.wait(5) and {}, workers=1, max_pending=1)
+    running = jobs.submit(make_job("a.wav"))
+    while running.status != "running":
+        time.sleep(0.01)
+    jobs.submit(make_job("b.wav"))
+    rejected = make_job("c.wav")
+    with pytest.raises(QueueFull):
+        jobs.submit(rejected)
+    assert jobs.get(rejected.id) is None
+    assert jobs.stats()["rejected"] == 1
+    release.set()
+
+
+def test_only_the_latest_finished_jobs_are_kept():
+    jobs = JobQueue(lambda job: {}, keep_finished=2)
+    finished = [jobs.submit(make_job(f"{i}.wav")) for i in range(3)]
+    for job in finished:
+        job.future.result(timeout=5)
+    latest = jobs.submit(make_job("new.wav"))
+    latest.future.result(timeout=5)
+    assert jobs.get(finished[0].id) is None
+    assert jobs.get(finished[2].id) is finished[2]
@@ -0,0 +1,86 @@
+import threading
+import wave
+
+import numpy as np
+import pytest
+
+from transcriber import (ModelCache, StubWhisperModel, UnreadableAudio, format_timestamp, format_transcript,
+                         transcribe)
+
+
+def write_silence(path, seconds, rate=16000):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.zeros(int(seconds * rate), dtype="<i2").tobytes())
+    return str(path)
+
+
+def test_models_are_loaded_once_and_reused():
+    cache = ModelCache(engine="stub", max_models=2)
+    model = cache.get("tiny")
+    assert isinstance(model, StubWhisperModel)
+    assert cache.get("tiny") is model
+    stats = cache.stats()
+    assert (stats["loads"], stats["hits"], stats["loaded"]) == (1, 1, ["tiny"])
+
+
+def test_concurrent_requests_for_a_size_share_one_load():
+    cache = ModelCache(engine="stub")
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(cache.get("base"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(model) for model in models}) == 1
+    assert cache.stats()["loads"] == 1
+
+
+def test_the_least_recently_used_model_is_evicted():
+    cache = ModelCache(engine="stub", max_models=2)
+    cache.get("tiny")
+    cache.get("base")
+    cache.get("tiny")
+    cache.get("small")
+    stats = cache.stats()
+    assert stats["loaded"] == ["tiny", "small"]
+    assert stats["evictions"] == 1
+
+
+def test_unknown_sizes_and_engines():
+    with pytest.raises(ValueError, match="Unknown model size"):
+        ModelCache(engine="stub").get("huge")
+    with pytest.raises(ValueError, match="Unknown TRANSCRIBE_ENGINE"):
+        ModelCache(engine="whisper.cpp")
+
+
+def test_transcribe_reports_segments_and_progress(tmp_path):
+    progress = []
+    segments, info = transcribe(StubWhisperModel("tiny"), write_silence(tmp_path / "a.wav", 12),
+                                on_progress=progress.append)
+    assert [(start, end) for start, end, _ in segments] == [(0, 5), (5, 10), (10, 12)]
+    assert progress == pytest.approx([5 / 12, 10 / 12, 1.0])
+    assert info.language == "en"
+
+
+def test_undecodable_uploads_are_unreadable_audio(tmp_path):
+    path = tmp_path / "notes.wav"
+    path.write_bytes(b"not a wav file at all")
+    with pytest.raises(UnreadableAudio, match="Could not decode the audio"):
+        transcribe(StubWhisperModel("tiny"), str(path))
+
+
+def test_format_transcript_groups_segments_by_chunk():
+    segments = [(0, 5, " Hello."), (65, 70, "Still here. "), (130, 131, "Bye.")]
+    assert format_transcript(segments, chunk_minutes=2, duration=131) == (
+        "## Part 1 (00:00:00 - 00:02:00)\n"
+        "[00:00:00] Hello.\n"
+        "[00:01:05] Still here.\n"
+        "\n"
+        "## Part 2 (00:02:00 - 00:02:11)\n"
+        "[00:02:10] Bye.\n"
+    )
+    assert format_transcript([], chunk_minutes=10) == "## Transcript\n(no speech detected)\n"
+    assert format_timestamp(3725.9) == "01:02:05"
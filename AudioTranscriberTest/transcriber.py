@@ -0,0 +1,187 @@
+import logging
+import os
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# faster-whisper (CTranslate2, CPU) or stub (no model, for trying the service and benchmarks offline).
+TRANSCRIBE_ENGINE = os.environ.get("TRANSCRIBE_ENGINE", "faster-whisper")
+# int8 is about 4x smaller and 2-3x faster than float32 on CPU, with little loss in accuracy.
+TRANSCRIBE_COMPUTE_TYPE = os.environ.get("TRANSCRIBE_COMPUTE_TYPE", "int8")
+# How many Whisper models stay loaded; the least recently used is dropped to load another.
+TRANSCRIBE_MAX_MODELS = int(os.environ.get("TRANSCRIBE_MAX_MODELS", "2"))
+TRANSCRIBE_BEAM_SIZE = int(os.environ.get("TRANSCRIBE_BEAM_SIZE", "5"))
+
+MODEL_SIZES = ("tiny", "base", "small", "medium", "large", "large-v2")
+
+
+class UnreadableAudio(ValueError):
+    """The upload isn't audio the engine can decode (a client error, unlike a failing model)."""
+
+
+def _load_faster_whisper(size, cpu_threads):
+    from faster_whisper import WhisperModel
+    return WhisperModel(size, device="cpu", compute_type=TRANSCRIBE_COMPUTE_TYPE, cpu_threads=cpu_threads)
+
+
+class _StubInfo:
+    def __init__(self, duration, language):
+        self.duration = duration
+        self.language = language
+
+
+class _StubSegment:
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+
+
+class StubWhisperModel:
+    """
+    Stands in for WhisperModel without weights: loading and transcribing take
+    time in proportion to the model size, so queueing and caching behave as
+    they would with real models. Reads 16-bit WAV only.
+    """
+
+    # Rough relative cost of each size, from tiny (1) to large (~30).
+    _SCALE = {"tiny": 1, "base": 2, "small": 6, "medium": 15, "large": 30, "large-v2": 30}
+
+    def __init__(self, size, cpu_threads=0):
+        self.scale = self._SCALE[size]
+        time.sleep(0.1 * self.scale)
+
+    def transcribe(self, audio_path, language=None, **kwargs):
+        with wave.open(audio_path) as wav:
+            duration = wav.getnframes() / wav.getframerate()
+
+        def segments():
+            for start in range(0, int(duration), 5):
+                end = min(duration, start + 5)
+                # Real time factor of 0.002 per unit of scale: tiny ~500x, large ~17x.
+                time.sleep((end - start) * 0.002 * self.scale)
+                yield _StubSegment(start, end, f"Stub transcript from {start} to {end:.0f} seconds.")
+
+        return segments(), _StubInfo(duration, language or "en")
+
+
+ENGINES = {"faster-whisper": _load_faster_whisper, "stub": StubWhisperModel}
+
+
+class ModelCache:
+    """
+    Whisper models by size, least recently used evicted beyond max_models.
+
+    Loading a size happens once even when several jobs ask for it at the same
+    time; other sizes can be fetched meanwhile. An evicted model is freed once
+    the jobs still using it finish.
+    """
+
+    def __init__(self, engine=TRANSCRIBE_ENGINE, max_models=TRANSCRIBE_MAX_MODELS, cpu_threads=0):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown TRANSCRIBE_ENGINE: {engine} (expected one of {', '.join(ENGINES)})")
+        self.engine = engine
+        self.max_models = max_models
+        self.cpu_threads = cpu_threads
+        self._models = OrderedDict()
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = {}
+
+    def get(self, size):
+        if size not in MODEL_SIZES:
+            raise ValueError(f"Unknown model size: {size} (expected one of {', '.join(MODEL_SIZES)})")
+        with self._lock:
+            if size in self._models:
+                self._models.move_to_end(size)
+                self.hits += 1
+                return self._models[size]
+            load_lock = self._load_locks.setdefault(size, threading.Lock())
+        with load_lock:
+            with self._lock:
+                # Another job may have loaded it while this one waited.
+                if size in self._models:
+                    self._models.move_to_end(size)
+                    self.hits += 1
+                    return self._models[size]
+            start = time.perf_counter()
+            model = ENGINES[self.engine](size, self.cpu_threads)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Loaded Whisper {size} ({self.engine}) in {elapsed:.1f}s")
+            with self._lock:
+                self._models[size] = model
+                self.loads += 1
+                self.load_seconds[size] = round(elapsed, 2)
+                while len(self._models) > self.max_models:
+                    evicted, _ = self._models.popitem(last=False)
+                    self.evictions += 1
+                    logger.info(f"Evicted Whisper {evicted} from the model cache")
+            return model
+
+    def stats(self):
+        with self._lock:
+            return {
+                "engine": self.engine,
+                "loaded": list(self._models),
+                "max_models": self.max_models,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "load_seconds": dict(self.load_seconds),
+            }
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def format_transcript(segments, chunk_minutes, duration=None):
+    """
+    Transcript text as the TranscribeView renders it: a "## " heading per
+    chunk of chunk_minutes, then one "[hh:mm:ss] text" line per segment.
+    segments is a list of (start, end, text).
+    """
+    chunk_seconds = max(1, chunk_minutes) * 60
+    sections = []
+    current = None
+    for start, end, text in segments:
+        chunk = int(start // chunk_seconds)
+        if chunk != current:
+            current = chunk
+            chunk_end = (chunk + 1) * chunk_seconds if duration is None else min((chunk + 1) * chunk_seconds, duration)
+            # A blank line before every heading but the first.
+            sections.append("\n" if sections else "")
+            sections.append(f"## Part {chunk + 1} ({format_timestamp(chunk * chunk_seconds)} - {format_timestamp(chunk_end)})\n")
+        sections.append(f"[{format_timestamp(start)}] {text.strip()}\n")
+    return "".join(sections) if sections else "## Transcript\n(no speech detected)\n"
+
+
+def transcribe(model, audio_path, language=None, on_progress=None):
+    """
+    Runs the model over audio_path; returns (segments, info) with segments as
+    (start, end, text). on_progress, if given, is called with the fraction of
+    the audio done as segments come out.
+    """
+    try:
+        segment_iter, info = model.transcribe(
+            audio_path,
+            language=None if language in (None, "", "auto") else language,
+            beam_size=TRANSCRIBE_BEAM_SIZE,
+            vad_filter=True,
+        )
+    except (EOFError, wave.Error, ValueError) as e:
+        # The whole file is decoded up front; PyAV's InvalidDataError is a ValueError.
+        raise UnreadableAudio(f"Could not decode the audio: {str(e) or type(e).__name__}") from e
+    segments = []
+    for segment in segment_iter:
+        segments.append((segment.start, segment.end, segment.text))
+        if on_progress is not None and info.duration:
+            on_progress(min(1.0, segment.end / info.duration))
+    return segments, info
@@ -1,14 +1,28 @@
-from flask import Flask, request, jsonify
+import time
+
+# Taken before the heavy imports so cold start covers the whole process.
+PROCESS_START = time.monotonic()
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from dotenv import load_dotenv
-import os
 import json
-from brain_of_the_doctor import chat_with_query
-from mood_detection import text_to_mood
-from voice_of_the_doctor import text_to_speech_with_elevenlabs
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import copy
+import base64
+from brain_of_the_doctor import chat_with_query, stream_chat_with_query, llm_metrics
+from mood_backends import mood_backend_stats, submit_mood
+from tts_service import CRISIS_MESSAGE, start_prerender, tts_service
+from risk_scoring import assess_risk, risk_path_counts, batching_stats, cache_stats
+from model_registry import registry, start_warmup
+from risk_timeline import RiskTimeline
+from session_store import create_session_store
+from history_manager import history_manager
+from emotion_trends import EmotionSeries, TREND_SHIFT_THRESHOLD, TREND_WINDOW, record_mood_report
+from turn_pipeline import TurnPipeline, time_stage
+from speech_pipeline import stream_speech
+from voice_session import VOICE_SAMPLE_RATE, VoiceSession, voice_stats
 
 from flask_cors import CORS
+from flask_sock import Sock
 
 # Load environment variables
 load_dotenv()
@@ -16,15 +30,15 @@ load_dotenv()
 app = Flask(__name__)
 
 CORS(app)
+sock = Sock(app)
 
-# Load MentalBERT and CNN-BiLSTM models (same as in gradio_app.py)
-hf_token = os.environ.get("HF_TOKEN")
-
-mental_tokenizer = AutoTokenizer.from_pretrained("mental/mental-bert-base-uncased", token=hf_token)
-mental_model = AutoModelForSequenceClassification.from_pretrained("mental/mental-bert-base-uncased", token=hf_token)
+# Bring up the risk models according to MODEL_WARMUP (background by default)
+start_warmup()
+# Render the crisis message and greetings into the TTS cache in the background
+start_prerender()
 
-cnn_tokenizer = AutoTokenizer.from_pretrained("AventIQ-AI/distilbert-mental-health-prediction", token=hf_token)
-cnn_model = AutoModelForSequenceClassification.from_pretrained("AventIQ-AI/distilbert-mental-health-prediction", token=hf_token)
+# Seconds from process start to the first successfully served /chat
+cold_start = {"first_chat_seconds": None}
 
 # System message for the chatbot
 SYSTEM_MESSAGE = {
@@ -37,127 +51,359 @@ SYSTEM_MESSAGE = {
     )
 }
 
-# Risk analysis functions (copied from gradio_app.py)
-def analyze_mental_state(text):
-    inputs = mental_tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-    outputs = mental_model(**inputs)
-    probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-    distress_prob = probs[0][1].item()
-    return distress_prob
-
-def analyze_suicide_tendencies(text):
-    inputs = cnn_tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-    outputs = cnn_model(**inputs)
-    probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-    suicide_risk = probs[0][1].item()
-    return suicide_risk
-
-def combined_risk_score(text, mental_scale=1.0, suicide_threshold=0.5, boost_value=0.8):
-    critical_keywords = ["self harm", "suicide", "kill myself", "end my life", "life has no meaning"]
-    text_lower = text.lower()
-    if any(keyword in text_lower for keyword in critical_keywords):
-        return boost_value
-    mental_score = analyze_mental_state(text) * mental_scale
-    suicide_score = analyze_suicide_tendencies(text)
-    if suicide_score >= suicide_threshold:
-        combined = suicide_score
-    else:
-        combined = (mental_score + suicide_score) / 2
-    return combined
-
 WINDOW_SIZE = 5
 RISK_THRESHOLD = 0.7
+CHAT_MODEL = "llama-3.2-11b-vision-preview"
+# How long /tts/<key> waits for audio that is still being synthesised
+TTS_SERVE_TIMEOUT_SECONDS = 30
 
-def update_risk_window(window, new_score, window_size=WINDOW_SIZE):
-    window.append(new_score)
-    if len(window) > window_size:
-        window.pop(0)
-    avg_score = sum(window) / len(window)
-    return window, avg_score
-
-def process_mood_report(report_str):
-    lines = report_str.strip().splitlines()
-    if len(lines) < 2:
-        return "Invalid mood report format"
-    header = lines[0]
-    data_line = lines[1]
-    header_fields = header.split(",")
-    data_fields = data_line.split(",")
-    emotions = header_fields[2:]
-    try:
-        scores = [float(x) for x in data_fields[2:]]
-    except ValueError:
-        return "Error parsing mood scores"
-    top_indices = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:3]
-    top_emotions = []
-    for idx in top_indices:
-        emotion = emotions[idx]
-        percentage = scores[idx] * 100
-        top_emotions.append(f"{emotion}: {percentage:.2f}%")
-    return ", ".join(top_emotions)
-
-# Conversation state management (in-memory for simplicity; consider a database for production)
-conversation_states = {}
 
-@app.route('/chat', methods=['POST'])
-def chat():
-    data = request.get_json()
-    user_id = data.get('user_id', 'default')  # Unique identifier for each user session
-    user_message = data.get('message', '').strip()
+# Conversation state per user (messages, risk timeline, emotion series). SESSION_STORE picks the backend;
+# the default SQLite store is shared by every worker process and survives restarts.
+session_store = create_session_store()
 
-    if not user_message:
-        return jsonify({'error': 'No message provided'}), 400
+# Mood analysis and risk scoring run concurrently for every turn
+turn_pipeline = TurnPipeline(
+    mood_submit=submit_mood,
+    risk_fn=assess_risk,
+)
 
-    # Initialize conversation state if not exists
-    if user_id not in conversation_states:
-        conversation_states[user_id] = {"messages": [SYSTEM_MESSAGE], "risk_window": []}
-    
-    state = conversation_states[user_id]
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return jsonify({'status': 'alive', 'uptime_seconds': round(time.monotonic() - PROCESS_START, 3)}), 200
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: every risk model has finished loading and warming up."""
+    status = registry.status()
+    status['first_chat_seconds'] = cold_start['first_chat_seconds']
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Counters for the risk scoring pipeline, session store and LLM gateway."""
+    return jsonify({
+        'risk_paths': risk_path_counts(),
+        'risk_batching': batching_stats(),
+        'risk_cache': cache_stats(),
+        'sessions': session_store.metrics(),
+        'llm': llm_metrics(),
+        'turn_pipeline': turn_pipeline.stats(),
+        'tts': tts_service.stats(),
+        'mood': mood_backend_stats(),
+        'voice': voice_stats(),
+    }), 200
+
+@app.route('/risk/<user_id>/history', methods=['GET'])
+def risk_history(user_id):
+    """A user's risk score history and running averages, for the clinician side."""
+    state = session_store.get(user_id)
+    timeline = state.get("risk_timeline") if state else None
+    if timeline is None:
+        return jsonify({'error': 'No risk history for this user'}), 404
+    since = request.args.get('since', type=float)
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        'user_id': user_id,
+        'summary': timeline.summary(),
+        'history': timeline.query(since=since, limit=limit),
+    }), 200
+
+def audio_url(text):
+    """Starts synthesising text in the background and returns the URL it will be served from."""
+    key, _ = tts_service.submit(text)
+    return f"/tts/{key}.{tts_service.extension}"
+
+@app.route('/tts/<key>.<ext>', methods=['GET'])
+def tts_audio(key, ext):
+    """Serves synthesised speech, waiting for it if it is still being rendered."""
+    try:
+        audio = tts_service.lookup(key, timeout=TTS_SERVE_TIMEOUT_SECONDS)
+    except Exception as e:
+        return jsonify({'error': f'Speech synthesis failed: {e}'}), 502
+    if audio is None:
+        return jsonify({'error': 'Unknown or expired audio'}), 404
+    return Response(audio, mimetype=tts_service.mimetype, headers={'Cache-Control': 'public, max-age=86400'})
 
-    # Mood analysis
-    mood_report_raw = text_to_mood(user_message)
-    processed_mood = process_mood_report(mood_report_raw)
-    state["messages"].append({"role": "system", "content": f"Mood Report: {processed_mood}"})
+def start_turn(user_id, state, user_message):
+    """
+    Runs mood analysis and risk assessment for a new user message (in
+    parallel, see turn_pipeline) and appends it, with any mood report / alert
+    notes, to state["messages"].
+
+    Returns (prompt messages for the LLM, metadata for the response).
+    """
+    analysis = turn_pipeline.analyze(user_id, user_message)
+
+    # Mood reports: late ones for earlier messages, then this message's if it made its budget
+    for report in analysis.carried_moods:
+        record_mood_report(state, report, note=" (previous message)")
+    mood_summary, emotions = None, None
+    if analysis.mood is not None:
+        mood_summary, emotions = record_mood_report(state, analysis.mood)
 
     # Risk assessment
-    risk_score = combined_risk_score(user_message)
-    window, avg_risk = update_risk_window(state["risk_window"], risk_score)
-    state["risk_window"] = window
+    risk = analysis.risk
+    risk_score = risk["score"]
+    timeline = state["risk_timeline"]
+    avg_risk = timeline.add(risk_score)
 
+    crisis_audio_url = None
     if avg_risk >= RISK_THRESHOLD:
         alert_msg = "CRITICAL ALERT: High suicide risk detected. Immediate intervention is recommended."
         state["messages"].append({"role": "system", "content": alert_msg})
+        # Pre-rendered at startup, so this is normally a cache hit
+        crisis_audio_url = audio_url(CRISIS_MESSAGE)
 
     # Add user message
     state["messages"].append({"role": "user", "content": user_message})
 
-    # Get doctor response
-    doctor_response = chat_with_query(
-        messages=state["messages"],
-        model="llama-3.2-11b-vision-preview"
-    )
+    # Compacted, token-budgeted view of the history for the LLM
+    prompt_messages, prompt_tokens = history_manager.build_prompt(state)
+    meta = {
+        'mood_report': mood_summary,
+        'emotions': emotions,
+        'carried_mood_reports': len(analysis.carried_moods),
+        'risk_score': risk_score,
+        'avg_risk': avg_risk,
+        'risk_ewma': timeline.ewma,
+        'prompt_tokens': prompt_tokens,
+        'risk_windows': risk['windows'],
+        'crisis_phrases': risk['keywords'],
+        'watch_phrases': risk['watch_phrases'],
+        'crisis_audio_url': crisis_audio_url,
+        'timings': analysis.timings,
+    }
+    return prompt_messages, meta
+
+def finish_turn(user_id, state, doctor_response):
+    """Appends the doctor's reply and commits the conversation state."""
     state["messages"].append({"role": "assistant", "content": doctor_response})
+    session_store.put(user_id, state)
+
+    if cold_start['first_chat_seconds'] is None:
+        cold_start['first_chat_seconds'] = round(time.monotonic() - PROCESS_START, 3)
+        app.logger.info(f"Cold start: first chat served {cold_start['first_chat_seconds']}s after process start")
+
+def load_state(user_id):
+    state = session_store.get(user_id)
+    if state is None:
+        state = {
+            "messages": [SYSTEM_MESSAGE],
+            "risk_timeline": RiskTimeline(WINDOW_SIZE),
+            "emotion_series": EmotionSeries(),
+        }
+    return state
 
-    # Generate audio response (optional, can be toggled based on frontend needs)
-    # audio_response_path = "final.mp3"
-    # text_to_speech_with_elevenlabs(
-    #     input_text=doctor_response,
-    #     output_filepath=audio_response_path
-    # )
+@app.route('/mood/<user_id>/trends', methods=['GET'])
+def mood_trends(user_id):
+    """Emotion trajectories, rolling means and sudden shifts across a user's conversation."""
+    state = session_store.get(user_id)
+    series = state.get("emotion_series") if state else None
+    if series is None or not len(series):
+        return jsonify({'error': 'No mood history for this user'}), 404
+    window = max(1, request.args.get('window', TREND_WINDOW, type=int))
+    threshold = request.args.get('threshold', TREND_SHIFT_THRESHOLD, type=float)
+    return jsonify({'user_id': user_id, **series.trends(window, threshold)}), 200
+
+@app.route('/chat', methods=['POST'])
+def chat():
+    data = request.get_json()
+    user_id = data.get('user_id', 'default')  # Unique identifier for each user session
+    user_message = data.get('message', '').strip()
+
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+
+    # Initialize conversation state if not exists
+    turn_start = time.perf_counter()
+    state = load_state(user_id)
+    prompt_messages, meta = start_turn(user_id, state, user_message)
+
+    # Get doctor response
+    with time_stage(meta['timings'], 'llm'):
+        doctor_response = chat_with_query(
+            messages=prompt_messages,
+            model=CHAT_MODEL
+        )
 
     # Update conversation state
-    conversation_states[user_id] = state
+    finish_turn(user_id, state, doctor_response)
 
     # Prepare response
-    response = {
-        'doctor_response': doctor_response,
-        'mood_report': processed_mood,
-        'risk_score': risk_score,
-        'avg_risk': avg_risk,
-    }
-    # 'audio_path': audio_response_path if os.path.exists(audio_response_path) else None
+    meta['timings']['total'] = round((time.perf_counter() - turn_start) * 1000, 1)
+    response = {'doctor_response': doctor_response, **meta}
+    # Audio is optional: synthesised in the background and fetched from audio_url
+    if data.get('audio'):
+        response['audio_url'] = audio_url(doctor_response)
 
     return jsonify(response), 200
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Same as /chat, but streams the reply as Server-Sent Events:
+
+        event: meta   - mood report and risk scores, sent before the first token
+        event: token  - {"text": ...} for each piece of the reply as it arrives
+        event: done   - {"doctor_response": ..., "timings": ...} with the full reply
+                        (plus "audio_url" when the request has "audio": true)
+        event: error  - {"error": ...} if the LLM call fails mid-stream
+
+    The conversation state is only committed after the full reply has been
+    streamed; if the client disconnects or the LLM fails, the turn is dropped.
+    """
+    data = request.get_json()
+    user_id = data.get('user_id', 'default')
+    user_message = data.get('message', '').strip()
+
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+
+    # Work on a copy so an unfinished turn never leaks into the stored session.
+    turn_start = time.perf_counter()
+    state = copy.deepcopy(load_state(user_id))
+    prompt_messages, meta = start_turn(user_id, state, user_message)
+    timings = meta['timings']
+
+    def generate():
+        yield sse_event('meta', meta)
+        pieces = []
+        llm_start = time.perf_counter()
+        try:
+            for text in stream_chat_with_query(messages=prompt_messages, model=CHAT_MODEL):
+                if not pieces:
+                    timings['llm_first_token'] = round((time.perf_counter() - llm_start) * 1000, 1)
+                pieces.append(text)
+                yield sse_event('token', {'text': text})
+        except Exception as e:
+            app.logger.error(f"Streaming chat failed for {user_id}: {e}")
+            yield sse_event('error', {'error': str(e)})
+            return
+        timings['llm'] = round((time.perf_counter() - llm_start) * 1000, 1)
+        doctor_response = "".join(pieces)
+        finish_turn(user_id, state, doctor_response)
+        timings['total'] = round((time.perf_counter() - turn_start) * 1000, 1)
+        done = {'doctor_response': doctor_response, 'timings': timings}
+        if data.get('audio'):
+            done['audio_url'] = audio_url(doctor_response)
+        yield sse_event('done', done)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        # Stop proxies (nginx) from buffering the stream.
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+def ndjson_line(data):
+    return json.dumps(data) + "\n"
+
+def speak_turn(user_id, user_message, cancel=None):
+    """
+    Runs a spoken turn and yields its events: {"type": "meta", ...}, then
+    {"type": "audio", "index": n, "text": sentence, "audio": bytes, "mimetype": ...}
+    for each sentence as soon as it is synthesised, then {"type": "done", ...}
+    (or {"type": "error", ...}).
+
+    Each sentence is synthesised as soon as the LLM has finished it (see
+    speech_pipeline.stream_speech). State is committed once the whole reply
+    has been produced; if cancel (a threading.Event) is set part way, only
+    the sentences produced so far are committed, and nothing if there were none.
+    """
+    turn_start = time.perf_counter()
+    state = copy.deepcopy(load_state(user_id))
+    prompt_messages, meta = start_turn(user_id, state, user_message)
+    timings = meta['timings']
+    yield {'type': 'meta', **meta}
+
+    pieces, spoken = [], []
+    speak_start = time.perf_counter()
+    try:
+        chunks = stream_speech(
+            stream_chat_with_query(messages=prompt_messages, model=CHAT_MODEL),
+            tts_service,
+            on_text=pieces.append,
+            cancel=cancel,
+        )
+        for index, sentence, audio in chunks:
+            if index == 0:
+                timings['first_audio'] = round((time.perf_counter() - speak_start) * 1000, 1)
+            spoken.append(sentence)
+            yield {'type': 'audio', 'index': index, 'text': sentence, 'audio': audio, 'mimetype': tts_service.mimetype}
+    except Exception as e:
+        app.logger.error(f"Spoken chat failed for {user_id}: {e}")
+        yield {'type': 'error', 'error': str(e)}
+        return
+    timings['llm_tts'] = round((time.perf_counter() - speak_start) * 1000, 1)
+    cancelled = cancel is not None and cancel.is_set()
+    if cancelled:
+        # Keep the history to what the patient actually heard.
+        if not spoken:
+            return
+        doctor_response = " ".join(spoken)
+    else:
+        doctor_response = "".join(pieces)
+    finish_turn(user_id, state, doctor_response)
+    timings['total'] = round((time.perf_counter() - turn_start) * 1000, 1)
+    yield {'type': 'done', 'doctor_response': doctor_response, 'cancelled': cancelled, 'timings': timings}
+
+@app.route('/chat/speak', methods=['POST'])
+def chat_speak():
+    """
+    Same as /chat, but streams the spoken reply sentence by sentence as
+    newline-delimited JSON over a chunked response (see speak_turn):
+
+        {"type": "meta", ...}   - mood report and risk scores
+        {"type": "audio", "index": n, "text": sentence, "audio": base64, "mimetype": ...}
+        {"type": "done", "doctor_response": ..., "timings": ...}
+        {"type": "error", "error": ...}
+
+    The avatar can start speaking after the first sentence instead of after
+    the whole reply.
+    """
+    data = request.get_json()
+    user_id = data.get('user_id', 'default')
+    user_message = data.get('message', '').strip()
+
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+
+    def generate():
+        for event in speak_turn(user_id, user_message):
+            if event['type'] == 'audio':
+                event = {**event, 'audio': base64.b64encode(event['audio']).decode('ascii')}
+            yield ndjson_line(event)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@sock.route('/voice/ws')
+def voice_ws(ws):
+    """
+    Full-duplex voice conversation: microphone PCM in, transcripts and
+    synthesised speech out, with barge-in. See voice_session for the protocol.
+    """
+    user_id = request.args.get('user_id', 'default')
+    session = VoiceSession(
+        send=ws.send,
+        respond=lambda text, cancel: speak_turn(user_id, text, cancel),
+        sample_rate=request.args.get('sample_rate', VOICE_SAMPLE_RATE, type=int),
+        mimetype=tts_service.mimetype,
+    )
+    session.start()
+    try:
+        while True:
+            session.handle(ws.receive())
+    finally:
+        session.close()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
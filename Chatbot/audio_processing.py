@@ -0,0 +1,180 @@
+import io
+import os
+import wave
+
+import numpy as np
+
+# WSOLA parameters: analysis frame length and how far each frame may move to
+# line up with the previous one. 40 ms frames keep speech formants intact;
+# a 10 ms search covers a full pitch period down to 100 Hz.
+WSOLA_FRAME_MS = float(os.environ.get("WSOLA_FRAME_MS", "40"))
+WSOLA_TOLERANCE_MS = float(os.environ.get("WSOLA_TOLERANCE_MS", "10"))
+
+
+def pcm16_to_float(data, channels=1):
+    """Little-endian 16-bit PCM bytes to float32 samples in [-1, 1], shaped (n,) or (n, channels)."""
+    samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    return samples if channels == 1 else samples.reshape(-1, channels)
+
+
+def float_to_pcm16(samples):
+    """float32 samples (clipped to [-1, 1]) to little-endian 16-bit PCM bytes."""
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+
+def to_float32(samples):
+    """Integer PCM arrays (e.g. Gradio's int16) scaled to float32 in [-1, 1]; float arrays passed through."""
+    samples = np.asarray(samples)
+    if np.issubdtype(samples.dtype, np.integer):
+        return samples.astype(np.float32) / float(np.iinfo(samples.dtype).max + 1)
+    return samples.astype(np.float32, copy=False)
+
+
+def pcm16_to_wav(pcm, sample_rate, channels=1):
+    """Wraps 16-bit PCM (bytes, memoryview or int16 array) in a WAV header without decoding it."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def probe_audio(data, format):
+    """
+    (sample_rate, channels, frames) from a WAV or FLAC header, without
+    decoding the audio; None for other formats.
+    """
+    if format == "wav":
+        with wave.open(io.BytesIO(data)) as wav:
+            return wav.getframerate(), wav.getnchannels(), wav.getnframes()
+    if format == "flac" and bytes(data[:4]) == b"fLaC":
+        # STREAMINFO is always the first metadata block: after the marker and
+        # its 4-byte header, bytes 10-17 pack the sample rate (20 bits),
+        # channels - 1 (3), bits per sample - 1 (5) and total frames (36).
+        packed = int.from_bytes(data[18:26], "big")
+        return packed >> 44, ((packed >> 41) & 0x7) + 1, packed & ((1 << 36) - 1)
+    return None
+
+
+def read_wav(data):
+    """(samples, sample_rate) for 16-bit WAV bytes."""
+    with wave.open(io.BytesIO(data)) as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"Only 16-bit WAV is supported, got {8 * wav.getsampwidth()}-bit")
+        return pcm16_to_float(wav.readframes(wav.getnframes()), wav.getnchannels()), wav.getframerate()
+
+
+def write_wav(samples, sample_rate):
+    """16-bit WAV bytes for samples."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1 if samples.ndim == 1 else samples.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(float_to_pcm16(samples))
+    return buffer.getvalue()
+
+
+def decode_audio(data, format):
+    """(samples, sample_rate) for encoded audio bytes; WAV is decoded in-process, anything else via pydub/ffmpeg."""
+    if format == "wav":
+        return read_wav(data)
+    from pydub import AudioSegment
+    segment = AudioSegment.from_file(io.BytesIO(data), format=format).set_sample_width(2)
+    return pcm16_to_float(segment.raw_data, segment.channels), segment.frame_rate
+
+
+def encode_audio(samples, sample_rate, format, bitrate=None):
+    """Encodes samples to format (WAV in-process, anything else via pydub/ffmpeg) and returns the bytes."""
+    if format == "wav":
+        return write_wav(samples, sample_rate)
+    from pydub import AudioSegment
+    segment = AudioSegment(
+        data=float_to_pcm16(samples),
+        sample_width=2,
+        frame_rate=sample_rate,
+        channels=1 if samples.ndim == 1 else samples.shape[1],
+    )
+    buffer = io.BytesIO()
+    segment.export(buffer, format=format, bitrate=bitrate)
+    return buffer.getvalue()
+
+
+def time_stretch(samples, speed, sample_rate, frame_ms=WSOLA_FRAME_MS, tolerance_ms=WSOLA_TOLERANCE_MS):
+    """
+    Changes the tempo of samples by speed (1.25 = 25% faster) without changing pitch.
+
+    Uses WSOLA (waveform similarity overlap-add): Hann-windowed frames are
+    overlap-added at a fixed output hop while being read from the input at
+    speed times that hop, and each frame is shifted by up to tolerance_ms to
+    the position that best continues the previous one, so periods line up
+    and no phasing artefacts appear. Works on (n,) or (n, channels) arrays;
+    the alignment is computed on the channel mix and applied to all channels.
+    """
+    x = np.asarray(samples, dtype=np.float32)
+    if speed == 1.0 or len(x) == 0:
+        return x.copy()
+    if speed <= 0:
+        raise ValueError(f"speed must be positive, got {speed}")
+    mono = x if x.ndim == 1 else x.mean(axis=1)
+
+    frame = max(2, int(sample_rate * frame_ms / 1000) // 2 * 2)
+    hop_out = frame // 2
+    hop_in = hop_out * speed
+    tolerance = int(sample_rate * tolerance_ms / 1000)
+    # Periodic Hann: overlap-added at half a frame it sums to exactly one.
+    window = np.hanning(frame + 1)[:-1].astype(np.float32)
+    channel_window = window if x.ndim == 1 else window[:, None]
+
+    # Padding means every search region and continuation is in range.
+    pad = tolerance + frame
+    pad_width = (pad, pad + frame) if x.ndim == 1 else ((pad, pad + frame), (0, 0))
+    x = np.pad(x, pad_width)
+    mono = np.pad(mono, (pad, pad + frame))
+
+    out_length = int(round(len(samples) / speed))
+    n_frames = out_length // hop_out + 2
+    out = np.zeros((n_frames * hop_out + frame,) + x.shape[1:], dtype=np.float32)
+    norm = np.zeros(n_frames * hop_out + frame, dtype=np.float32)
+
+    # Frames are centred on their nominal position, so the first is read from the padding.
+    position = pad - hop_out
+    for k in range(n_frames):
+        if k > 0:
+            nominal = pad - hop_out + int(round(k * hop_in))
+            # What would naturally follow the previous frame, matched against the search region.
+            target = mono[position + hop_out:position + hop_out + frame]
+            start = max(0, nominal - tolerance)
+            region = mono[start:nominal + tolerance + frame]
+            if len(region) < frame or len(target) < frame:
+                break
+            candidates = np.lib.stride_tricks.sliding_window_view(region, frame)
+            position = start + int(np.argmax(candidates @ target))
+        out[k * hop_out:k * hop_out + frame] += channel_window * x[position:position + frame]
+        norm[k * hop_out:k * hop_out + frame] += window
+
+    out = out[hop_out:hop_out + out_length]
+    norm = np.maximum(norm[hop_out:hop_out + out_length], 1e-3)
+    return out / (norm if out.ndim == 1 else norm[:, None])
+
+
+def change_speed(data, speed, output_format):
+    """
+    Pitch-preserving speed change of encoded audio, in memory.
+
+    output_format is in the ElevenLabs style used by tts_service
+    (codec_samplerate[_bitrate], e.g. mp3_22050_32 or pcm_22050). Raw PCM is
+    stretched directly; other codecs are decoded, stretched and re-encoded
+    at the same bitrate.
+    """
+    if speed == 1.0:
+        return data
+    codec, *rest = output_format.split("_")
+    if codec == "pcm":
+        sample_rate = int(rest[0])
+        return float_to_pcm16(time_stretch(pcm16_to_float(data), speed, sample_rate))
+    samples, sample_rate = decode_audio(data, codec)
+    bitrate = f"{rest[1]}k" if len(rest) > 1 else None
+    return encode_audio(time_stretch(samples, speed, sample_rate), sample_rate, codec, bitrate)
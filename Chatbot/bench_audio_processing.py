@@ -0,0 +1,70 @@
+"""
+Cost per second of audio of the pitch-preserving speed change (audio_processing).
+
+Times time_stretch on a WAV file (final.wav by default) at a few speeds and
+reports milliseconds of CPU per second of input audio and the real-time
+factor. With pydub and ffmpeg installed it also times the full MP3
+decode -> stretch -> encode path that TTS_SPEED uses for mp3_* formats.
+A 220 Hz test tone checks that the pitch is unchanged.
+
+    python bench_audio_processing.py --file final.wav --speeds 0.8 1.25 1.5 --repeat 3
+"""
+import argparse
+import time
+
+import numpy as np
+
+from audio_processing import change_speed, encode_audio, read_wav, time_stretch
+
+
+def dominant_frequency(samples, sample_rate):
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples))))
+    return np.argmax(spectrum) * sample_rate / len(samples)
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default="final.wav")
+    parser.add_argument("--speeds", type=float, nargs="+", default=[0.8, 1.25, 1.5])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.file, "rb") as f:
+        samples, sample_rate = read_wav(f.read())
+    seconds = len(samples) / sample_rate
+    print(f"{args.file}: {seconds:.1f} s at {sample_rate} Hz")
+
+    print(f"{'stage':<24}{'speed':>7}{'ms per audio s':>16}{'real-time x':>13}")
+    for speed in args.speeds:
+        elapsed = best_of(lambda: time_stretch(samples, speed, sample_rate), args.repeat)
+        print(f"{'time_stretch':<24}{speed:>7g}{elapsed * 1000 / seconds:>16.1f}{seconds / elapsed:>13.0f}")
+
+    try:
+        mp3 = encode_audio(samples, sample_rate, "mp3", "32k")
+    except (ImportError, OSError, FileNotFoundError) as e:
+        print(f"(skipping mp3 round trip: {e})")
+    else:
+        for speed in args.speeds:
+            elapsed = best_of(lambda: change_speed(mp3, speed, f"mp3_{sample_rate}_32"), args.repeat)
+            print(f"{'mp3 decode+stretch+enc':<24}{speed:>7g}{elapsed * 1000 / seconds:>16.1f}{seconds / elapsed:>13.0f}")
+
+    tone_rate = 22050
+    t = np.arange(3 * tone_rate) / tone_rate
+    tone = (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    for speed in args.speeds:
+        stretched = time_stretch(tone, speed, tone_rate)
+        print(f"220 Hz tone at {speed:g}x: duration x{len(stretched) / len(tone):.3f}, "
+              f"pitch {dominant_frequency(stretched, tone_rate):.1f} Hz")
+
+
+if __name__ == "__main__":
+    main()
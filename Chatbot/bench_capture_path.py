@@ -0,0 +1,107 @@
+"""
+Local cost of getting a voice turn from capture to the speech backend.
+
+Compares the old path (recogniser WAV -> pydub decode -> 128k MP3 on disk ->
+reopen -> upload) with the in-memory paths SegmentedTranscriber now takes:
+captured PCM given a WAV header, Gradio's int16 array, and a WAV upload
+sent as-is. The backend is a no-op, so only the audio handling is timed;
+bytes are what would go over the network. The old path needs pydub and
+ffmpeg and is skipped without them.
+
+    python bench_capture_path.py --file final.wav --repeat 5
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from audio_processing import float_to_pcm16, read_wav, write_wav
+from segmented_transcription import SegmentedTranscriber
+
+
+class NullBackend:
+    name = "null"
+
+    def __init__(self):
+        self.bytes_received = 0
+
+    def transcribe(self, audio, language=None, filename="segment.wav"):
+        self.bytes_received += len(audio)
+        return ""
+
+
+def legacy_path(wav_bytes):
+    """The old record_audio + transcribe_with_groq: MP3 through a file, then the file is uploaded."""
+    from pydub import AudioSegment
+    stages = {}
+    start = time.perf_counter()
+    segment = AudioSegment.from_wav(io.BytesIO(wav_bytes))
+    stages["decode"] = time.perf_counter() - start
+    fd, path = tempfile.mkstemp(suffix=".mp3")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        segment.export(path, format="mp3", bitrate="128k")
+        stages["encode+write"] = time.perf_counter() - start
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            sent = len(f.read())
+        stages["read"] = time.perf_counter() - start
+    finally:
+        os.remove(path)
+    return stages, sent
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, result)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default="final.wav")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.file, "rb") as f:
+        wav_bytes = f.read()
+    samples, sample_rate = read_wav(wav_bytes)
+    seconds = len(samples) / sample_rate
+    pcm = float_to_pcm16(samples)
+    int16 = np.frombuffer(pcm, dtype="<i2")
+    # A single request, as for a normal voice turn.
+    transcriber = SegmentedTranscriber(NullBackend(), max_segment_seconds=seconds + 1)
+    print(f"{args.file}: {seconds:.1f} s at {sample_rate} Hz, {len(wav_bytes)} bytes\n")
+
+    print(f"{'path':<28}{'local ms':>10}{'bytes sent':>12}  stages (ms)")
+    paths = [
+        ("captured PCM (memoryview)", lambda: transcriber.transcribe_pcm(memoryview(pcm), sample_rate)),
+        ("Gradio int16 array", lambda: transcriber.transcribe(int16, sample_rate)),
+        ("WAV upload as-is", lambda: transcriber.transcribe_encoded(wav_bytes, "wav")),
+        ("float samples, re-encoded", lambda: transcriber.transcribe(samples, sample_rate)),
+    ]
+    for name, run in paths:
+        elapsed, result = best_of(run, args.repeat)
+        stages = {k: v for k, v in result.timings.items() if k not in ("total", "transcribe")}
+        print(f"{name:<28}{elapsed * 1000:>10.2f}{result.bytes['sent']:>12}  {stages}")
+
+    try:
+        elapsed, (stages, sent) = best_of(lambda: legacy_path(write_wav(samples, sample_rate)), args.repeat)
+    except (ImportError, OSError) as e:
+        print(f"\n(skipping the old MP3 path: {e})")
+    else:
+        stages = {k: round(v * 1000, 1) for k, v in stages.items()}
+        print(f"{'old: MP3 128k via disk':<28}{elapsed * 1000:>10.2f}{sent:>12}  {stages}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Agreement report for cascaded risk scoring.
+
+Scores every message in the corpus twice, once with the current always-both
+behaviour and once in cascade mode, and reports how often each cascade path
+was taken, how many MentalBERT passes were saved, how far the scores moved and
+whether the alert decision (score >= alert threshold) changed.
+
+    python bench_cascade.py --low 0.1 --high 0.5 --alert-threshold 0.7
+"""
+import argparse
+
+import risk_scoring
+from bench_risk_batching import load_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default="risk_corpus.txt")
+    parser.add_argument("--low", type=float, default=risk_scoring.RISK_CASCADE_LOW)
+    parser.add_argument("--high", type=float, default=risk_scoring.RISK_CASCADE_HIGH)
+    parser.add_argument("--alert-threshold", type=float, default=0.7)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    paths = {}
+    diffs = []
+    disagreements = []
+    for text in corpus:
+        baseline = risk_scoring.assess_risk(text, cascade=False)
+        cascaded = risk_scoring.assess_risk(text, cascade=True, cascade_low=args.low, cascade_high=args.high)
+        paths[cascaded["path"]] = paths.get(cascaded["path"], 0) + 1
+        diff = abs(cascaded["score"] - baseline["score"])
+        diffs.append(diff)
+        if (cascaded["score"] >= args.alert_threshold) != (baseline["score"] >= args.alert_threshold):
+            disagreements.append((text, baseline["score"], cascaded["score"], cascaded["path"]))
+
+    model_scored = len(corpus) - paths.get("keyword", 0)
+    skipped = paths.get("cascade_high", 0) + paths.get("cascade_low", 0)
+    print(f"Messages: {len(corpus)}  band: [{args.low}, {args.high})")
+    for path, count in sorted(paths.items()):
+        print(f"  {path:<13}{count:>5}  ({count / len(corpus):.0%})")
+    if model_scored:
+        print(f"MentalBERT passes skipped: {skipped}/{model_scored} ({skipped / model_scored:.0%})")
+    print(f"Score difference vs always-both: mean {sum(diffs) / len(diffs):.4f}, max {max(diffs):.4f}")
+    agreement = 1 - len(disagreements) / len(corpus)
+    print(f"Alert agreement at {args.alert_threshold}: {agreement:.1%}")
+    for text, before, after, path in disagreements:
+        print(f"  [{path}] {before:.3f} -> {after:.3f}: {text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Per-turn persistence cost in the Gradio app as a conversation grows.
+
+The old path rewrote the whole state to conversation_history.json with
+indent=4 and dumped it to stdout every turn (stdout goes to /dev/null
+here, so terminal time isn't counted). The journal path appends the
+turn's records, and the background writer fsyncs them in groups. Its cost
+on the turn is append(); the writer's time (write + fsync) is reported
+separately.
+
+    python bench_conversation_journal.py --turns 500 --report 10,100,250,500
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from conversation_journal import ConversationJournal
+from emotion_trends import EmotionSeries
+from risk_timeline import RiskTimeline
+from session_store import encode_state
+
+EMOTIONS = ["Sadness", "Neutral", "Fear", "Anger", "Joy", "Surprise", "Disgust"]
+
+
+def _json_default(obj):
+    if isinstance(obj, (RiskTimeline, EmotionSeries)):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def load_corpus(path="risk_corpus.txt"):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def play_turn(state, rng, corpus):
+    """What process_inputs adds to the state in one turn."""
+    scores = {label: round(rng.random(), 4) for label in rng.sample(EMOTIONS, 3)}
+    state["emotion_series"].append(scores)
+    state["messages"].append({"role": "system", "content": f"Mood Report: {scores}"})
+    state["risk_timeline"].add(rng.random())
+    state["messages"].append({"role": "user", "content": rng.choice(corpus)})
+    # A 4-6 sentence reply.
+    state["messages"].append({"role": "assistant", "content": " ".join(rng.choice(corpus) for _ in range(5))})
+
+
+def old_path(state, path, devnull):
+    with open(path, "w") as f:
+        json.dump(state, f, indent=4, default=_json_default)
+    print("Conversation State:\n", json.dumps(state, indent=4, default=_json_default), file=devnull)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--report", default="10,100,250,500")
+    args = parser.parse_args()
+    report_at = {int(n) for n in args.report.split(",")}
+
+    rng = random.Random(0)
+    corpus = load_corpus()
+    directory = tempfile.mkdtemp(prefix="journal-bench-")
+    # The writer is driven by hand below, so its time can be measured.
+    journal = ConversationJournal(directory, fsync_interval_ms=3600 * 1000)
+    state = {"messages": [{"role": "system", "content": "You are a doctor."}],
+             "risk_timeline": RiskTimeline(5), "emotion_series": EmotionSeries(), "session_id": "bench"}
+    legacy_file = os.path.join(directory, "conversation_history.json")
+
+    print(f"{'turn':>6}{'state KB':>10}{'old ms':>10}{'append ms':>11}{'writer ms':>11}")
+    old, appends = [], []
+    with open(os.devnull, "w") as devnull:
+        for turn in range(1, args.turns + 1):
+            play_turn(state, rng, corpus)
+            start = time.perf_counter()
+            old_path(state, legacy_file, devnull)
+            old.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            journal.append("bench", state)
+            appends.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            journal.flush()
+            writer_ms = (time.perf_counter() - start) * 1000
+            if turn in report_at:
+                size = len(encode_state(state)) / 1024
+                print(f"{turn:>6}{size:>10.0f}{old[-1]:>10.2f}{appends[-1]:>11.3f}{writer_ms:>11.2f}")
+
+    print(f"\nmean over {args.turns} turns: old {statistics.mean(old):.2f} ms, append {statistics.mean(appends):.3f} ms")
+    stats = journal.stats()
+    print(f"journal: {stats['records_written']} records, {stats['bytes_written'] / 1024:.0f} KB written, "
+          f"{stats['compactions']} compactions, {os.path.getsize(journal.path('bench')) / 1024:.0f} KB on disk")
+
+    start = time.perf_counter()
+    rebuilt = ConversationJournal(directory).load("bench")
+    print(f"rebuilt from the journal in {(time.perf_counter() - start) * 1000:.1f} ms, "
+          f"{'identical' if encode_state(rebuilt) == encode_state(state) else 'DIFFERENT'}")
+    journal.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Parity check and benchmark for the risk inference backends.
+
+Each backend (torch, int8, onnx) is measured in its own spawned process so the
+RSS numbers are not polluted by the others. For every backend the script scores
+risk_corpus.txt one message at a time and reports per-message latency, RSS
+after loading and peak RSS, then compares the distress (MentalBERT) and
+suicide (DistilBERT) probabilities against the full precision torch backend.
+
+    python bench_inference_backends.py --backends torch int8 onnx
+
+The script exits non-zero when a backend drifts from torch by more than its
+tolerance, so it can be used as a gate before switching RISK_BACKEND.
+"""
+import argparse
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench_risk_batching import load_corpus
+
+# Maximum absolute probability difference allowed against the torch backend.
+TOLERANCE = {"torch": 0.0, "int8": 0.05, "onnx": 1e-3}
+
+
+def current_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def measure_backend(backend_name, corpus):
+    """Runs in a fresh process: loads both models on one backend and scores the corpus."""
+    from inference_backends import build_backend
+    from model_registry import MENTAL_MODEL_ID, SUICIDE_MODEL_ID, load_sequence_classifier
+
+    rss_start = current_rss_mb()
+    start = time.perf_counter()
+    backends = {}
+    for key, model_id in (("mental", MENTAL_MODEL_ID), ("suicide", SUICIDE_MODEL_ID)):
+        tokenizer, model = load_sequence_classifier(model_id)
+        backends[key] = build_backend(backend_name, model_id, tokenizer, model)
+        backends[key].window_probs(["warm up"])
+    load_seconds = time.perf_counter() - start
+    rss_loaded = current_rss_mb()
+
+    probs = {"mental": [], "suicide": []}
+    latencies = []
+    for text in corpus:
+        start = time.perf_counter()
+        for key, backend in backends.items():
+            probs[key].extend(backend.window_probs([text])[0])
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return {
+        "backend": backend_name,
+        "load_seconds": load_seconds,
+        "rss_loaded_mb": rss_loaded - rss_start,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "probs": probs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"])
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    names = ["torch"] + [name for name in args.backends if name != "torch"]
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                results[name] = pool.submit(measure_backend, name, corpus).result()
+            except Exception as e:
+                print(f"{name}: failed ({e})")
+
+    print(f"{'backend':<8}{'load s':>8}{'RSS MB':>9}{'peak MB':>9}{'mean ms':>9}{'p95 ms':>9}"
+          f"{'max |d| distress':>18}{'max |d| suicide':>17}")
+    reference = results.get("torch")
+    failed = False
+    for name, result in results.items():
+        diffs = {}
+        for key in ("mental", "suicide"):
+            diffs[key] = max(
+                abs(a - b) for a, b in zip(result["probs"][key], reference["probs"][key])
+            ) if reference else float("nan")
+        print(
+            f"{name:<8}{result['load_seconds']:>8.1f}{result['rss_loaded_mb']:>9.0f}{result['peak_rss_mb']:>9.0f}"
+            f"{result['mean_ms']:>9.1f}{result['p95_ms']:>9.1f}{diffs['mental']:>18.5f}{diffs['suicide']:>17.5f}"
+        )
+        if max(diffs.values()) > TOLERANCE.get(name, 0.0):
+            print(f"  {name} exceeds parity tolerance {TOLERANCE.get(name, 0.0)}")
+            failed = True
+    sys.exit(1 if failed or len(results) != len(names) else 0)
+
+
+if __name__ == "__main__":
+    main()
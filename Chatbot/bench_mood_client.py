@@ -0,0 +1,73 @@
+"""
+Benchmark of the asynchronous mood client against the local API stand-in.
+
+For each processing delay the stand-in is started on a free port and the
+corpus is analysed with MoodClient at a few concurrency levels. The script
+reports per-report latency (p50/p95), the overhead above the backend's
+processing time and how many report polls were needed. The old client slept a
+fixed 3 s before fetching the report, so its latency floor is 3000 ms for any
+delay under 3 s.
+
+    python bench_mood_client.py --delays 100 400 1500 --concurrency 1 8 32
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import wait
+
+from mood_detection import MoodClient
+from mood_stub import serve
+
+LEGACY_FIXED_WAIT_MS = 3000
+
+
+def load_corpus(path="risk_corpus.txt"):
+    # Same corpus as bench_risk_batching, read directly so the risk models aren't imported.
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def run(client, corpus, concurrency, requests_per_level):
+    latencies = []
+    texts = [corpus[i % len(corpus)] for i in range(requests_per_level)]
+    for start in range(0, len(texts), concurrency):
+        batch = texts[start:start + concurrency]
+        submitted = time.perf_counter()
+        futures = [client.submit_text(text) for text in batch]
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when="FIRST_COMPLETED")
+            now = time.perf_counter()
+            for future in done:
+                assert future.result().startswith("id,text"), future.result()
+                latencies.append((now - submitted) * 1000)
+    latencies.sort()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delays", type=float, nargs="+", default=[100, 400, 1500])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    print(f"{'delay ms':>9}{'conc':>6}{'p50 ms':>9}{'p95 ms':>9}{'overhead':>10}{'polls/req':>11}{'legacy floor':>14}")
+    for delay in args.delays:
+        server = serve(port=0, delay_ms=delay)
+        client = MoodClient(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1")
+        for concurrency in args.concurrency:
+            polls_before = client.polls
+            latencies = run(client, corpus, concurrency, args.requests)
+            p50 = statistics.median(latencies)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            polls = (client.polls - polls_before) / len(latencies)
+            print(f"{delay:>9.0f}{concurrency:>6}{p50:>9.0f}{p95:>9.0f}{p50 - delay:>10.0f}{polls:>11.1f}"
+                  f"{max(LEGACY_FIXED_WAIT_MS, delay):>14.0f}")
+        client.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Load test for micro-batched risk scoring.
+
+Drives analyze_mental_state / analyze_suicide_tendencies from a growing number
+of concurrent client threads, once with micro-batching disabled and once with
+it enabled, and prints the throughput-vs-latency curve for each.
+
+    python bench_risk_batching.py --duration 10 --concurrency 1 2 4 8 16 32
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import risk_scoring
+from micro_batching import MicroBatcher
+
+
+def load_corpus(path="risk_corpus.txt"):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def score_message(text, batchers):
+    if batchers is None:
+        risk_scoring.batch_analyze_mental_state([text])
+        risk_scoring.batch_analyze_suicide_tendencies([text])
+    else:
+        mental_batcher, suicide_batcher = batchers
+        # Both models are queued before waiting, as two concurrent requests would be.
+        mental = mental_batcher.submit(text)
+        suicide = suicide_batcher.submit(text)
+        mental.result()
+        suicide.result()
+
+
+def run_level(corpus, concurrency, duration, batchers):
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        i = offset
+        local = []
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            score_message(corpus[i % len(corpus)], batchers)
+            local.append(time.perf_counter() - start)
+            i += concurrency
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    began = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - began
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": p95 * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--max-batch-size", type=int, default=risk_scoring.RISK_BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=risk_scoring.RISK_BATCH_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    # Warm both models so the first level is not charged for lazy init.
+    score_message(corpus[0], None)
+
+    print(f"{'mode':<10}{'clients':>8}{'msg/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode in ("unbatched", "batched"):
+        batchers = None
+        if mode == "batched":
+            batchers = (
+                MicroBatcher(risk_scoring.batch_analyze_mental_state, args.max_batch_size, args.max_wait_ms, "bench-mental"),
+                MicroBatcher(risk_scoring.batch_analyze_suicide_tendencies, args.max_batch_size, args.max_wait_ms, "bench-suicide"),
+            )
+        for concurrency in args.concurrency:
+            result = run_level(corpus, concurrency, args.duration, batchers)
+            print(
+                f"{mode:<10}{concurrency:>8}{result['throughput']:>10.1f}"
+                f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+            )
+        if batchers:
+            for batcher in batchers:
+                print(f"  {batcher.name}: {batcher.stats()}")
+                batcher.close()
+
+
+if __name__ == "__main__":
+    main()
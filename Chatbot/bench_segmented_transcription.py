@@ -0,0 +1,72 @@
+"""
+Segmented, parallel transcription of a long recording against a single request.
+
+Runs offline against stt_stub.ToneSpeechBackend: the corpus is rendered as a
+long tone-coded recording, and the backend's latency is a fixed cost per
+request plus a cost per second of audio (upload and inference), roughly how
+a hosted Whisper endpoint behaves. Reports wall time, segment count and word
+error rate of the stitched transcript against the source text.
+
+    python bench_segmented_transcription.py --minutes 5 --latency-ms 300 --ms-per-audio-second 40
+"""
+import argparse
+import time
+
+from audio_processing import write_wav
+from segmented_transcription import SegmentedTranscriber
+from stt_stub import STUB_SAMPLE_RATE, ToneSpeechBackend
+
+
+def load_corpus(path="risk_corpus.txt"):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = reference.split(), hypothesis.split()
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i]
+        for j, h in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h)))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--ms-per-audio-second", type=float, default=40)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    backend = ToneSpeechBackend(args.latency_ms, args.ms_per_audio_second)
+    sentences, seconds = [], 0.0
+    corpus = load_corpus()
+    while seconds < args.minutes * 60:
+        line = corpus[len(sentences) % len(corpus)].rstrip(".!? ") + "."
+        sentences.append(line)
+        seconds += len(backend.render(line)) / STUB_SAMPLE_RATE
+    reference = " ".join(sentences)
+    samples = backend.render(reference)
+    print(f"recording: {len(samples) / STUB_SAMPLE_RATE:.0f} s, {len(reference.split())} words")
+
+    print(f"{'mode':<22}{'segments':>9}{'wall ms':>10}{'WER':>8}")
+    # The current path: the whole recording in one request.
+    start = time.perf_counter()
+    text = backend.transcribe(write_wav(samples, STUB_SAMPLE_RATE))
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{'single request':<22}{1:>9}{elapsed:>10.0f}{word_error_rate(reference, text):>8.3f}")
+
+    for workers in args.workers:
+        transcriber = SegmentedTranscriber(backend, max_workers=workers)
+        start = time.perf_counter()
+        result = transcriber.transcribe(samples, STUB_SAMPLE_RATE)
+        elapsed = (time.perf_counter() - start) * 1000
+        wer = word_error_rate(reference, result.text)
+        print(f"{f'segmented, {workers} workers':<22}{len(result.segments):>9}{elapsed:>10.0f}{wer:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
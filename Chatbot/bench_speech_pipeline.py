@@ -0,0 +1,89 @@
+"""
+Time-to-first-audio of the sentence-level speech pipeline against the current path.
+
+The current path waits for the whole completion, then synthesises the whole
+reply. The pipelined path (speech_pipeline.stream_speech, used by /chat/speak)
+synthesises each sentence as soon as the streaming LLM has finished it.
+
+Both run offline: the LLM is shared/llm_stub.py streaming with a first-token
+delay and a per-token delay, and TTS is a simulated engine whose latency is
+a fixed cost plus a cost per character (roughly how hosted TTS APIs behave).
+The TTS cache is disabled so every run synthesises.
+
+    python bench_speech_pipeline.py --first-token-ms 300 --token-ms 30 --tts-base-ms 250 --tts-char-ms 4
+"""
+import argparse
+import statistics
+import time
+
+import tts_service
+from speech_pipeline import stream_speech
+from shared.llm_gateway import LLMGateway
+from shared.llm_stub import serve
+
+
+def load_corpus(path="risk_corpus.txt"):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def build_messages(corpus, count, sentences=4):
+    """Joins corpus lines into multi-sentence messages; the stub echoes them, so replies are several sentences long."""
+    lines = [line.rstrip(".!? ") + "." for line in corpus if len(line) >= 20]
+    return [" ".join(lines[(i * sentences + j) % len(lines)] for j in range(sentences)) for i in range(count)]
+
+
+def simulated_engine(base_ms, char_ms):
+    def synthesize(text, voice, output_format):
+        time.sleep((base_ms + char_ms * len(text)) / 1000.0)
+        # About 4 KB per second of 32 kbps MP3 at ~15 characters per second of speech.
+        return b"\0" * (len(text) * 270)
+    return synthesize
+
+
+def current_path(gateway, tts, messages):
+    start = time.perf_counter()
+    reply = gateway.chat(messages, "stub")
+    tts.synthesize(reply)
+    return time.perf_counter() - start, time.perf_counter() - start
+
+
+def pipelined_path(gateway, tts, messages):
+    start = time.perf_counter()
+    first = None
+    for _ in stream_speech(gateway.stream_chat(messages, "stub"), tts):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=30)
+    parser.add_argument("--tts-base-ms", type=float, default=250)
+    parser.add_argument("--tts-char-ms", type=float, default=4)
+    parser.add_argument("--messages", type=int, default=10)
+    args = parser.parse_args()
+
+    server = serve(port=0, latency_ms=args.first_token_ms, token_ms=args.token_ms)
+    gateway = LLMGateway(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="stub")
+    tts_service.ENGINES["simulated"] = simulated_engine(args.tts_base_ms, args.tts_char_ms)
+    tts = tts_service.TTSService(engine="simulated", voice="simulated", cache_max_bytes=0)
+
+    results = {"current": [], "pipelined": []}
+    for text in build_messages(load_corpus(), args.messages):
+        messages = [{"role": "user", "content": text}]
+        results["current"].append(current_path(gateway, tts, messages))
+        results["pipelined"].append(pipelined_path(gateway, tts, messages))
+
+    print(f"{'path':<11}{'first audio p50 ms':>20}{'first audio max ms':>20}{'all audio p50 ms':>18}")
+    for name, runs in results.items():
+        firsts = [first * 1000 for first, _ in runs]
+        totals = [total * 1000 for _, total in runs]
+        print(f"{name:<11}{statistics.median(firsts):>20.0f}{max(firsts):>20.0f}{statistics.median(totals):>18.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Perceived response latency of the WebSocket voice loop (voice_session,
+/voice/ws) against the current turn-based voice path, and barge-in.
+
+Runs the whole loop offline and in real time. The patient is tone speech
+from stt_stub, streamed to a VoiceSession in 20 ms frames with a little
+noise, as a microphone would; the session's STT is the stub backend behind
+a SegmentedTranscriber. The LLM is shared/llm_stub.py streaming, and TTS is
+the stub engine behind a fixed plus per-character latency. Latencies
+default to roughly what the hosted APIs show for short turns.
+
+Response latency is from the patient's last word to the first audio of the
+reply. The current path is timed on the same stand-ins: end-of-speech
+silence (VAD_END_SILENCE_MS), then STT of the whole utterance, the whole
+completion and the whole reply's synthesis, one after another.
+
+The barge-in run starts speaking again while the reply is playing and
+measures how long it takes for the "stop" to arrive, and that no audio of
+the interrupted turn follows it.
+
+    python bench_voice_loop.py --turns 5 --first-token-ms 200 --tts-base-ms 200
+"""
+import argparse
+import json
+import queue
+import statistics
+import time
+
+import numpy as np
+
+import tts_service
+from segmented_transcription import SegmentedTranscriber
+from speech_pipeline import stream_speech
+from stt_stub import STUB_SAMPLE_RATE, ToneSpeechBackend
+from vad import VAD_END_SILENCE_MS, VAD_FRAME_MS
+from voice_session import VoiceSession
+from shared.llm_gateway import LLMGateway
+from shared.llm_stub import serve
+
+UTTERANCES = [
+    "I have not been sleeping well lately. Work has been really hard and I feel tired all the time.",
+    "My chest feels tight when I think about going back to the office on Monday.",
+    "I tried to talk to my sister about it. She said I should just rest more.",
+    "Some days I do not want to get out of bed at all. Is that normal?",
+    "Thank you for listening to me. I think I will try to see someone this week.",
+]
+INTERRUPTION = "Sorry to stop you. Can we talk about my sleep instead?"
+
+
+def simulated_engine(base_ms, char_ms):
+    def synthesize(text, voice, output_format):
+        time.sleep((base_ms + char_ms * len(text)) / 1000.0)
+        return tts_service.synthesize_stub(text, voice, output_format)
+    return synthesize
+
+
+class Client:
+    """The far end of the socket: timestamps everything the session sends."""
+
+    def __init__(self):
+        self.received = queue.Queue()
+
+    def send(self, message):
+        now = time.perf_counter()
+        self.received.put((now, json.loads(message) if isinstance(message, str) else message))
+
+
+class Microphone:
+    """Feeds audio to a session in real time, frame by frame, with a little noise."""
+
+    def __init__(self, session, sample_rate):
+        self.session = session
+        self.hop = int(sample_rate * VAD_FRAME_MS / 1000)
+        self.rng = np.random.default_rng(0)
+        self.next_at = time.perf_counter()
+        self.last_speech_at = None
+
+    def play(self, samples):
+        """Streams samples; returns the time the first frame went out."""
+        first = None
+        for start in range(0, len(samples), self.hop):
+            frame = samples[start:start + self.hop]
+            frame = frame + self.rng.normal(0, 0.001, len(frame)).astype(np.float32)
+            self.next_at += self.hop / STUB_SAMPLE_RATE
+            time.sleep(max(0.0, self.next_at - time.perf_counter()))
+            self.session.feed((np.clip(frame, -1, 1) * 32767).astype("<i2").tobytes())
+            first = first or time.perf_counter()
+        self.last_speech_at = time.perf_counter()
+        return first
+
+    def silence(self, seconds):
+        self.play(np.zeros(int(seconds * STUB_SAMPLE_RATE), dtype=np.float32))
+
+
+def events_until(client, microphone, done, timeout=15.0):
+    """Keeps the microphone open (silence) and collects events until done(event) or timeout."""
+    events = []
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            while True:
+                event = client.received.get_nowait()
+                events.append(event)
+                if isinstance(event[1], dict) and done(event[1]):
+                    return events
+        except queue.Empty:
+            pass
+        microphone.silence(VAD_FRAME_MS / 1000)
+    raise TimeoutError("No reply from the voice session")
+
+
+def render(backend, text):
+    return np.trim_zeros(backend.render(text, STUB_SAMPLE_RATE), "b")
+
+
+def current_path(backend, transcriber, gateway, tts, text):
+    samples = (render(backend, text) * 32767).astype("<i2")
+    start = time.perf_counter()
+    heard = transcriber.transcribe(samples, STUB_SAMPLE_RATE).text
+    reply = gateway.chat([{"role": "user", "content": heard}], "stub")
+    tts.synthesize(reply)
+    return VAD_END_SILENCE_MS + (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--stt-ms", type=float, default=150)
+    parser.add_argument("--stt-ms-per-second", type=float, default=10)
+    parser.add_argument("--first-token-ms", type=float, default=200)
+    parser.add_argument("--token-ms", type=float, default=5)
+    parser.add_argument("--tts-base-ms", type=float, default=200)
+    parser.add_argument("--tts-char-ms", type=float, default=1)
+    args = parser.parse_args()
+
+    server = serve(port=0, latency_ms=args.first_token_ms, token_ms=args.token_ms)
+    gateway = LLMGateway(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="stub")
+    tts_service.ENGINES["simulated"] = simulated_engine(args.tts_base_ms, args.tts_char_ms)
+    tts = tts_service.TTSService(engine="simulated", voice="tone", output_format=f"pcm_{STUB_SAMPLE_RATE}",
+                                 cache_max_bytes=0)
+    backend = ToneSpeechBackend(args.stt_ms, args.stt_ms_per_second)
+    transcriber = SegmentedTranscriber(backend)
+
+    def respond(text, cancel):
+        # speak_turn without the mood/risk analysis and session store.
+        messages = [{"role": "user", "content": text}]
+        pieces = []
+        for index, sentence, audio in stream_speech(gateway.stream_chat(messages, "stub"), tts,
+                                                    on_text=pieces.append, cancel=cancel):
+            yield {"type": "audio", "index": index, "text": sentence, "audio": audio, "mimetype": tts.mimetype}
+        yield {"type": "done", "doctor_response": "".join(pieces)}
+
+    client = Client()
+    session = VoiceSession(client.send, respond, transcriber, STUB_SAMPLE_RATE, tts.mimetype)
+    session.start()
+    microphone = Microphone(session, STUB_SAMPLE_RATE)
+    microphone.silence(0.5)
+
+    print(f"{'turn':<6}{'current ms':>12}{'voice loop ms':>15}{'stt wait ms':>13}{'partials':>10}  transcript")
+    current, voice = [], []
+    for turn, text in enumerate((UTTERANCES * args.turns)[:args.turns], 1):
+        microphone.play(render(backend, text))
+        spoke_at = microphone.last_speech_at
+        events = events_until(client, microphone, lambda e: e["type"] == "done" and e["turn"] == turn)
+        first_audio = next(t for t, e in events if isinstance(e, dict) and e["type"] == "audio")
+        final = next(e for _, e in events if isinstance(e, dict) and e["type"] == "final")
+        partials = sum(1 for _, e in events if isinstance(e, dict) and e["type"] == "partial")
+        voice.append((first_audio - spoke_at) * 1000)
+        current.append(current_path(backend, transcriber, gateway, tts, text))
+        print(f"{turn:<6}{current[-1]:>12.0f}{voice[-1]:>15.0f}{final['timings']['stt_wait']:>13.0f}{partials:>10}  "
+              f"{'exact' if final['text'] == text else 'DIFFERS: ' + final['text']}")
+        session.handle(json.dumps({"type": "played", "turn": turn}))
+    print(f"{'p50':<6}{statistics.median(current):>12.0f}{statistics.median(voice):>15.0f}")
+
+    # Barge-in: talk over the reply once it has started playing.
+    turn = args.turns + 1
+    microphone.play(render(backend, UTTERANCES[0]))
+    events_until(client, microphone, lambda e: e["type"] == "audio" and e["turn"] == turn)
+    microphone.silence(0.3)
+    onset = microphone.play(render(backend, INTERRUPTION))
+    events = events_until(client, microphone, lambda e: e["type"] == "done" and e["turn"] == turn + 1)
+    stop_at = next(t for t, e in events if isinstance(e, dict) and e["type"] == "stop")
+    stale = sum(1 for t, e in events if isinstance(e, dict) and e["type"] == "audio" and e["turn"] == turn and t > stop_at)
+    final = next(e for _, e in events if isinstance(e, dict) and e["type"] == "final" and e["turn"] == turn + 1)
+    print(f"\nbarge-in: stop {(stop_at - onset) * 1000:.0f} ms after the patient started talking over the reply, "
+          f"{stale} audio messages of the interrupted turn after it; "
+          f"next transcript {'exact' if final['text'] == INTERRUPTION else 'DIFFERS: ' + final['text']}")
+    session.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,24 +2,27 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
-from groq import Groq
-from dotenv import load_dotenv
-load_dotenv()
-
 
+from shared.llm_gateway import get_gateway
 
 
 def chat_with_query(messages, model):
     """
-    Uses the Groq API to generate a chat response based on a list of messages.
+    Uses the shared LLM gateway (pooled connection to the Groq API) to generate
+    a chat response based on a list of messages.
     Each message is a dict with 'role' in ['system', 'user', 'assistant']
     and a 'content' string.
     """
-    client = Groq()
-    chat_completion = client.chat.completions.create(
-        messages=messages,
-        model=model
-    )
-    return chat_completion.choices[0].message.content
+    return get_gateway().chat(messages, model, call_type="chat")
+
+
+def stream_chat_with_query(messages, model):
+    """
+    Same as chat_with_query, but yields the response text in pieces as the
+    model generates it.
+    """
+    return get_gateway().stream_chat(messages, model, call_type="chat")
 
 
+def llm_metrics():
+    return get_gateway().metrics()
@@ -0,0 +1,282 @@
+"""
+Per-session append-only journal of conversation state.
+
+Each session has its own JSON Lines file in JOURNAL_DIR. A session's
+journal starts with a snapshot of the whole state and then holds one
+record per change: a message, a risk score or a mood report. So a turn
+writes a few short lines, however long the conversation is. Writes are
+buffered and a background thread appends them and fsyncs each file once
+every JOURNAL_FSYNC_INTERVAL_MS (group commit). Once a journal has
+JOURNAL_COMPACT_RECORDS records, it is replaced by a fresh snapshot, which
+is written to a temporary file and renamed into place. load() rebuilds a
+session from its last snapshot and the records after it, and ignores a
+torn last record left by a crash.
+
+    python conversation_journal.py <session_id>
+
+prints a session rebuilt from its journal.
+"""
+import argparse
+import atexit
+import hashlib
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+
+from emotion_trends import EmotionSeries
+from session_store import decode_state, encode_state
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_DIR = os.environ.get("JOURNAL_DIR", "conversation_journal")
+# A crash loses at most this much of the most recent conversation.
+JOURNAL_FSYNC_INTERVAL_MS = float(os.environ.get("JOURNAL_FSYNC_INTERVAL_MS", "200"))
+JOURNAL_FSYNC_BATCH = int(os.environ.get("JOURNAL_FSYNC_BATCH", "256"))
+JOURNAL_COMPACT_RECORDS = int(os.environ.get("JOURNAL_COMPACT_RECORDS", "500"))
+
+_SAFE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _mood_scores(series, row):
+    """{emotion: score} for one row of an EmotionSeries, without the emotions it has no score for."""
+    return {label: float(value) for label, value in zip(series.labels, series.values[row].tolist())
+            if not math.isnan(value)}
+
+
+class Cursor:
+    """How much of a session's state is already in its journal."""
+
+    def __init__(self, state, records):
+        self.messages = len(state.get("messages", []))
+        timeline = state.get("risk_timeline")
+        self.risk_timestamp = getattr(timeline, "last_timestamp", None)
+        self.moods = len(state.get("emotion_series") or ())
+        self.records = records
+
+
+class ConversationJournal:
+    """
+    Journals conversation states (dicts with "messages" and optionally
+    "risk_timeline" and "emotion_series", as kept by the Gradio app).
+
+    append() compares a state with what was journaled for the session before
+    and queues records for what is new; messages are never changed once
+    added, so only their count is tracked. Records are serialised when they
+    are queued, so later changes by the caller can't race the writer.
+    """
+
+    def __init__(self, directory=JOURNAL_DIR, fsync_interval_ms=JOURNAL_FSYNC_INTERVAL_MS,
+                 fsync_batch=JOURNAL_FSYNC_BATCH, compact_records=JOURNAL_COMPACT_RECORDS):
+        self.directory = directory
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.fsync_batch = fsync_batch
+        self.compact_records = compact_records
+        self._cursors = {}
+        # session id -> (lines, replace the file with them)
+        self._pending = {}
+        self._pending_lines = 0
+        self._lock = threading.Lock()
+        # Held while writing, so a flush from close() or load() can't interleave with the writer's.
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self.records_written = 0
+        self.bytes_written = 0
+        self.fsyncs = 0
+        self.compactions = 0
+        os.makedirs(directory, exist_ok=True)
+
+        self._writer = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def path(self, session_id):
+        # Session ids come from clients; anything unusual is hashed into a safe file name.
+        name = session_id if _SAFE_ID_RE.match(session_id) else hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.jsonl")
+
+    def append(self, session_id, state):
+        """Queues records for everything in state that isn't journaled yet."""
+        with self._lock:
+            cursor = self._cursors.get(session_id)
+        if cursor is None and os.path.exists(self.path(session_id)):
+            # First write since the process started: carry on from the journal on disk.
+            self.load(session_id)
+            with self._lock:
+                cursor = self._cursors.get(session_id)
+        if cursor is None or cursor.records >= self.compact_records:
+            if cursor is not None:
+                self.compactions += 1
+            snapshot = encode_state({"type": "snapshot", "state": state})
+            self._queue(session_id, [snapshot], Cursor(state, 1), replace=True)
+            return
+
+        lines = [encode_state({"type": "message", **message}) for message in state["messages"][cursor.messages:]]
+        timeline = state.get("risk_timeline")
+        if timeline is not None and timeline.last_timestamp != cursor.risk_timestamp:
+            new_scores = []
+            # Newest first, stopping at the last score already journaled.
+            for ts, score in reversed(timeline.history):
+                if cursor.risk_timestamp is not None and ts <= cursor.risk_timestamp:
+                    break
+                new_scores.append((ts, score))
+            lines += [encode_state({"type": "risk", "score": score, "ts": ts}) for ts, score in reversed(new_scores)]
+        series = state.get("emotion_series")
+        if series is not None:
+            for row in range(cursor.moods, len(series)):
+                lines.append(encode_state({"type": "mood", "scores": _mood_scores(series, row),
+                                           "ts": float(series.timestamps[row])}))
+        if lines:
+            updated = Cursor(state, cursor.records + len(lines))
+            self._queue(session_id, lines, updated, replace=False)
+
+    def _queue(self, session_id, lines, cursor, replace):
+        with self._lock:
+            queued, queued_replace = self._pending.get(session_id, ([], False))
+            if replace:
+                # A snapshot supersedes whatever was still waiting for this session.
+                self._pending_lines -= len(queued)
+                queued, queued_replace = [], True
+            self._pending[session_id] = (queued + lines, queued_replace)
+            self._pending_lines += len(lines)
+            self._cursors[session_id] = cursor
+            if self._pending_lines >= self.fsync_batch:
+                self._wake.set()
+
+    def flush(self):
+        """Writes every queued record and fsyncs each journal written to once."""
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending, self._pending_lines = self._pending, {}, 0
+            for session_id, (lines, replace) in batch.items():
+                data = ("\n".join(lines) + "\n").encode("utf-8")
+                try:
+                    if replace:
+                        self._replace(self.path(session_id), data)
+                    else:
+                        with open(self.path(session_id), "ab") as f:
+                            f.write(data)
+                            f.flush()
+                            os.fsync(f.fileno())
+                except OSError:
+                    logger.exception(f"Journal write failed for session {session_id}")
+                    # The next append() re-reads the journal, so whatever is missing from it is written again.
+                    with self._lock:
+                        self._cursors.pop(session_id, None)
+                    continue
+                self.fsyncs += 1
+                self.records_written += len(lines)
+                self.bytes_written += len(data)
+
+    def _replace(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        # Make the rename itself durable (not possible on Windows).
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def load(self, session_id):
+        """Rebuilds a session's state from its journal; None if it has none."""
+        self.flush()
+        path = self.path(session_id)
+        if not os.path.exists(path):
+            return None
+        with self._write_lock:
+            with open(path, "rb") as f:
+                data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                # A crash mid-append; cut the partial record off so the next append starts on a fresh line.
+                logger.warning(f"Dropping a torn last record from {path}")
+                os.truncate(path, end)
+        state, records = None, 0
+        for number, line in enumerate(data[:end].decode("utf-8").splitlines(), 1):
+            try:
+                record = decode_state(line)
+            except ValueError:
+                raise ValueError(f"Corrupt journal record at {path}:{number}")
+            records += 1
+            kind = record.pop("type")
+            if kind == "snapshot":
+                state, records = record["state"], 1
+            elif state is None:
+                raise ValueError(f"Journal {path} doesn't start with a snapshot")
+            elif kind == "message":
+                state["messages"].append(record)
+            elif kind == "risk":
+                state["risk_timeline"].add(record["score"], record["ts"])
+            elif kind == "mood":
+                state.setdefault("emotion_series", EmotionSeries()).append(record["scores"], record["ts"])
+        if state is not None:
+            with self._lock:
+                self._cursors[session_id] = Cursor(state, records)
+        return state
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.fsync_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending = self._pending_lines
+            sessions = len(self._cursors)
+        return {
+            "directory": self.directory,
+            "sessions": sessions,
+            "pending_records": pending,
+            "records_written": self.records_written,
+            "bytes_written": self.bytes_written,
+            "fsyncs": self.fsyncs,
+            "compactions": self.compactions,
+        }
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("session_id")
+    parser.add_argument("--dir", default=JOURNAL_DIR)
+    args = parser.parse_args()
+
+    journal = ConversationJournal(args.dir)
+    started = time.perf_counter()
+    state = journal.load(args.session_id)
+    if state is None:
+        raise SystemExit(f"No journal for session {args.session_id} in {args.dir}")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for message in state["messages"]:
+        print(f"{message['role']}: {message['content']}")
+    timeline = state.get("risk_timeline")
+    if timeline is not None:
+        print(f"\nrisk: {timeline.summary()}")
+    print(f"\nrebuilt {len(state['messages'])} messages from {journal.path(args.session_id)} in {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
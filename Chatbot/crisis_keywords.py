@@ -0,0 +1,221 @@
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+CRISIS_LEXICON_PATH = os.environ.get(
+    "CRISIS_LEXICON_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "crisis_lexicon.txt")
+)
+
+# kind is "crisis" (forces the boosted score), "suggestive" (a ~ entry) or
+# "negated" (a crisis phrase right after a negation); the last two are left to the models.
+CrisisMatch = namedtuple("CrisisMatch", ["phrase", "entry", "kind"])
+
+# Lexicon entries starting with this are suggestive only.
+SUGGESTIVE_PREFIX = "~"
+# A match is negated when one of these is among the NEGATION_WINDOW words
+# before it, with no contrast word ("but", "just", ...) and no start of a new
+# clause ("and", "because", a new "I") in between: "I'm not suicidal", "never
+# thought about suicide", but not "not just sad, suicidal" or "I am not okay
+# and I want to die".
+NEGATION_WINDOW = 3
+_NEGATIONS = {"not", "never", "no", "dont", "doesnt", "didnt", "wont", "wouldnt", "isnt", "arent", "wasnt",
+              "werent", "havent", "hasnt", "hadnt", "nor", "without"}
+_CONTRASTS = {"but", "just", "though", "although", "yet", "except", "still"}
+_CLAUSE_STARTS = {"and", "so", "because", "i", "im"}
+
+# Apostrophes are dropped so "don't" and "dont" normalise the same way.
+_APOSTROPHES = str.maketrans("", "", "'‘’ʼ`")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+_CLAUSE_BREAK_RE = re.compile(r"[.,;:!?\n]")
+
+
+def _separator(match):
+    return "\n" if _CLAUSE_BREAK_RE.search(match.group(0)) else " "
+
+
+def normalize(text, clauses=False):
+    """
+    Normalises text for phrase matching: Unicode compatibility forms folded,
+    accents stripped, casefolded, apostrophes removed, every other run of
+    punctuation/whitespace collapsed to a single space. With clauses, runs
+    holding clause punctuation become a newline instead, which phrases match
+    like a space but negation doesn't reach across.
+    """
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.casefold().translate(_APOSTROPHES)
+    return _NON_WORD_RE.sub(_separator if clauses else " ", text).strip()
+
+
+def expand_pattern(pattern):
+    """
+    Expands one lexicon line into every phrase it stands for.
+
+    (a|b) is an alternation and [x] an optional part; both can nest, e.g.
+    "(kill|end) my(self| own life)" -> kill myself, kill my own life, end myself, end my own life.
+    """
+    variants, rest = _expand_sequence(pattern, 0)
+    if rest != len(pattern):
+        raise ValueError(f"Unbalanced brackets in lexicon pattern: {pattern!r}")
+    return variants
+
+
+def _expand_sequence(pattern, i, stop=""):
+    variants = [""]
+    while i < len(pattern) and pattern[i] not in stop:
+        ch = pattern[i]
+        if ch in "([":
+            close = ")" if ch == "(" else "]"
+            options = []
+            while True:
+                option, i = _expand_sequence(pattern, i + 1, stop="|" + close)
+                options.extend(option)
+                if i >= len(pattern):
+                    raise ValueError(f"Unbalanced brackets in lexicon pattern: {pattern!r}")
+                if pattern[i] == close:
+                    break
+            if close == "]":
+                options.append("")
+            variants = [v + o for v in variants for o in options]
+            i += 1
+        else:
+            variants = [v + ch for v in variants]
+            i += 1
+    return variants, i
+
+
+def load_lexicon(path=CRISIS_LEXICON_PATH):
+    """
+    Returns {normalised phrase: lexicon entry it came from} for every expanded
+    phrase in the file. Suggestive entries keep their ~ prefix.
+    """
+    phrases = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = line.strip()
+            if not entry or entry.startswith("#"):
+                continue
+            for variant in expand_pattern(entry.lstrip(SUGGESTIVE_PREFIX)):
+                phrase = normalize(variant)
+                if phrase:
+                    phrases.setdefault(phrase, entry)
+    return phrases
+
+
+def _trie_regex(node):
+    """Turns a character trie into a regex that prefers the longest phrase at each position."""
+    end = "" in node
+    branches = [("[ \n]" if ch == " " else re.escape(ch)) + _trie_regex(child)
+                for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 and not end else "(?:" + "|".join(branches) + ")"
+    if end:
+        body = (body if body.startswith("(?:") else "(?:" + body + ")") + "?"
+    return body
+
+
+class CrisisMatcher:
+    """
+    Matches a whole crisis lexicon against a message in a single pass.
+
+    All phrases are folded into one character trie and compiled into a single
+    regular expression bounded by word edges, so the message is scanned once by
+    the C regex engine regardless of how many phrases the lexicon holds.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = dict(phrases)
+        trie = {}
+        for phrase in self.phrases:
+            node = trie
+            for ch in phrase:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+        self._regex = re.compile(r"(?<!\w)" + (_trie_regex(trie) or r"(?!)") + r"(?!\w)")
+
+    @classmethod
+    def from_file(cls, path=CRISIS_LEXICON_PATH):
+        return cls(load_lexicon(path))
+
+    def find(self, text):
+        """
+        Returns a CrisisMatch for each distinct phrase found in text, in order
+        of appearance. A phrase found both negated and not is reported once,
+        with its strongest kind.
+        """
+        normalized = normalize(text, clauses=True)
+        seen = {}
+        for m in self._regex.finditer(normalized):
+            phrase = m.group(0).replace("\n", " ")
+            entry = self.phrases[phrase]
+            if entry.startswith(SUGGESTIVE_PREFIX):
+                kind = "suggestive"
+            elif _negated(normalized[:m.start()], phrase):
+                kind = "negated"
+            else:
+                kind = "crisis"
+            if phrase not in seen or kind == "crisis":
+                seen[phrase] = CrisisMatch(phrase, entry, kind)
+        return list(seen.values())
+
+    def __len__(self):
+        return len(self.phrases)
+
+
+def _negated(before, phrase):
+    """Whether the normalised text just before a match (in the same clause) negates it."""
+    if phrase.split(" ", 1)[0] in _CLAUSE_STARTS:
+        # The phrase starts a clause of its own ("i want to die").
+        return False
+    before = before.rsplit("\n", 1)[-1]
+    for word in reversed(before.rsplit(None, NEGATION_WINDOW)[-NEGATION_WINDOW:]):
+        if word in _CONTRASTS or word in _CLAUSE_STARTS:
+            return False
+        if word in _NEGATIONS:
+            return True
+    return False
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher():
+    """Shared matcher, compiled from CRISIS_LEXICON_PATH on first use."""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = CrisisMatcher.from_file()
+                logger.info(f"Crisis lexicon loaded: {len(_matcher)} phrases")
+    return _matcher
+
+
+def match_crisis_phrases(text):
+    """Returns the CrisisMatch of every lexicon phrase found in text (empty list when none)."""
+    return get_matcher().find(text)
+
+
+# Example usage: lexicon size and matching cost on a long message
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    matcher = get_matcher()
+    print(f"Compiled {len(matcher)} phrases in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    message = ("I've been feeling tired and stressed at work, my manager keeps piling things on. " * 60
+               + "Honestly I just want to end it all, I can't go on.")
+    runs = 200
+    start = time.perf_counter()
+    for _ in range(runs):
+        matches = matcher.find(message)
+    elapsed = (time.perf_counter() - start) / runs
+    print(f"{len(message)} chars matched in {elapsed * 1000:.3f} ms: {matches}")
@@ -0,0 +1,198 @@
+import csv
+import io
+import time
+
+import numpy as np
+
+# Steps of the rolling mean, and how far (total variation distance, 0-1) a
+# report must move from the rolling mean before it to count as a sudden shift.
+TREND_WINDOW = 3
+TREND_SHIFT_THRESHOLD = 0.3
+
+
+def is_mood_report(report):
+    """The remote client returns error strings (starting with a warning sign) instead of raising."""
+    return isinstance(report, str) and not report.startswith(("⚠️", "🚨"))
+
+
+def format_mood_report(job_id, text, labels, scores):
+    """Writes scores in the iMentiv CSV report shape: id,text,<Emotion>,... then one data row."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["id", "text"] + labels)
+    writer.writerow([job_id, text] + [f"{score:.4f}" for score in scores])
+    return out.getvalue()
+
+
+def parse_mood_report(report):
+    """Returns {emotion: score} from a CSV report, or None if it isn't one."""
+    if not is_mood_report(report):
+        return None
+    rows = list(csv.reader(io.StringIO(report.strip())))
+    if len(rows) < 2 or len(rows[0]) < 3:
+        return None
+    emotions = rows[0][2:]
+    try:
+        # Counted from the end in case an unquoted text column contains commas.
+        scores = [float(x) for x in rows[1][len(rows[1]) - len(emotions):]]
+    except ValueError:
+        return None
+    return dict(zip(emotions, scores))
+
+
+def top_emotions(scores, count=3):
+    """Formats the strongest emotions as 'Sadness: 61.20%, Fear: 20.00%, ...'."""
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:count]
+    return ", ".join(f"{emotion}: {score * 100:.2f}%" for emotion, score in ranked)
+
+
+def process_mood_report(report_str):
+    """Turns a CSV mood report into the short summary that goes into the prompt."""
+    scores = parse_mood_report(report_str)
+    if scores is None:
+        return "Invalid mood report format"
+    return top_emotions(scores)
+
+
+def record_mood_report(state, report, note=""):
+    """
+    Adds a mood report to a conversation: its scores go into
+    state["emotion_series"] and its top-3 summary into the prompt as a
+    "Mood Report:" system note. Returns (summary, scores or None).
+    """
+    scores = parse_mood_report(report)
+    if scores is not None:
+        state.setdefault("emotion_series", EmotionSeries()).append(scores)
+    summary = top_emotions(scores) if scores is not None else "Invalid mood report format"
+    state["messages"].append({"role": "system", "content": f"Mood Report: {summary}{note}"})
+    return summary, scores
+
+
+class EmotionSeries:
+    """
+    Append-only per-session series of emotion score vectors.
+
+    Scores are kept in a float32 matrix (one row per mood report, one column
+    per emotion) with a float64 vector of timestamps. Both grow by doubling,
+    so appends are amortised O(1). Emotions seen for the first time add a
+    column; earlier rows hold NaN for it.
+    """
+
+    def __init__(self, labels=None):
+        self.labels = list(labels or [])
+        self._values = np.empty((0, len(self.labels)), dtype=np.float32)
+        self._timestamps = np.empty(0, dtype=np.float64)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _reserve(self, rows, columns):
+        capacity, width = self._values.shape
+        if rows <= capacity and columns <= width:
+            return
+        if rows > capacity:
+            capacity = max(rows, capacity * 2, 8)
+        grown = np.full((capacity, columns), np.nan, dtype=np.float32)
+        grown[:self._count, :width] = self._values[:self._count]
+        self._values = grown
+        timestamps = np.empty(grown.shape[0], dtype=np.float64)
+        timestamps[:self._count] = self._timestamps[:self._count]
+        self._timestamps = timestamps
+
+    def append(self, scores, timestamp=None):
+        """Adds one report given as {emotion: score}."""
+        for label in scores:
+            if label not in self.labels:
+                self.labels.append(label)
+        self._reserve(self._count + 1, len(self.labels))
+        row = np.full(len(self.labels), np.nan, dtype=np.float32)
+        for i, label in enumerate(self.labels):
+            if label in scores:
+                row[i] = scores[label]
+        self._values[self._count] = row
+        self._timestamps[self._count] = time.time() if timestamp is None else timestamp
+        self._count += 1
+
+    @property
+    def values(self):
+        return self._values[:self._count]
+
+    @property
+    def timestamps(self):
+        return self._timestamps[:self._count]
+
+    def rolling_mean(self, window=TREND_WINDOW):
+        """Mean of each emotion over the last window reports at every step, ignoring missing values."""
+        values = self.values
+        present = ~np.isnan(values)
+        sums = np.cumsum(np.where(present, values, 0.0), axis=0, dtype=np.float64)
+        counts = np.cumsum(present, axis=0)
+        sums[window:] -= sums[:-window].copy()
+        counts[window:] -= counts[:-window].copy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def shifts(self, window=TREND_WINDOW, threshold=TREND_SHIFT_THRESHOLD):
+        """
+        Reports that differ sharply from the rolling mean just before them.
+
+        The distance is the total variation distance (half the L1 distance)
+        between the report and the preceding rolling mean, so 0 means the same
+        emotion mix and 1 means no overlap at all.
+        """
+        if self._count < 2:
+            return []
+        values = np.nan_to_num(self.values)
+        previous = np.nan_to_num(self.rolling_mean(window)[:-1])
+        distances = 0.5 * np.abs(values[1:] - previous).sum(axis=1)
+        shifts = []
+        for i in np.flatnonzero(distances >= threshold) + 1:
+            shifts.append({
+                "index": int(i),
+                "timestamp": float(self._timestamps[i]),
+                "distance": round(float(distances[i - 1]), 4),
+                "from": self.labels[int(np.argmax(previous[i - 1]))],
+                "to": self.labels[int(np.argmax(values[i]))],
+            })
+        return shifts
+
+    def trends(self, window=TREND_WINDOW, threshold=TREND_SHIFT_THRESHOLD):
+        """Trajectories, rolling means and sudden shifts for the clinician trend view."""
+        def columns(matrix):
+            rounded = np.round(matrix.astype(np.float64), 4)
+            return {
+                label: [None if np.isnan(v) else float(v) for v in rounded[:, i]]
+                for i, label in enumerate(self.labels)
+            }
+
+        return {
+            "count": self._count,
+            "labels": self.labels,
+            "timestamps": self.timestamps.tolist(),
+            "trajectories": columns(self.values),
+            "rolling_mean": columns(self.rolling_mean(window)),
+            "window": window,
+            "shifts": self.shifts(window, threshold),
+        }
+
+    def to_dict(self):
+        """Compact JSON-safe form; from_dict() restores the same series."""
+        values = np.round(self.values.astype(np.float64), 4)
+        return {
+            "v": 1,
+            "l": self.labels,
+            "t": [round(ts, 3) for ts in self.timestamps.tolist()],
+            "s": [[None if np.isnan(v) else v for v in row] for row in values.tolist()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        series = cls(data["l"])
+        count = len(data["t"])
+        series._reserve(count, len(series.labels))
+        if count:
+            series._values[:count] = np.array(data["s"], dtype=np.float64).astype(np.float32)
+            series._timestamps[:count] = data["t"]
+        series._count = count
+        return series
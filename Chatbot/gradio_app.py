@@ -1,102 +1,56 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-import os
 import gradio as gr
 import json
-import torch
+import logging
 import time
-import requests
-import numpy as np
-import re
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from mood_detection import text_to_mood  # your existing text_to_mood function
-
-from voice_of_the_patient import transcribe_with_groq
-from voice_of_the_doctor import text_to_speech_with_elevenlabs
-from brain_of_the_doctor import chat_with_query
-
-hf_token = os.environ.get("HF_TOKEN")
+import uuid
+from mood_backends import submit_mood  # remote iMentiv and/or local classifier, see MOOD_LOCAL_MODE
 
-#####################################
-# Helper function to process mood report CSV
-#####################################
-def process_mood_report(report_str):
-    lines = report_str.strip().splitlines()
-    if len(lines) < 2:
-        return "Invalid mood report format"
-    header = lines[0]
-    data_line = lines[1]
-    header_fields = header.split(",")
-    data_fields = data_line.split(",")
-    emotions = header_fields[2:]
-    try:
-        scores = [float(x) for x in data_fields[2:]]
-    except ValueError:
-        return "Error parsing mood scores"
-    top_indices = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:3]
-    top_emotions = []
-    for idx in top_indices:
-        emotion = emotions[idx]
-        percentage = scores[idx] * 100
-        top_emotions.append(f"{emotion}: {percentage:.2f}%")
-    return ", ".join(top_emotions)
-
-#####################################
-# Load MentalBERT (general distress model)
-#####################################
-mental_tokenizer = AutoTokenizer.from_pretrained("mental/mental-bert-base-uncased", token=hf_token)
-mental_model = AutoModelForSequenceClassification.from_pretrained("mental/mental-bert-base-uncased", token=hf_token)
-
-def analyze_mental_state(text):
-    inputs = mental_tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-    outputs = mental_model(**inputs)
-    probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-    distress_prob = probs[0][1].item()
-    return distress_prob
-
-#####################################
-# Load CNN-BiLSTM model for suicide risk (DistilBERT-based)
-#####################################
-cnn_tokenizer = AutoTokenizer.from_pretrained("AventIQ-AI/distilbert-mental-health-prediction", token=hf_token)
-cnn_model = AutoModelForSequenceClassification.from_pretrained("AventIQ-AI/distilbert-mental-health-prediction", token=hf_token)
+from segmented_transcription import get_transcriber
+from vad import apply_vad
+from tts_service import start_prerender, tts_service
+from brain_of_the_doctor import chat_with_query
+from risk_scoring import assess_risk
+from model_registry import start_warmup
+from risk_timeline import RiskTimeline
+from history_manager import history_manager
+from emotion_trends import EmotionSeries, record_mood_report
+from turn_pipeline import TurnPipeline, time_stage
+from conversation_journal import ConversationJournal
 
-def analyze_suicide_tendencies(text):
-    inputs = cnn_tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-    outputs = cnn_model(**inputs)
-    probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-    suicide_risk = probs[0][1].item()
-    return suicide_risk
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
 
 #####################################
-# Combined Risk Score Calculation (with keyword boosting)
-#####################################
-def combined_risk_score(text, mental_scale=1.0, suicide_threshold=0.5, boost_value=0.8):
-    critical_keywords = ["self harm", "suicide", "kill myself", "end my life", "life has no meaning"]
-    text_lower = text.lower()
-    if any(keyword in text_lower for keyword in critical_keywords):
-        return boost_value
-    mental_score = analyze_mental_state(text) * mental_scale
-    suicide_score = analyze_suicide_tendencies(text)
-    if suicide_score >= suicide_threshold:
-        combined = suicide_score
-    else:
-        combined = (mental_score + suicide_score) / 2
-    return combined
-
-#####################################
-# Sliding window for recent risk scores
+# Streaming timeline of recent risk scores
 #####################################
 WINDOW_SIZE = 5
-def update_risk_window(window, new_score, window_size=WINDOW_SIZE):
-    window.append(new_score)
-    if len(window) > window_size:
-        window.pop(0)
-    avg_score = sum(window) / len(window)
-    return window, avg_score
+
+def get_risk_timeline(conversation_state):
+    timeline = conversation_state.get("risk_timeline")
+    if isinstance(timeline, dict):
+        timeline = RiskTimeline.from_dict(timeline)
+    elif timeline is None:
+        # Older states kept a plain list of recent scores
+        timeline = RiskTimeline.from_scores(conversation_state.pop("risk_window", []), WINDOW_SIZE)
+    conversation_state["risk_timeline"] = timeline
+    return timeline
+
+def _json_default(obj):
+    if isinstance(obj, (RiskTimeline, EmotionSeries)):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 RISK_THRESHOLD = 0.7
 
+# Mood analysis and risk scoring run concurrently for every turn
+turn_pipeline = TurnPipeline(
+    mood_submit=submit_mood,
+    risk_fn=assess_risk,
+)
+
 #####################################
 # Conversation Handling
 #####################################
@@ -121,9 +75,13 @@ def format_conversation(state):
             chat_log.append(f"(System): {msg['content']}")
     return "\n".join(chat_log)
 
-def save_conversation_history(state, filename="conversation_history.json"):
-    with open(filename, "w") as f:
-        json.dump(state, f, indent=4)
+# Each session's messages, risk scores and mood reports, appended to its own journal
+conversation_journal = ConversationJournal()
+
+def log_state(state):
+    # Serialising the whole state gets slow as the conversation grows, so it is only done for debug logging.
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Conversation State:\n%s", json.dumps(state, indent=4, default=_json_default))
 
 #####################################
 # Function to export all user prompts as a JSON file
@@ -138,22 +96,36 @@ def export_user_prompts(conversation_state):
 #####################################
 # Main Process Function
 #####################################
-def process_inputs(audio_filepath, chat_input, conversation_state):
+def process_inputs(recorded_audio, chat_input, conversation_state):
     if not conversation_state or not isinstance(conversation_state, dict):
-        conversation_state = {"messages": [SYSTEM_MESSAGE], "risk_window": []}
+        conversation_state = {
+            "messages": [SYSTEM_MESSAGE],
+            "risk_timeline": RiskTimeline(WINDOW_SIZE),
+            "emotion_series": EmotionSeries(),
+        }
     
-    if not audio_filepath and (not chat_input or chat_input.strip() == ""):
+    if recorded_audio is None and (not chat_input or chat_input.strip() == ""):
         conversation_text = format_conversation(conversation_state)
-        print("Conversation State:\n", json.dumps(conversation_state, indent=4))
-        return conversation_text, None, conversation_state, False  # False: extra button not shown
+        log_state(conversation_state)
+        return conversation_text, None, conversation_state, False, None  # False: extra button not shown
 
+    turn_start = time.perf_counter()
+    timings = {}
     speech_to_text = ""
-    if audio_filepath:
-        speech_to_text = transcribe_with_groq(
-            GROQ_API_KEY=os.environ.get("GROQ_API_KEY"),
-            audio_filepath=audio_filepath,
-            stt_model="whisper-large-v3"
-        ).strip()
+    if recorded_audio is not None:
+        # Gradio hands over (sample_rate, int16 samples); they go to the speech
+        # backend from memory. Long recordings are split at pauses and
+        # transcribed in parallel.
+        sample_rate, samples = recorded_audio
+        # Silence around the speech and long pauses are cut before upload.
+        with time_stage(timings, "vad"):
+            samples, vad_report = apply_vad(samples, sample_rate)
+        logger.info(f"Voice activity detection: {vad_report.to_dict()}")
+        if len(samples):
+            with time_stage(timings, "stt"):
+                transcription = get_transcriber().transcribe(samples, sample_rate)
+            speech_to_text = transcription.text.strip()
+            logger.info(f"STT stages (ms): {transcription.timings}, bytes: {transcription.bytes}")
     
     user_message = ""
     if speech_to_text:
@@ -165,19 +137,22 @@ def process_inputs(audio_filepath, chat_input, conversation_state):
     
     if not user_message:
         conversation_text = format_conversation(conversation_state)
-        print("Conversation State:\n", json.dumps(conversation_state, indent=4))
-        return conversation_text, None, conversation_state, False
-
-    # Run mood analysis and append mood report.
-    mood_report_raw = text_to_mood(user_message)
-    processed_mood = process_mood_report(mood_report_raw)
-    conversation_state["messages"].append({"role": "system", "content": f"Mood Report: {processed_mood}"})
+        log_state(conversation_state)
+        return conversation_text, None, conversation_state, False, timings
+
+    # Run mood analysis and risk scoring in parallel; a late mood report arrives with the next turn.
+    session_id = conversation_state.setdefault("session_id", uuid.uuid4().hex)
+    analysis = turn_pipeline.analyze(session_id, user_message)
+    timings.update(analysis.timings)
+    for report in analysis.carried_moods:
+        record_mood_report(conversation_state, report, note=" (previous message)")
+    if analysis.mood is not None:
+        record_mood_report(conversation_state, analysis.mood)
     
     # Evaluate risk score.
-    risk_score = combined_risk_score(user_message)
-    window, avg_risk = update_risk_window(conversation_state.get("risk_window", []), risk_score)
-    conversation_state["risk_window"] = window
-    print(f"New combined risk score: {risk_score:.2f}, Average over last {WINDOW_SIZE} messages: {avg_risk:.2f}")
+    risk_score = analysis.risk["score"]
+    avg_risk = get_risk_timeline(conversation_state).add(risk_score)
+    logger.info(f"New combined risk score: {risk_score:.2f}, Average over last {WINDOW_SIZE} messages: {avg_risk:.2f}")
     
     if avg_risk >= RISK_THRESHOLD:
         alert_msg = "CRITICAL ALERT: High suicide risk detected. Immediate intervention is recommended."
@@ -185,20 +160,24 @@ def process_inputs(audio_filepath, chat_input, conversation_state):
     
     conversation_state["messages"].append({"role": "user", "content": user_message})
     
-    doctor_response = chat_with_query(
-        messages=conversation_state["messages"],
-        model="llama-3.2-11b-vision-preview"
-    )
+    prompt_messages, prompt_tokens = history_manager.build_prompt(conversation_state)
+    logger.info(f"Prompt tokens before/after compaction: {prompt_tokens['before']}/{prompt_tokens['after']}")
+    with time_stage(timings, "llm"):
+        doctor_response = chat_with_query(
+            messages=prompt_messages,
+            model="llama-3.2-11b-vision-preview"
+        )
     conversation_state["messages"].append({"role": "assistant", "content": doctor_response})
     
-    audio_response_path = "final.mp3"
-    text_to_speech_with_elevenlabs(
-        input_text=doctor_response,
-        output_filepath=audio_response_path
-    )
+    # Unique per text/voice, so concurrent users don't overwrite each other's audio; the browser plays it.
+    with time_stage(timings, "tts"):
+        audio_response_path = tts_service.render_to_file(doctor_response)
+    timings["total"] = round((time.perf_counter() - turn_start) * 1000, 1)
+    logger.info(f"Turn timings (ms): {timings}")
     
-    save_conversation_history(conversation_state)
-    print("Conversation State:\n", json.dumps(conversation_state, indent=4))
+    # One short record per new message, score and mood report; no rewrite of the whole conversation.
+    conversation_journal.append(session_id, conversation_state)
+    log_state(conversation_state)
     
     conversation_text = format_conversation(conversation_state)
     
@@ -206,32 +185,39 @@ def process_inputs(audio_filepath, chat_input, conversation_state):
     user_count = sum(1 for m in conversation_state["messages"] if m["role"] == "user")
     show_button = user_count >= 2
     
-    return conversation_text, audio_response_path, conversation_state, show_button
+    return conversation_text, audio_response_path, conversation_state, show_button, timings
+
+#####################################
+# Start loading the risk models (and pre-rendering fixed TTS phrases) while the UI comes up
+#####################################
+start_warmup()
+start_prerender()
 
 #####################################
 # Gradio Interface using Blocks for dynamic extra button
 #####################################
 with gr.Blocks() as demo:
     with gr.Row():
-        audio_input = gr.Audio(sources=["microphone"], type="filepath", label="Voice Input")
+        audio_input = gr.Audio(sources=["microphone"], type="numpy", label="Voice Input")
         chat_input = gr.Textbox(label="Chat Input", placeholder="Type your message here...")
     state = gr.State(value={})
     submit_btn = gr.Button("Submit")
     conversation_output = gr.Textbox(label="Conversation", lines=10)
     response_audio = gr.Audio(label="Doctor's Response (Audio)")
     extra_btn = gr.Button("Get Your Diagnosis Report", visible=False)
+    timings_output = gr.JSON(label="Turn Timings (ms)")
     file_output = gr.File(label="Exported User Prompts")
     
     # Process inputs and update outputs.
-    def update_all(audio_filepath, chat_input, state):
-        conv_text, audio_path, new_state, show_btn = process_inputs(audio_filepath, chat_input, state)
+    def update_all(recorded_audio, chat_input, state):
+        conv_text, audio_path, new_state, show_btn, timings = process_inputs(recorded_audio, chat_input, state)
         extra_update = gr.update(visible=show_btn)
-        return conv_text, audio_path, new_state, extra_update
+        return conv_text, audio_path, new_state, extra_update, timings
 
     submit_btn.click(
         update_all,
         inputs=[audio_input, chat_input, state],
-        outputs=[conversation_output, response_audio, state, extra_btn]
+        outputs=[conversation_output, response_audio, state, extra_btn, timings_output]
     )
     
     # When extra button is clicked, export user prompts.
@@ -0,0 +1,157 @@
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Prompt budget for the conversation sent to the LLM, counted locally.
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "3000"))
+# Most recent user/doctor turns that are always sent verbatim (when they fit).
+HISTORY_KEEP_TURNS = int(os.environ.get("HISTORY_KEEP_TURNS", "6"))
+# Share of the budget the rolling summary of older turns may use.
+HISTORY_SUMMARY_SHARE = float(os.environ.get("HISTORY_SUMMARY_SHARE", "0.25"))
+
+MOOD_PREFIX = "Mood Report:"
+ALERT_PREFIX = "CRITICAL ALERT:"
+SUMMARY_PREFIX = "Summary of earlier conversation:"
+
+# Chat templates add a few tokens per message for the role markers.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text):
+    """
+    Estimates the number of BPE tokens in text without calling a tokenizer.
+
+    Every punctuation mark counts as one token and every word as one token per
+    started six characters, which tracks Llama-style tokenizers on English
+    chat text to within roughly 10-15%.
+    """
+    return sum(1 + (len(piece) - 1) // 6 for piece in _TOKEN_RE.findall(text))
+
+
+def count_message_tokens(messages):
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def _first_sentence(text, max_words=30):
+    sentence = _SENTENCE_RE.split(text.strip(), maxsplit=1)[0]
+    words = sentence.split()
+    if len(words) > max_words:
+        sentence = " ".join(words[:max_words]) + "..."
+    return sentence
+
+
+def split_turns(messages):
+    """
+    Splits a transcript into (system prompt, turns).
+
+    Each turn is a dict with the system notes injected before the user message
+    (mood reports, alerts), the user message and the doctor's reply (None for
+    the turn currently being answered).
+    """
+    system_prompt = None
+    rest = messages
+    if messages and messages[0]["role"] == "system":
+        system_prompt, rest = messages[0], messages[1:]
+    turns = []
+    notes = []
+    for message in rest:
+        if message["role"] == "system":
+            notes.append(message)
+        elif message["role"] == "user":
+            turns.append({"notes": notes, "user": message, "assistant": None})
+            notes = []
+        elif message["role"] == "assistant" and turns:
+            turns[-1]["assistant"] = message
+    if notes:
+        # Notes with no user message yet belong to the turn about to start.
+        turns.append({"notes": notes, "user": None, "assistant": None})
+    return system_prompt, turns
+
+
+class HistoryManager:
+    """
+    Builds the prompt for each LLM call from the full transcript within a token budget.
+
+    The system prompt and the last keep_turns turns are sent verbatim. Mood
+    reports are only kept for the newest turn and only the most recent alert
+    in the verbatim window is kept. Older turns are folded into a rolling,
+    extractive summary stored on the conversation state, so each turn is only
+    summarised once. The full transcript in state["messages"] is never modified.
+    """
+
+    def __init__(self, token_budget=HISTORY_TOKEN_BUDGET, keep_turns=HISTORY_KEEP_TURNS,
+                 summary_share=HISTORY_SUMMARY_SHARE):
+        self.token_budget = token_budget
+        self.keep_turns = max(1, keep_turns)
+        self.summary_share = summary_share
+
+    def build_prompt(self, state):
+        """Returns (messages to send, {"before": tokens, "after": tokens})."""
+        messages = state["messages"]
+        system_prompt, turns = split_turns(messages)
+        summary = state.setdefault("history_summary", {"lines": [], "turns": 0})
+
+        # Turns already folded into the summary (by an earlier call with a tighter fit) aren't sent again verbatim.
+        keep = min(self.keep_turns, len(turns), max(1, len(turns) - summary["turns"]))
+        while True:
+            self._summarise(summary, turns[:len(turns) - keep])
+            prompt = self._assemble(system_prompt, summary, turns[len(turns) - keep:])
+            if count_message_tokens(prompt) <= self.token_budget or keep <= 1:
+                break
+            keep -= 1
+
+        stats = {"before": count_message_tokens(messages), "after": count_message_tokens(prompt)}
+        logger.info(f"Prompt tokens: {stats['before']} -> {stats['after']} ({keep} verbatim turns)")
+        return prompt, stats
+
+    def _summarise(self, summary, old_turns):
+        # Only turns that haven't been summarised yet are added to the rolling summary.
+        for turn in old_turns[summary["turns"]:]:
+            parts = []
+            if turn["user"] is not None:
+                parts.append(f"Patient: {_first_sentence(turn['user']['content'])}")
+            if turn["assistant"] is not None:
+                parts.append(f"Doctor: {_first_sentence(turn['assistant']['content'])}")
+            if any(note["content"].startswith(ALERT_PREFIX) for note in turn["notes"]):
+                parts.append("(high risk alert raised)")
+            if parts:
+                summary["lines"].append(" ".join(parts))
+        summary["turns"] = max(summary["turns"], len(old_turns))
+
+        limit = int(self.token_budget * self.summary_share)
+        while summary["lines"] and count_tokens(" ".join(summary["lines"])) > limit:
+            summary["lines"].pop(0)
+
+    def _assemble(self, system_prompt, summary, recent_turns):
+        prompt = [system_prompt] if system_prompt is not None else []
+        if summary["lines"]:
+            prompt.append({"role": "system", "content": SUMMARY_PREFIX + " " + " ".join(summary["lines"])})
+
+        last_alert = None
+        for turn in recent_turns:
+            for note in turn["notes"]:
+                if note["content"].startswith(ALERT_PREFIX):
+                    last_alert = note
+
+        for i, turn in enumerate(recent_turns):
+            newest = i == len(recent_turns) - 1
+            for note in turn["notes"]:
+                content = note["content"]
+                if content.startswith(MOOD_PREFIX) and not newest:
+                    continue
+                if content.startswith(ALERT_PREFIX) and note is not last_alert:
+                    continue
+                prompt.append(note)
+            if turn["user"] is not None:
+                prompt.append(turn["user"])
+            if turn["assistant"] is not None:
+                prompt.append(turn["assistant"])
+        return prompt
+
+
+history_manager = HistoryManager()
@@ -0,0 +1,159 @@
+import logging
+import os
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Which backend the risk models run on:
+#   torch - full precision PyTorch under torch.inference_mode() (default)
+#   int8  - PyTorch dynamic int8 quantisation of the Linear layers
+#   onnx  - exported once to ONNX and run with ONNX Runtime on CPU
+RISK_BACKEND = os.environ.get("RISK_BACKEND", "torch")
+ONNX_CACHE_DIR = os.environ.get("ONNX_CACHE_DIR", "onnx_models")
+
+# Inputs longer than RISK_MAX_LENGTH tokens are split into windows of that
+# size overlapping by RISK_WINDOW_STRIDE tokens instead of being truncated.
+RISK_MAX_LENGTH = int(os.environ.get("RISK_MAX_LENGTH", "512"))
+RISK_WINDOW_STRIDE = int(os.environ.get("RISK_WINDOW_STRIDE", "128"))
+
+
+def encode_windows(tokenizer, texts, return_tensors):
+    """
+    Tokenizes texts into overlapping windows, all padded into one batch.
+
+    Returns the encoded batch and, for each window, the index of the text it
+    came from. Short texts produce exactly one window.
+    """
+    inputs = tokenizer(
+        texts,
+        return_tensors=return_tensors,
+        truncation=True,
+        padding=True,
+        max_length=RISK_MAX_LENGTH,
+        stride=RISK_WINDOW_STRIDE,
+        return_overflowing_tokens=True,
+    )
+    sample_mapping = [int(i) for i in inputs.pop("overflow_to_sample_mapping")]
+    return inputs, sample_mapping
+
+
+def group_windows(window_probs, sample_mapping, count):
+    """Regroups a flat list of window scores into one list per input text."""
+    grouped = [[] for _ in range(count)]
+    for prob, sample in zip(window_probs, sample_mapping):
+        grouped[sample].append(prob)
+    return grouped
+
+
+class TorchBackend:
+    """Runs a Hugging Face sequence classifier in PyTorch without building autograd graphs."""
+
+    name = "torch"
+
+    def __init__(self, tokenizer, model):
+        self.tokenizer = tokenizer
+        self.model = model.eval()
+
+    def window_probs(self, texts):
+        """Returns the class-1 probability of every window of every text, scored in one padded batch."""
+        inputs, sample_mapping = encode_windows(self.tokenizer, texts, "pt")
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits
+        probs = torch.nn.functional.softmax(logits, dim=-1)[:, 1].tolist()
+        return group_windows(probs, sample_mapping, len(texts))
+
+
+class Int8Backend(TorchBackend):
+    """Dynamic int8 quantisation: Linear weights are stored as int8, activations quantised per batch."""
+
+    name = "int8"
+
+    def __init__(self, tokenizer, model):
+        quantized = torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(tokenizer, quantized)
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Wraps a classifier so the ONNX graph takes positional tensors and returns plain logits."""
+
+    def __init__(self, model, input_names):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *tensors):
+        return self.model(**dict(zip(self.input_names, tensors))).logits
+
+
+def export_onnx(tokenizer, model, model_id, cache_dir=ONNX_CACHE_DIR):
+    """Exports model to ONNX with dynamic batch and sequence axes, reusing a cached export if present."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, model_id.replace("/", "__") + ".onnx")
+    if os.path.exists(path):
+        return path
+
+    sample = tokenizer(["warm up export"], return_tensors="pt")
+    input_names = list(sample.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    logger.info(f"Exporting {model_id} to {path}")
+    torch.onnx.export(
+        _LogitsOnly(model.eval(), input_names),
+        tuple(sample[name] for name in input_names),
+        path,
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes=dynamic_axes,
+        opset_version=17,
+    )
+    return path
+
+
+class OnnxBackend:
+    """Runs an ONNX export of the classifier with ONNX Runtime's CPU provider."""
+
+    name = "onnx"
+
+    def __init__(self, tokenizer, model, model_id):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("RISK_BACKEND=onnx requires the onnxruntime package") from e
+        self.tokenizer = tokenizer
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            export_onnx(tokenizer, model, model_id), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def window_probs(self, texts):
+        inputs, sample_mapping = encode_windows(self.tokenizer, texts, "np")
+        feeds = {name: inputs[name].astype(np.int64) for name in self.input_names}
+        logits = self.session.run(["logits"], feeds)[0]
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        probs = exp / exp.sum(axis=-1, keepdims=True)
+        return group_windows(probs[:, 1].tolist(), sample_mapping, len(texts))
+
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def build_backend(name, model_id, tokenizer, model):
+    """
+    Wraps a loaded tokenizer/model pair in the named inference backend. The
+    backend's revision is the Hub commit the weights were resolved to (None
+    for local weights).
+    """
+    if name == "torch":
+        backend = TorchBackend(tokenizer, model)
+    elif name == "int8":
+        backend = Int8Backend(tokenizer, model)
+    elif name == "onnx":
+        backend = OnnxBackend(tokenizer, model, model_id)
+    else:
+        raise ValueError(f"Unknown risk inference backend: {name} (expected one of {', '.join(BACKENDS)})")
+    backend.revision = getattr(model.config, "_commit_hash", None)
+    return backend
@@ -0,0 +1,110 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-item requests for a short window and runs them
+    through one batched call.
+
+    Callers submit one item and block on (or await) a Future. A worker thread
+    takes the first waiting item, keeps collecting until either max_batch_size
+    items are queued or max_wait_ms has passed, then calls batch_fn once with
+    the whole list and fans the results back out in order.
+
+    Args:
+        batch_fn (callable): Takes a list of items, returns a list of results of the same length.
+        max_batch_size (int): Upper bound on the number of items per batch_fn call.
+        max_wait_ms (float): How long to hold the first item while waiting for more.
+        name (str): Used for the worker thread name and log messages.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=5.0, name="micro-batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item):
+        """Queue a single item and return a Future for its result."""
+        if self._closed:
+            raise RuntimeError(f"{self.name} is closed")
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item, timeout=None):
+        """Submit an item and block until its result is available."""
+        return self.submit(item).result(timeout=timeout)
+
+    def stats(self):
+        avg = self.items / self.batches if self.batches else 0.0
+        return {"batches": self.batches, "items": self.items, "avg_batch_size": round(avg, 2)}
+
+    def close(self):
+        """Stop the worker once the items already queued have been processed."""
+        self._closed = True
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Put the shutdown marker back so the loop exits after this batch.
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise ValueError(
+                        f"{self.name}: batch_fn returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                logger.exception(f"{self.name}: batch of {len(items)} failed")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(items)
+            for future, result in zip(futures, results):
+                future.set_result(result)
@@ -0,0 +1,195 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import logging
+import os
+import threading
+import time
+
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from crisis_keywords import get_matcher
+from inference_backends import RISK_BACKEND, build_backend
+
+logger = logging.getLogger(__name__)
+
+hf_token = os.environ.get("HF_TOKEN")
+
+MENTAL_MODEL_ID = "mental/mental-bert-base-uncased"
+SUICIDE_MODEL_ID = "AventIQ-AI/distilbert-mental-health-prediction"
+
+# How entry points bring the models up:
+#   background - start loading in a daemon thread at startup (default)
+#   eager      - load before serving (use with a pre-forking server, e.g. gunicorn --preload,
+#                so workers share the loaded weights copy-on-write)
+#   lazy       - load on the first request that needs a model
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "background")
+
+
+def load_sequence_classifier(model_id):
+    """
+    Loads a tokenizer and sequence classifier, preferring safetensors weights.
+
+    safetensors files are memory-mapped rather than unpickled, so loading does
+    not need a second full copy of the weights in RAM and forked workers can
+    share the mapped pages.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(model_id, token=hf_token)
+    try:
+        model = AutoModelForSequenceClassification.from_pretrained(
+            model_id, token=hf_token, use_safetensors=True, low_cpu_mem_usage=True
+        )
+    except OSError:
+        logger.warning(f"No safetensors weights for {model_id}, falling back to the PyTorch checkpoint")
+        model = AutoModelForSequenceClassification.from_pretrained(
+            model_id, token=hf_token, low_cpu_mem_usage=True
+        )
+    model.eval()
+    return tokenizer, model
+
+
+def load_risk_backend(model_id, backend=RISK_BACKEND):
+    """Loads a classifier and wraps it in the configured inference backend."""
+    tokenizer, model = load_sequence_classifier(model_id)
+    return build_backend(backend, model_id, tokenizer, model)
+
+
+def warm_up_risk_backend(backend):
+    """Runs one tiny forward pass so the first real request doesn't pay for kernel setup."""
+    backend.window_probs(["warm up"])
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of lazily loaded models.
+
+    Models are registered with a loader callable and only loaded the first
+    time get() is called for them, or when warm_up() is asked to load them
+    ahead of time. Each entry tracks its state (pending, loading, ready,
+    failed) so readiness checks can report warm-up progress.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.warmup_started_at = None
+        self.warmup_finished_at = None
+
+    def register(self, name, loader, warm_up=None):
+        with self._lock:
+            self._entries[name] = {
+                "loader": loader,
+                "warm_up": warm_up,
+                "lock": threading.Lock(),
+                "state": "pending",
+                "value": None,
+                "error": None,
+                "load_seconds": None,
+            }
+
+    def get(self, name):
+        """Returns the loaded model for name, loading it on first use."""
+        entry = self._entries[name]
+        if entry["state"] == "ready":
+            return entry["value"]
+        with entry["lock"]:
+            if entry["state"] != "ready":
+                self._load(name, entry)
+        return entry["value"]
+
+    def _load(self, name, entry):
+        entry["state"] = "loading"
+        start = time.monotonic()
+        try:
+            value = entry["loader"]()
+            if entry["warm_up"] is not None:
+                entry["warm_up"](value)
+        except Exception as e:
+            entry["state"] = "failed"
+            entry["error"] = str(e)
+            logger.exception(f"Failed to load model '{name}'")
+            raise
+        entry["value"] = value
+        entry["error"] = None
+        entry["load_seconds"] = round(time.monotonic() - start, 3)
+        entry["state"] = "ready"
+        logger.info(f"Model '{name}' ready in {entry['load_seconds']}s")
+
+    def warm_up(self, names=None, background=True):
+        """
+        Loads the given models (all registered ones by default).
+
+        With background=True this returns the started daemon thread right away;
+        otherwise it blocks until every model is loaded.
+        """
+        names = list(names or self._entries)
+
+        def run():
+            self.warmup_started_at = time.monotonic()
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    # Already logged; keep warming the remaining models.
+                    pass
+            self.warmup_finished_at = time.monotonic()
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self, names=None):
+        names = names or self._entries
+        return all(self._entries[name]["state"] == "ready" for name in names)
+
+    def status(self):
+        models = {
+            name: {
+                "state": entry["state"],
+                "load_seconds": entry["load_seconds"],
+                "error": entry["error"],
+            }
+            for name, entry in self._entries.items()
+        }
+        warmup_seconds = None
+        if self.warmup_started_at is not None and self.warmup_finished_at is not None:
+            warmup_seconds = round(self.warmup_finished_at - self.warmup_started_at, 3)
+        return {"ready": self.is_ready(), "warmup_seconds": warmup_seconds, "models": models}
+
+
+registry = ModelRegistry()
+registry.register(
+    "mental",
+    lambda: load_risk_backend(MENTAL_MODEL_ID),
+    warm_up=warm_up_risk_backend,
+)
+registry.register(
+    "suicide",
+    lambda: load_risk_backend(SUICIDE_MODEL_ID),
+    warm_up=warm_up_risk_backend,
+)
+# Not a model, but compiling the lexicon is part of being ready to score.
+registry.register("crisis_lexicon", get_matcher)
+
+
+def start_warmup(mode=MODEL_WARMUP):
+    """Applies the MODEL_WARMUP policy; called once by each entry point at startup."""
+    if mode == "eager":
+        registry.warm_up(background=False)
+    elif mode == "background":
+        registry.warm_up(background=True)
+    elif mode != "lazy":
+        raise ValueError(f"Unknown MODEL_WARMUP mode: {mode}")
+
+
+# Example usage: report cold-start cost per model
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    start = time.monotonic()
+    registry.warm_up(background=False)
+    print(f"All models ready in {time.monotonic() - start:.2f}s")
+    for name, info in registry.status()["models"].items():
+        print(f"  {name}: {info}")
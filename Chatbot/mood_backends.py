@@ -0,0 +1,228 @@
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import Future, TimeoutError
+
+import torch
+
+from emotion_trends import format_mood_report, is_mood_report, parse_mood_report
+from micro_batching import MicroBatcher
+from model_registry import load_sequence_classifier, registry
+from mood_detection import mood_client
+
+logger = logging.getLogger(__name__)
+
+# How the local emotion classifier is used next to the remote iMentiv API:
+#   off      - remote only (default)
+#   primary  - local only, no network round trip
+#   fallback - remote, switching to local when it errors or takes longer than MOOD_FALLBACK_AFTER_MS
+#   shadow   - remote is served, local runs alongside and the two are compared in mood_backend_stats()
+MOOD_LOCAL_MODE = os.environ.get("MOOD_LOCAL_MODE", "off")
+MOOD_LOCAL_MODEL_ID = os.environ.get("MOOD_LOCAL_MODEL_ID", "j-hartmann/emotion-english-distilroberta-base")
+MOOD_FALLBACK_AFTER_MS = float(os.environ.get("MOOD_FALLBACK_AFTER_MS", "800"))
+MOOD_BATCH_MAX_SIZE = int(os.environ.get("MOOD_BATCH_MAX_SIZE", "16"))
+MOOD_BATCH_MAX_WAIT_MS = float(os.environ.get("MOOD_BATCH_MAX_WAIT_MS", "5"))
+MOOD_MAX_LENGTH = 512
+
+MOOD_LOCAL_MODES = ("off", "primary", "fallback", "shadow")
+
+
+class LocalEmotionClassifier:
+    """A Hugging Face emotion classifier run on CPU; scores every label of a batch of texts at once."""
+
+    def __init__(self, tokenizer, model):
+        self.tokenizer = tokenizer
+        self.model = model.eval()
+        # Capitalised to match the remote report's column names (anger -> Anger).
+        self.labels = [model.config.id2label[i].capitalize() for i in range(model.config.num_labels)]
+
+    def predict(self, texts):
+        inputs = self.tokenizer(texts, return_tensors="pt", truncation=True, padding=True, max_length=MOOD_MAX_LENGTH)
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits
+        return torch.nn.functional.softmax(logits, dim=-1).tolist()
+
+
+def _load_local_classifier():
+    return LocalEmotionClassifier(*load_sequence_classifier(MOOD_LOCAL_MODEL_ID))
+
+
+def _chain(source, target):
+    """Completes the Future target with the outcome of source once it is done."""
+    def copy(done):
+        if done.exception() is not None:
+            target.set_exception(done.exception())
+        else:
+            target.set_result(done.result())
+    source.add_done_callback(copy)
+
+
+class RemoteMoodBackend:
+    name = "remote"
+
+    def submit(self, text):
+        return mood_client.submit_text(text)
+
+
+class LocalMoodBackend:
+    """Local classifier behind a MicroBatcher, so concurrent turns share one forward pass."""
+
+    name = "local"
+
+    def __init__(self):
+        self._batcher = MicroBatcher(
+            lambda texts: registry.get("emotion").predict(texts),
+            max_batch_size=MOOD_BATCH_MAX_SIZE,
+            max_wait_ms=MOOD_BATCH_MAX_WAIT_MS,
+            name="emotion-batcher",
+        )
+
+    def submit(self, text):
+        report = Future()
+
+        def done(scores):
+            # Runs on the batcher's thread; anything raised here would be swallowed and leave report pending.
+            try:
+                labels = registry.get("emotion").labels
+                report.set_result(format_mood_report(f"local-{uuid.uuid4().hex[:12]}", text, labels, scores.result()))
+            except Exception as e:
+                report.set_exception(e)
+
+        self._batcher.submit(text).add_done_callback(done)
+        return report
+
+    def stats(self):
+        return self._batcher.stats()
+
+
+class MoodRouter:
+    """Sends each mood request to the remote and/or local backend according to MOOD_LOCAL_MODE."""
+
+    def __init__(self, mode=MOOD_LOCAL_MODE, fallback_after_ms=MOOD_FALLBACK_AFTER_MS):
+        if mode not in MOOD_LOCAL_MODES:
+            raise ValueError(f"Unknown MOOD_LOCAL_MODE: {mode} (expected one of {', '.join(MOOD_LOCAL_MODES)})")
+        self.mode = mode
+        self.fallback_after = fallback_after_ms / 1000.0
+        self.remote = RemoteMoodBackend()
+        self.local = LocalMoodBackend() if mode != "off" else None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.fallbacks = 0
+        self.shadow_compared = 0
+        self.shadow_top_agreements = 0
+        self.shadow_abs_diff_sum = 0.0
+
+    def submit(self, text):
+        """Starts analysing text and returns a Future for the CSV mood report (or the remote client's error string)."""
+        with self._lock:
+            self.requests += 1
+        if self.mode == "primary":
+            return self.local.submit(text)
+        if self.mode == "off":
+            return self.remote.submit(text)
+
+        remote_future = self.remote.submit(text)
+        if self.mode == "shadow":
+            local_future = self.local.submit(text)
+
+            def compare(remote):
+                if remote.exception() is None:
+                    local_future.add_done_callback(lambda local: self._compare(remote.result(), local))
+
+            remote_future.add_done_callback(compare)
+            return remote_future
+
+        # fallback: give the remote its budget, then use the local classifier instead.
+        report = Future()
+        decided = []
+
+        def decide():
+            # True for whichever of the remote and the timer gets here first.
+            with self._lock:
+                if decided:
+                    return False
+                decided.append(True)
+                return True
+
+        def use_local(reason):
+            if not decide():
+                return
+            logger.info(f"{reason}, using local classifier")
+            with self._lock:
+                self.fallbacks += 1
+            _chain(self.local.submit(text), report)
+
+        def remote_done(remote):
+            timer.cancel()
+            if remote.exception() is not None:
+                use_local(f"Remote mood analysis failed ({remote.exception()})")
+            elif not is_mood_report(remote.result()):
+                use_local(f"Remote mood analysis failed ({remote.result().strip()[:200]})")
+            elif decide():
+                report.set_result(remote.result())
+
+        timer = threading.Timer(self.fallback_after, use_local,
+                                args=(f"Remote mood analysis took over {self.fallback_after * 1000:.0f} ms",))
+        timer.daemon = True
+        timer.start()
+        remote_future.add_done_callback(remote_done)
+        return report
+
+    def analyze(self, text):
+        """Returns a CSV mood report (or the remote client's error string) for text."""
+        return self.submit(text).result()
+
+    def _compare(self, remote_report, local_future):
+        remote = parse_mood_report(remote_report)
+        if remote is None or local_future.exception() is not None:
+            return
+        local = parse_mood_report(local_future.result())
+        shared = [label for label in remote if label in local]
+        if not shared:
+            return
+        with self._lock:
+            self.shadow_compared += 1
+            if max(shared, key=remote.get) == max(shared, key=local.get):
+                self.shadow_top_agreements += 1
+            self.shadow_abs_diff_sum += sum(abs(remote[label] - local[label]) for label in shared) / len(shared)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "mode": self.mode,
+                "requests": self.requests,
+                "fallbacks": self.fallbacks,
+                "remote": mood_client.stats(),
+            }
+            if self.mode == "shadow":
+                compared = self.shadow_compared
+                stats["shadow"] = {
+                    "compared": compared,
+                    "top_emotion_agreement": round(self.shadow_top_agreements / compared, 3) if compared else None,
+                    "mean_abs_diff": round(self.shadow_abs_diff_sum / compared, 4) if compared else None,
+                }
+        if self.local is not None:
+            stats["local_batching"] = self.local.stats()
+        return stats
+
+
+if MOOD_LOCAL_MODE != "off":
+    # Registered only when used, so readiness doesn't wait on a model that is never called.
+    registry.register("emotion", _load_local_classifier, warm_up=lambda classifier: classifier.predict(["warm up"]))
+
+mood_router = MoodRouter()
+
+
+def analyze_mood(text):
+    """Drop-in for text_to_mood that honours MOOD_LOCAL_MODE."""
+    return mood_router.analyze(text)
+
+
+def submit_mood(text):
+    """Like analyze_mood, but returns a Future for the report instead of waiting for it."""
+    return mood_router.submit(text)
+
+
+def mood_backend_stats():
+    return mood_router.stats()
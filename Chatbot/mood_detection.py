@@ -1,109 +1,137 @@
 from dotenv import load_dotenv
+import asyncio
+import logging
 import os
-import requests
-import json
+import threading
 import time
 
+import httpx
+
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 load_dotenv()
 API_KEY = os.getenv("IMENTIV_API_KEY")
-BASE_URL = "https://api.imentiv.ai/v1"
+# Point at mood_stub.py (e.g. http://127.0.0.1:8002/v1) to run without the iMentiv API.
+BASE_URL = os.getenv("IMENTIV_BASE_URL", "https://api.imentiv.ai/v1")
 
 HEADERS = {
     "X-API-Key": API_KEY,
     "accept": "application/json"
 }
 
-# This function takes in a text (in string) and return the mood analysis (in string as well)
-def text_to_mood(aString):
-    upload_url = f"{BASE_URL}/texts"
-
-    # Ensure correct form-data format
-    data = {
-        "text": aString,
-        "video_url": ""  # Ensures the API processes the text, not video
-    }
-    try:
-        # Step 1: Upload the text
-        response = requests.post(upload_url, headers=HEADERS, data=data)
-
-        if response.status_code == 200:
-            # Step 2: If upload is successful, retrieve the text id
-            response_json = response.json()
-            text_id = response_json.get("id")
-            report_url = f"{BASE_URL}/texts/{text_id}/report"
-            data = {
-                "text_id" : text_id
-            }
-            # Step 3: Wait for 3 seconds before fetching the report
-            time.sleep(3)
-            # Step 4: Fetch the report
-            report_response = requests.get(report_url, headers=HEADERS, data=data)
-
-            if report_response.status_code == 200:
-                try:
+# Report polling starts fast and backs off, so a report is picked up shortly
+# after the backend finishes instead of after a fixed 3 s wait.
+MOOD_POLL_INITIAL_MS = float(os.getenv("MOOD_POLL_INITIAL_MS", "50"))
+MOOD_POLL_MAX_MS = float(os.getenv("MOOD_POLL_MAX_MS", "1000"))
+MOOD_POLL_BACKOFF = float(os.getenv("MOOD_POLL_BACKOFF", "1.5"))
+# Overall deadline for upload + processing + report, per kind of input.
+MOOD_TEXT_DEADLINE_SECONDS = float(os.getenv("MOOD_TEXT_DEADLINE_SECONDS", "15"))
+MOOD_AUDIO_DEADLINE_SECONDS = float(os.getenv("MOOD_AUDIO_DEADLINE_SECONDS", "120"))
+MOOD_MAX_CONNECTIONS = int(os.getenv("MOOD_MAX_CONNECTIONS", "20"))
+
+
+class MoodClient:
+    """
+    Asynchronous client for the iMentiv emotion API.
+
+    One httpx.AsyncClient (and so one keep-alive connection pool) runs on an
+    event loop in a background thread. submit_text() / submit_audio() return
+    a concurrent.futures.Future straight away; the job is uploaded and its
+    report polled with exponential backoff until it is ready or the deadline
+    passes. Results are the raw CSV report, or an error string starting with
+    a warning sign, the same as the old blocking helpers returned.
+    """
+
+    def __init__(self, base_url=BASE_URL, headers=HEADERS, poll_initial_ms=MOOD_POLL_INITIAL_MS,
+                 poll_max_ms=MOOD_POLL_MAX_MS, poll_backoff=MOOD_POLL_BACKOFF,
+                 max_connections=MOOD_MAX_CONNECTIONS):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {k: v for k, v in headers.items() if v is not None}
+        self.poll_initial = poll_initial_ms / 1000.0
+        self.poll_max = poll_max_ms / 1000.0
+        self.poll_backoff = poll_backoff
+        self.max_connections = max_connections
+        self.polls = 0
+        self.timeouts = 0
+        self._client = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mood-client", daemon=True)
+        self._thread.start()
+
+    def _get_client(self):
+        # Created lazily on the loop thread, which is where httpx expects to be used.
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(10.0),
+            )
+        return self._client
+
+    async def _analyze(self, upload_path, report_path, deadline, data=None, files=None):
+        client = self._get_client()
+        expires = time.monotonic() + deadline
+        try:
+            # Step 1: Upload the job
+            response = await client.post(upload_path, data=data, files=files)
+            if response.status_code != 200:
+                return f"⚠️ API Error: {response.text}"
+            report_url = report_path.format(id=response.json().get("id"))
+
+            # Step 2: Poll for the report, backing off while it's being processed
+            delay = self.poll_initial
+            while True:
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    return f"⚠️ Mood analysis timed out after {deadline:g}s"
+                await asyncio.sleep(min(delay, remaining))
+                delay = min(delay * self.poll_backoff, self.poll_max)
+                self.polls += 1
+                report_response = await client.get(report_url)
+                if report_response.status_code == 200:
                     return report_response.text
-                except ValueError as e:
-                    return f"🚨 Error parsing JSON from report response: {str(e)}"
-            else:
-                return f"⚠️ Report API Error: {report_response.text}"
-        else:
-            return f"⚠️ API Error: {response.text}"
+                if report_response.status_code != 202:
+                    return f"⚠️ Report API Error: {report_response.text}"
+        except httpx.HTTPError as e:
+            return f"🚨 Request Error: {str(e)}"
 
-    except requests.exceptions.RequestException as e:
-        return f"🚨 Request Error: {str(e)}"
+    def submit_text(self, text, deadline=MOOD_TEXT_DEADLINE_SECONDS):
+        """Starts analysing text and returns a Future for the report."""
+        # video_url is left empty so the API processes the text, not video
+        coro = self._analyze("/texts", "/texts/{id}/report", deadline, data={"text": text, "video_url": ""})
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
 
-# This function takes in an audio file and return an analysis of it (in string)
-def audio_to_mood(file):
-    upload_url = f"{BASE_URL}/audios"
-
-    # Prepare the data for uploading the audio
-    data = {
-        "file": file,
-        "video_url": ""  # Ensures the API processes the audio, not video
-    }
-
-    try:
-        # Step 1: Upload the audio
-        response = requests.post(upload_url, headers=HEADERS, data=data)
-
-        if response.status_code == 200:
-            # Step 2: If upload is successful, retrieve the audio id
-            response_json = response.json()
-            audio_id = response_json.get("id")
-            report_url = f"{BASE_URL}/audio/{audio_id}/report"
-            data = {
-                "audio_id" :audio_id
-            }
-            # Step 3: Check the processing status with a while loop
-            processing = True
-            while processing:
-                # Step 3.1: Wait for 3 seconds before checking the status
-                time.sleep(3)
-
-                # Step 3.2: Fetch the report
-                report_response = requests.get(report_url, headers=HEADERS, data=data)
+    def submit_audio(self, file, deadline=MOOD_AUDIO_DEADLINE_SECONDS):
+        """Starts analysing an audio file (path) and returns a Future for the report."""
+        with open(file, "rb") as f:
+            content = f.read()
+        coro = self._analyze("/audios", "/audio/{id}/report", deadline,
+                             data={"video_url": ""}, files={"file": (os.path.basename(file), content)})
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def stats(self):
+        return {"polls": self.polls, "timeouts": self.timeouts}
+
+    def close(self):
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
 
-                if report_response.status_code == 200:
-                    # If the report is available, return the report
-                    try:
-                        report_response = report_response.text
-                        processing = False  # Exit the loop as we have the result
-                        return report_response
-                    except ValueError as e:
-                        return f"🚨 Error parsing JSON from report response: {str(e)}"
-                elif report_response.status_code == 202:
-                    # If still processing, keep checking
-                    print("🔄 Processing... Please wait.")
-                else:
-                    # If an error occurs, exit the loop and return the error
-                    return f"⚠️ Report API Error: {report_response.text}"
 
-        else:
-            return f"⚠️ API Error: {response.text}"
+mood_client = MoodClient()
 
-    except requests.exceptions.RequestException as e:
-        return f"🚨 Request Error: {str(e)}"
+
+# This function takes in a text (in string) and return the mood analysis (in string as well)
+def text_to_mood(aString):
+    return mood_client.submit_text(aString).result()
+
+# This function takes in an audio file and return an analysis of it (in string)
+def audio_to_mood(file):
+    return mood_client.submit_audio(file).result()
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+"""
+Local stand-in for the iMentiv emotion API, for running and benchmarking offline.
+
+    python mood_stub.py --port 8002 --delay-ms 400 --jitter-ms 100
+    IMENTIV_BASE_URL=http://127.0.0.1:8002/v1 python app.py
+
+POST /v1/texts and /v1/audios return {"id": ...}. The matching report
+(/v1/texts/<id>/report, /v1/audio/<id>/report) answers 202 until the job's
+processing delay has passed, then 200 with a CSV report in the same shape as
+the real API: "id,text,<emotion>,..." and one row of scores.
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+EMOTIONS = ["Anger", "Disgust", "Fear", "Joy", "Neutral", "Sadness", "Surprise"]
+
+_REPORT_RE = re.compile(r"^/v1/(?:texts|audio)/([^/]+)/report$")
+
+
+def make_report(job_id, text):
+    """A CSV report with pseudo-random scores that are stable for the same text."""
+    rng = random.Random(text)
+    weights = [rng.random() ** 2 for _ in EMOTIONS]
+    total = sum(weights)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["id", "text"] + EMOTIONS)
+    writer.writerow([job_id, text] + [f"{w / total:.4f}" for w in weights])
+    return out.getvalue()
+
+
+class MoodStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    delay = 0.4
+    jitter = 0.0
+    jobs = {}
+    lock = threading.Lock()
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.path == "/v1/texts":
+            text = parse_qs(body.decode("utf-8")).get("text", [""])[0]
+        elif self.path == "/v1/audios":
+            text = f"audio ({len(body)} bytes)"
+        else:
+            self._send(404, json.dumps({"detail": "Not Found"}))
+            return
+        job_id = uuid.uuid4().hex
+        ready_at = time.monotonic() + max(0.0, self.delay + random.uniform(-self.jitter, self.jitter))
+        with self.lock:
+            self.jobs[job_id] = (ready_at, text)
+        self._send(200, json.dumps({"id": job_id}))
+
+    def do_GET(self):
+        match = _REPORT_RE.match(self.path)
+        with self.lock:
+            job = self.jobs.get(match.group(1)) if match else None
+        if job is None:
+            self._send(404, json.dumps({"detail": "Not Found"}))
+            return
+        ready_at, text = job
+        if time.monotonic() < ready_at:
+            self._send(202, json.dumps({"status": "processing"}))
+            return
+        self._send(200, make_report(match.group(1), text), "text/csv")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=8002, delay_ms=400.0, jitter_ms=0.0):
+    """Starts the stand-in on a background thread and returns the server (port=0 picks a free port)."""
+    handler = type("Handler", (MoodStubHandler,), {
+        "delay": delay_ms / 1000.0,
+        "jitter": jitter_ms / 1000.0,
+        "jobs": {},
+        "lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="mood-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--delay-ms", type=float, default=400.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.delay_ms, args.jitter_ms)
+    print(f"Mood API stand-in listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
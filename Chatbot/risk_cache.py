@@ -0,0 +1,178 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Per-message risk score cache. RISK_CACHE=0 turns it off; RISK_CACHE_PATH
+# enables an on-disk snapshot that is reloaded at startup (risk_cache.json is
+# ignored by git).
+RISK_CACHE = os.environ.get("RISK_CACHE", "1") != "0"
+RISK_CACHE_MAX_ENTRIES = int(os.environ.get("RISK_CACHE_MAX_ENTRIES", "10000"))
+RISK_CACHE_TTL_SECONDS = float(os.environ.get("RISK_CACHE_TTL_SECONDS", "86400"))
+RISK_CACHE_PATH = os.environ.get("RISK_CACHE_PATH", "")
+RISK_CACHE_SAVE_INTERVAL_SECONDS = float(os.environ.get("RISK_CACHE_SAVE_INTERVAL_SECONDS", "60"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_message(text):
+    """
+    Canonical form of a message for scoring and cache keys.
+
+    Only changes that are invisible to the BERT tokenizers are applied (NFC
+    composition, surrounding and repeated whitespace), so scoring the
+    normalised text gives the same result as scoring the original.
+    """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class RiskCache:
+    """
+    Bounded LRU cache of model scores keyed by a content hash.
+
+    Keys are SHA-256 digests of a model identifier plus the normalised text, so
+    swapping a model or backend never serves stale scores. Entries expire after
+    ttl_seconds (0 disables expiry). When path is set, the cache is loaded from
+    it on creation and snapshotted back at most every save_interval seconds and
+    at exit.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=86400, path=None, save_interval=60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path or None
+        self.save_interval = save_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Held while writing a snapshot, so the periodic and atexit saves can't interleave.
+        self._save_lock = threading.Lock()
+        self._last_save = time.monotonic()
+        self._saving = False
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.path:
+            self.load()
+            atexit.register(self.save)
+
+    @staticmethod
+    def key(model_key, text):
+        return hashlib.sha256(f"{model_key}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and now - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty = True
+        self._maybe_save()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "persistent": bool(self.path),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable risk cache snapshot {self.path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, value, stored_at in snapshot.get("entries", []):
+                if not self.ttl_seconds or now - stored_at <= self.ttl_seconds:
+                    self._entries[key] = (value, stored_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        logger.info(f"Loaded {len(self._entries)} cached risk scores from {self.path}")
+
+    def save(self):
+        """Writes a snapshot atomically (temp file + rename) if anything changed since the last one."""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = [[key, value, stored_at] for key, (value, stored_at) in self._entries.items()]
+                self._dirty = False
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"version": 1, "entries": entries}, f)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                with self._lock:
+                    self._dirty = True
+                raise
+
+    def _maybe_save(self):
+        if not self.path or self._saving or time.monotonic() - self._last_save < self.save_interval:
+            return
+        self._saving = True
+        self._last_save = time.monotonic()
+
+        def run():
+            try:
+                self.save()
+            except OSError as e:
+                logger.warning(f"Could not save risk cache to {self.path}: {e}")
+            finally:
+                self._saving = False
+
+        threading.Thread(target=run, name="risk-cache-save", daemon=True).start()
+
+
+risk_cache = None
+if RISK_CACHE:
+    risk_cache = RiskCache(
+        max_entries=RISK_CACHE_MAX_ENTRIES,
+        ttl_seconds=RISK_CACHE_TTL_SECONDS,
+        path=RISK_CACHE_PATH,
+        save_interval=RISK_CACHE_SAVE_INTERVAL_SECONDS,
+    )
@@ -0,0 +1,236 @@
+import logging
+import math
+import os
+import threading
+from collections import Counter
+
+from crisis_keywords import match_crisis_phrases
+from inference_backends import RISK_BACKEND, RISK_MAX_LENGTH, RISK_WINDOW_STRIDE
+from micro_batching import MicroBatcher
+from model_registry import MENTAL_MODEL_ID, SUICIDE_MODEL_ID, registry
+from risk_cache import normalize_message, risk_cache
+
+logger = logging.getLogger(__name__)
+
+# Micro-batching of concurrent risk scoring requests. Set RISK_BATCHING=0 to
+# run every message through its own forward pass.
+RISK_BATCHING = os.environ.get("RISK_BATCHING", "1") != "0"
+RISK_BATCH_MAX_SIZE = int(os.environ.get("RISK_BATCH_MAX_SIZE", "16"))
+RISK_BATCH_MAX_WAIT_MS = float(os.environ.get("RISK_BATCH_MAX_WAIT_MS", "5"))
+
+# Cascaded scoring. With RISK_CASCADE=1 the suicide model runs first and
+# MentalBERT is skipped when the suicide score is at or above
+# RISK_CASCADE_HIGH (the suicide score is returned) or below RISK_CASCADE_LOW
+# (MentalBERT's score is estimated as RISK_CASCADE_MENTAL_PRIOR). Only the
+# band in between runs both models.
+RISK_CASCADE = os.environ.get("RISK_CASCADE", "0") != "0"
+RISK_CASCADE_LOW = float(os.environ.get("RISK_CASCADE_LOW", "0.1"))
+RISK_CASCADE_HIGH = float(os.environ.get("RISK_CASCADE_HIGH", "0.5"))
+RISK_CASCADE_MENTAL_PRIOR = float(os.environ.get("RISK_CASCADE_MENTAL_PRIOR", "0.5"))
+
+# Long messages are scored as overlapping windows (see inference_backends);
+# RISK_WINDOW_AGGREGATION picks how window scores become one score: max,
+# mean or attention (softmax-weighted with RISK_WINDOW_TEMPERATURE).
+RISK_WINDOW_AGGREGATION = os.environ.get("RISK_WINDOW_AGGREGATION", "max")
+RISK_WINDOW_TEMPERATURE = float(os.environ.get("RISK_WINDOW_TEMPERATURE", "0.1"))
+
+_path_counts = Counter()
+_path_lock = threading.Lock()
+
+
+def _window_probs(model_name, texts):
+    """Scores every window of every text in one forward pass; returns one list of window scores per text."""
+    return registry.get(model_name).window_probs(texts)
+
+
+def batch_analyze_mental_state(texts):
+    return _window_probs("mental", texts)
+
+
+def batch_analyze_suicide_tendencies(texts):
+    return _window_probs("suicide", texts)
+
+
+_mental_batcher = MicroBatcher(
+    batch_analyze_mental_state,
+    max_batch_size=RISK_BATCH_MAX_SIZE,
+    max_wait_ms=RISK_BATCH_MAX_WAIT_MS,
+    name="mental-batcher",
+)
+_suicide_batcher = MicroBatcher(
+    batch_analyze_suicide_tendencies,
+    max_batch_size=RISK_BATCH_MAX_SIZE,
+    max_wait_ms=RISK_BATCH_MAX_WAIT_MS,
+    name="suicide-batcher",
+)
+
+
+# Cache keys include the model and the revision of its weights, the backend and
+# the windowing, so changing any of them (including new weights pushed under the
+# same model id) never serves old scores.
+_WINDOWING = f"w{RISK_MAX_LENGTH}s{RISK_WINDOW_STRIDE}"
+_MODEL_IDS = {"mental": MENTAL_MODEL_ID, "suicide": SUICIDE_MODEL_ID}
+
+
+def _model_key(model_name):
+    # The revision is only known once the model is loaded; registry.get() loads it on first use.
+    revision = getattr(registry.get(model_name), "revision", None)
+    return f"{_MODEL_IDS[model_name]}@{revision or 'local'}/{RISK_BACKEND}/{_WINDOWING}"
+
+
+def _window_scores(model_name, batcher, batch_fn, text):
+    text = normalize_message(text)
+    key = None
+    if risk_cache is not None:
+        key = risk_cache.key(_model_key(model_name), text)
+        cached = risk_cache.get(key)
+        if cached is not None:
+            return cached
+    windows = batcher(text) if RISK_BATCHING else batch_fn([text])[0]
+    if key is not None:
+        risk_cache.put(key, windows)
+    return windows
+
+
+def mental_state_windows(text):
+    """Distress probability of each overlapping window of text (one entry for short messages)."""
+    return _window_scores("mental", _mental_batcher, batch_analyze_mental_state, text)
+
+
+def suicide_tendency_windows(text):
+    """Suicide risk probability of each overlapping window of text (one entry for short messages)."""
+    return _window_scores("suicide", _suicide_batcher, batch_analyze_suicide_tendencies, text)
+
+
+def aggregate_windows(scores, method=None, temperature=None):
+    """
+    Collapses per-window scores into one message score.
+
+    max       - the riskiest window decides
+    mean      - plain average
+    attention - softmax(score / temperature)-weighted average, so high-risk
+                windows dominate without a single window deciding alone
+    """
+    method = method or RISK_WINDOW_AGGREGATION
+    temperature = temperature or RISK_WINDOW_TEMPERATURE
+    if len(scores) == 1:
+        return scores[0]
+    if method == "max":
+        return max(scores)
+    if method == "mean":
+        return sum(scores) / len(scores)
+    if method == "attention":
+        top = max(scores)
+        weights = [math.exp((s - top) / temperature) for s in scores]
+        return sum(w * s for w, s in zip(weights, scores)) / sum(weights)
+    raise ValueError(f"Unknown window aggregation: {method}")
+
+
+def analyze_mental_state(text):
+    return aggregate_windows(mental_state_windows(text))
+
+
+def analyze_suicide_tendencies(text):
+    return aggregate_windows(suicide_tendency_windows(text))
+
+
+def cache_stats():
+    return risk_cache.stats() if risk_cache is not None else {"enabled": False}
+
+
+def batching_stats():
+    return {
+        "enabled": RISK_BATCHING,
+        "max_batch_size": RISK_BATCH_MAX_SIZE,
+        "max_wait_ms": RISK_BATCH_MAX_WAIT_MS,
+        "mental": _mental_batcher.stats(),
+        "suicide": _suicide_batcher.stats(),
+    }
+
+
+#####################################
+# Combined Risk Score Calculation (with keyword boosting)
+#####################################
+def assess_risk(text, mental_scale=1.0, suicide_threshold=0.5, boost_value=0.8,
+                cascade=None, cascade_low=None, cascade_high=None):
+    """
+    Scores a message and reports how the score was reached.
+
+    Returns a dict with the combined score, the path taken (keyword, full,
+    cascade_high, cascade_low or cascade_full), the per-model probabilities that
+    were actually computed (None when a model was skipped), the per-window
+    scores behind them for long messages, the crisis lexicon phrases that
+    forced the boosted score (keywords) and the suggestive or negated ones that
+    were left to the models (watch_phrases).
+    """
+    if cascade is None:
+        cascade = RISK_CASCADE
+    if cascade_low is None:
+        cascade_low = RISK_CASCADE_LOW
+    if cascade_high is None:
+        cascade_high = RISK_CASCADE_HIGH
+
+    matched = match_crisis_phrases(text)
+    forced = [m.phrase for m in matched if m.kind == "crisis"]
+    watch = [m.phrase for m in matched if m.kind != "crisis"]
+    if forced:
+        logger.info(f"Crisis phrases matched: {forced}")
+        return _record_path("keyword", boost_value, None, None, forced, watch_phrases=watch)
+    if watch:
+        logger.info(f"Suggestive or negated crisis phrases, scoring with the models: {watch}")
+
+    windows = {}
+    if not cascade:
+        windows["mental"] = mental_state_windows(text)
+        windows["suicide"] = suicide_tendency_windows(text)
+        mental_score = aggregate_windows(windows["mental"]) * mental_scale
+        suicide_score = aggregate_windows(windows["suicide"])
+        return _record_path("full", _combine(mental_score, suicide_score, suicide_threshold),
+                            mental_score, suicide_score, windows=windows, watch_phrases=watch)
+
+    # Cascade: the DistilBERT suicide model is cheaper, so run it first and
+    # only pay for MentalBERT when its score falls in the uncertain band.
+    windows["suicide"] = suicide_tendency_windows(text)
+    suicide_score = aggregate_windows(windows["suicide"])
+    if suicide_score >= cascade_high:
+        # Exact whenever cascade_high >= suicide_threshold, since the suicide score decides alone.
+        return _record_path("cascade_high", suicide_score, None, suicide_score, windows=windows,
+                            watch_phrases=watch)
+    # A suggestive phrase always gets MentalBERT's opinion too, never the prior.
+    if suicide_score < cascade_low and not watch:
+        estimate = _combine(RISK_CASCADE_MENTAL_PRIOR * mental_scale, suicide_score, suicide_threshold)
+        return _record_path("cascade_low", estimate, None, suicide_score, windows=windows)
+    windows["mental"] = mental_state_windows(text)
+    mental_score = aggregate_windows(windows["mental"]) * mental_scale
+    return _record_path("cascade_full", _combine(mental_score, suicide_score, suicide_threshold),
+                        mental_score, suicide_score, windows=windows, watch_phrases=watch)
+
+
+def combined_risk_score(text, mental_scale=1.0, suicide_threshold=0.5, boost_value=0.8):
+    return assess_risk(text, mental_scale, suicide_threshold, boost_value)["score"]
+
+
+def _combine(mental_score, suicide_score, suicide_threshold):
+    if suicide_score >= suicide_threshold:
+        return suicide_score
+    return (mental_score + suicide_score) / 2
+
+
+def _record_path(path, score, mental_score, suicide_score, keywords=None, windows=None, watch_phrases=None):
+    with _path_lock:
+        _path_counts[path] += 1
+    return {
+        "score": score,
+        "path": path,
+        "mental": mental_score,
+        "suicide": suicide_score,
+        "keywords": keywords or [],
+        "watch_phrases": watch_phrases or [],
+        "windows": windows or {},
+    }
+
+
+def risk_path_counts():
+    """How many messages took each scoring path since startup."""
+    with _path_lock:
+        return dict(_path_counts)
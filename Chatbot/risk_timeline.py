@@ -0,0 +1,137 @@
+import math
+import os
+import time
+from collections import deque
+
+RISK_HISTORY_SIZE = int(os.environ.get("RISK_HISTORY_SIZE", "500"))
+RISK_EWMA_ALPHA = float(os.environ.get("RISK_EWMA_ALPHA", "0.3"))
+RISK_HALF_LIFE_SECONDS = float(os.environ.get("RISK_HALF_LIFE_SECONDS", "600"))
+
+
+class RiskTimeline:
+    """
+    Streaming risk statistics for one user.
+
+    Every update is O(1): the sliding window is a fixed-size ring buffer with a
+    running sum, the exponentially weighted moving average (EWMA) is updated in
+    place, and the time-decayed average keeps a decayed score sum and weight
+    that are scaled by exp(-ln2 * dt / half_life) on each update. A bounded
+    history of (timestamp, score) pairs is kept for the clinician view.
+    """
+
+    def __init__(self, window_size=5, history_size=RISK_HISTORY_SIZE,
+                 ewma_alpha=RISK_EWMA_ALPHA, half_life_seconds=RISK_HALF_LIFE_SECONDS):
+        self.window_size = window_size
+        self.ewma_alpha = ewma_alpha
+        self.half_life_seconds = half_life_seconds
+        self._ring = [0.0] * window_size
+        self._next = 0
+        self._count = 0
+        self._sum = 0.0
+        self.ewma = None
+        self._decayed_sum = 0.0
+        self._decayed_weight = 0.0
+        self.last_timestamp = None
+        self.history = deque(maxlen=history_size)
+
+    def add(self, score, timestamp=None):
+        """Records a score and returns the updated sliding-window average."""
+        timestamp = time.time() if timestamp is None else timestamp
+
+        if self._count == self.window_size:
+            self._sum -= self._ring[self._next]
+        else:
+            self._count += 1
+        self._ring[self._next] = score
+        self._sum += score
+        self._next = (self._next + 1) % self.window_size
+        if self._next == 0:
+            # Re-sum once per lap so floating point drift can't build up.
+            self._sum = sum(self._ring[:self._count])
+
+        self.ewma = score if self.ewma is None else self.ewma_alpha * score + (1 - self.ewma_alpha) * self.ewma
+
+        if self.last_timestamp is not None and self.half_life_seconds > 0:
+            decay = math.exp(-math.log(2) * max(0.0, timestamp - self.last_timestamp) / self.half_life_seconds)
+            self._decayed_sum *= decay
+            self._decayed_weight *= decay
+        self._decayed_sum += score
+        self._decayed_weight += 1.0
+        self.last_timestamp = timestamp
+
+        self.history.append((timestamp, score))
+        return self.average
+
+    @property
+    def average(self):
+        return self._sum / self._count if self._count else 0.0
+
+    @property
+    def decayed_average(self):
+        """Average where a score's weight halves every half_life_seconds of conversation time."""
+        return self._decayed_sum / self._decayed_weight if self._decayed_weight else 0.0
+
+    def window(self):
+        """Scores currently in the sliding window, oldest first."""
+        if self._count < self.window_size:
+            return self._ring[:self._count]
+        return self._ring[self._next:] + self._ring[:self._next]
+
+    def query(self, since=None, limit=None):
+        """History entries (oldest first), optionally only those after since and only the last limit."""
+        entries = [
+            {"timestamp": ts, "score": score}
+            for ts, score in self.history
+            if since is None or ts > since
+        ]
+        return entries[-limit:] if limit else entries
+
+    def summary(self):
+        return {
+            "count": len(self.history),
+            "window": self.window(),
+            "average": self.average,
+            "ewma": self.ewma,
+            "decayed_average": self.decayed_average,
+            "last_timestamp": self.last_timestamp,
+        }
+
+    def to_dict(self):
+        """Compact JSON-safe form; from_dict() restores an identical timeline."""
+        return {
+            "v": 1,
+            "n": self.window_size,
+            "a": self.ewma_alpha,
+            "hl": self.half_life_seconds,
+            "w": [round(s, 6) for s in self.window()],
+            "e": self.ewma,
+            "ds": self._decayed_sum,
+            "dw": self._decayed_weight,
+            "t": self.last_timestamp,
+            "h": [[round(ts, 3), round(s, 6)] for ts, s in self.history],
+            "hn": self.history.maxlen,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        timeline = cls(data["n"], data.get("hn", RISK_HISTORY_SIZE), data["a"], data["hl"])
+        for score in data["w"]:
+            timeline._ring[timeline._next] = score
+            timeline._next = (timeline._next + 1) % timeline.window_size
+            timeline._count += 1
+        timeline._sum = sum(data["w"])
+        timeline.ewma = data["e"]
+        timeline._decayed_sum = data["ds"]
+        timeline._decayed_weight = data["dw"]
+        timeline.last_timestamp = data["t"]
+        timeline.history.extend((ts, s) for ts, s in data["h"])
+        return timeline
+
+    @classmethod
+    def from_scores(cls, scores, window_size=5):
+        """Builds a timeline from a legacy plain list of recent scores."""
+        timeline = cls(window_size)
+        for score in scores:
+            timeline.add(score)
+        return timeline
+
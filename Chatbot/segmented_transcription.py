@@ -0,0 +1,304 @@
+import logging
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_processing import decode_audio, pcm16_to_float, pcm16_to_wav, probe_audio, to_float32, write_wav
+
+logger = logging.getLogger(__name__)
+
+# Which speech-to-text backend transcribes segments: groq (default) or stub (stt_stub.py, offline).
+STT_BACKEND = os.environ.get("STT_BACKEND", "groq")
+STT_MODEL = os.environ.get("STT_MODEL", "whisper-large-v3")
+STT_LANGUAGE = os.environ.get("STT_LANGUAGE", "en")
+# Long recordings are cut at a pause near every STT_SEGMENT_SECONDS; a segment
+# never runs past STT_MAX_SEGMENT_SECONDS, so with no pause in reach it is cut
+# mid-speech and the overlap covers the cut. Recordings up to
+# STT_MAX_SEGMENT_SECONDS go in a single request.
+STT_SEGMENT_SECONDS = float(os.environ.get("STT_SEGMENT_SECONDS", "30"))
+STT_MAX_SEGMENT_SECONDS = float(os.environ.get("STT_MAX_SEGMENT_SECONDS", "45"))
+STT_OVERLAP_SECONDS = float(os.environ.get("STT_OVERLAP_SECONDS", "1.0"))
+STT_WORKERS = int(os.environ.get("STT_WORKERS", "4"))
+# A pause is at least this long and this far below the loudest 20 ms frame.
+STT_MIN_SILENCE_MS = float(os.environ.get("STT_MIN_SILENCE_MS", "300"))
+STT_SILENCE_DB = float(os.environ.get("STT_SILENCE_DB", "-35"))
+# How many words at the end of one segment are compared with the start of the next.
+STT_STITCH_MAX_WORDS = 20
+
+_FRAME_MS = 20
+
+
+class GroqSpeechBackend:
+    name = "groq"
+
+    def __init__(self, model=STT_MODEL, api_key=None):
+        from groq import Groq
+        self.model = model
+        self.client = Groq(api_key=api_key or os.environ.get("GROQ_API_KEY"))
+
+    def transcribe(self, audio, language=STT_LANGUAGE, filename="segment.wav"):
+        """Text for encoded audio bytes; filename's extension tells the API the format (wav, flac, ...)."""
+        transcription = self.client.audio.transcriptions.create(
+            model=self.model,
+            file=(filename, bytes(audio) if isinstance(audio, memoryview) else audio),
+            language=language,
+        )
+        return transcription.text
+
+
+def _stub_backend():
+    from stt_stub import ToneSpeechBackend
+    return ToneSpeechBackend()
+
+
+SPEECH_BACKENDS = {"groq": GroqSpeechBackend, "stub": _stub_backend}
+
+
+def create_speech_backend(name=STT_BACKEND):
+    if name not in SPEECH_BACKENDS:
+        raise ValueError(f"Unknown STT_BACKEND: {name} (expected one of {', '.join(SPEECH_BACKENDS)})")
+    return SPEECH_BACKENDS[name]()
+
+
+def find_silences(samples, sample_rate, min_silence_ms=STT_MIN_SILENCE_MS, silence_db=STT_SILENCE_DB):
+    """(start, end) sample offsets of the pauses in samples."""
+    mono = samples if samples.ndim == 1 else samples.mean(axis=1)
+    hop = int(sample_rate * _FRAME_MS / 1000)
+    n = len(mono) // hop
+    if n == 0:
+        return []
+    rms = np.sqrt(np.mean(mono[:n * hop].reshape(n, hop) ** 2, axis=1))
+    silent = rms < max(rms.max() * 10 ** (silence_db / 20), 1e-4)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+    starts, ends = edges[::2], edges[1::2]
+    long_enough = ends - starts >= math.ceil(min_silence_ms / _FRAME_MS)
+    return [(int(start) * hop, int(end) * hop) for start, end in zip(starts[long_enough], ends[long_enough])]
+
+
+def plan_segments(samples, sample_rate, segment_seconds=STT_SEGMENT_SECONDS,
+                  max_segment_seconds=STT_MAX_SEGMENT_SECONDS, overlap_seconds=STT_OVERLAP_SECONDS):
+    """(start, end) sample offsets of the segments to transcribe, each padded by the overlap on both sides."""
+    total = len(samples)
+    longest = int(max_segment_seconds * sample_rate)
+    if total <= longest:
+        return [(0, total)]
+    target = int(segment_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    pauses = [(start + end) // 2 for start, end in find_silences(samples, sample_rate)]
+
+    cuts = []
+    start = 0
+    while total - start > longest:
+        in_reach = [cut for cut in pauses if start + target // 2 <= cut <= start + longest]
+        cut = min(in_reach, key=lambda c: abs(c - start - target)) if in_reach else start + target
+        cuts.append(cut)
+        start = cut
+    bounds = [0] + cuts + [total]
+    return [(max(0, a - overlap), min(total, b + overlap)) for a, b in zip(bounds, bounds[1:])]
+
+
+def _normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def merge_overlap(left, right, max_words=STT_STITCH_MAX_WORDS, max_skip=2):
+    """
+    Joins two consecutive segment transcripts, dropping the words both heard in their overlap.
+
+    Looks for the longest run of words that ends the left text and starts the
+    right one (ignoring case and punctuation). Up to max_skip words on either
+    side of the run may be dropped too, since a word cut at a segment edge is
+    often misheard; runs that need such a skip must be at least two words.
+    """
+    a, b = left.split(), right.split()
+    if not a or not b:
+        return left or right
+    na, nb = [_normalize(w) for w in a], [_normalize(w) for w in b]
+    for k in range(min(max_words, len(a), len(b)), 0, -1):
+        for skip_a in range(max_skip + 1):
+            for skip_b in range(max_skip + 1):
+                if (skip_a or skip_b) and k < 2:
+                    continue
+                end_a = len(a) - skip_a
+                if end_a < k or skip_b + k > len(b):
+                    continue
+                if na[end_a - k:end_a] == nb[skip_b:skip_b + k]:
+                    return " ".join(a[:end_a] + b[skip_b + k:])
+    return f"{left} {right}"
+
+
+class SegmentResult:
+    """One transcribed segment; start and end are in seconds and include the overlap."""
+
+    def __init__(self, index, start, end, text, elapsed_ms, bytes_sent, encode_ms=0.0):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.text = text
+        self.elapsed_ms = elapsed_ms
+        self.bytes_sent = bytes_sent
+        self.encode_ms = encode_ms
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "start": round(self.start, 2),
+            "end": round(self.end, 2),
+            "text": self.text,
+            "elapsed_ms": self.elapsed_ms,
+            "bytes_sent": self.bytes_sent,
+            "encode_ms": self.encode_ms,
+        }
+
+
+class Transcription:
+    """
+    The stitched text, its segments, milliseconds per stage (decode, split,
+    encode, transcribe, total) and bytes per stage (input, decoded, sent).
+    """
+
+    def __init__(self, text, segments, timings, sizes):
+        self.text = text
+        self.segments = segments
+        self.timings = timings
+        self.bytes = sizes
+
+    def to_dict(self):
+        return {
+            "text": self.text,
+            "segments": [s.to_dict() for s in self.segments],
+            "timings": self.timings,
+            "bytes": self.bytes,
+        }
+
+
+class SegmentedTranscriber:
+    """
+    Transcribes long recordings as overlapping segments in parallel.
+
+    The recording is cut at pauses into segments of about STT_SEGMENT_SECONDS,
+    each padded with STT_OVERLAP_SECONDS of its neighbours so no word is lost
+    at a cut. Segments are sent to the backend as in-memory WAV on a bounded
+    thread pool shared by all callers, and the texts are stitched back in
+    order with the overlapping words removed. Nothing touches the disk, and
+    recordings short enough for one request skip decoding altogether
+    (transcribe_pcm, transcribe_encoded).
+    """
+
+    def __init__(self, backend, max_workers=STT_WORKERS, segment_seconds=STT_SEGMENT_SECONDS,
+                 max_segment_seconds=STT_MAX_SEGMENT_SECONDS, overlap_seconds=STT_OVERLAP_SECONDS,
+                 language=STT_LANGUAGE):
+        self.backend = backend
+        self.segment_seconds = segment_seconds
+        self.max_segment_seconds = max_segment_seconds
+        self.overlap_seconds = overlap_seconds
+        self.language = language
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stt-segment")
+
+    def _send(self, index, audio, filename, start, end, encode_ms=0.0):
+        began = time.perf_counter()
+        text = self.backend.transcribe(audio, self.language, filename).strip()
+        elapsed_ms = round((time.perf_counter() - began) * 1000, 1)
+        return SegmentResult(index, start, end, text, elapsed_ms, len(audio), encode_ms)
+
+    def _transcribe_segment(self, index, samples, sample_rate, start, end):
+        began = time.perf_counter()
+        wav = write_wav(samples[start:end], sample_rate)
+        encode_ms = round((time.perf_counter() - began) * 1000, 1)
+        return self._send(index, wav, "segment.wav", start / sample_rate, end / sample_rate, encode_ms)
+
+    def _single(self, audio, filename, duration, timings, sizes, began):
+        """A recording short enough for one request, sent without being split or re-encoded."""
+        segment = self._send(0, audio, filename, 0.0, duration)
+        timings["transcribe"] = segment.elapsed_ms
+        timings["total"] = round((time.perf_counter() - began) * 1000, 1)
+        sizes["sent"] = segment.bytes_sent
+        return Transcription(segment.text, [segment], timings, sizes)
+
+    def transcribe(self, samples, sample_rate, timings=None, sizes=None):
+        """Transcription of samples (float or integer PCM), shaped (n,) or (n, channels)."""
+        if isinstance(samples, np.ndarray) and samples.dtype == np.int16:
+            # Captured 16-bit PCM (e.g. Gradio's numpy audio) needs no conversion when it fits one request.
+            samples = np.ascontiguousarray(samples)
+            return self.transcribe_pcm(samples, sample_rate, 1 if samples.ndim == 1 else samples.shape[1])
+        began = time.perf_counter()
+        timings = dict(timings or {})
+        sizes = dict(sizes or {})
+        sizes.setdefault("input", np.asarray(samples).nbytes)
+        samples = to_float32(samples)
+        sizes["decoded"] = samples.nbytes
+        bounds = plan_segments(samples, sample_rate, self.segment_seconds, self.max_segment_seconds,
+                               self.overlap_seconds)
+        timings["split"] = round((time.perf_counter() - began) * 1000, 1)
+        futures = [
+            self._executor.submit(self._transcribe_segment, i, samples, sample_rate, start, end)
+            for i, (start, end) in enumerate(bounds)
+        ]
+        segments = [future.result() for future in futures]
+        text = ""
+        for segment in segments:
+            text = merge_overlap(text, segment.text)
+        # Segments are encoded on the pool too, so "transcribe" includes their encoding.
+        timings["encode"] = round(sum(segment.encode_ms for segment in segments), 1)
+        timings["transcribe"] = round((time.perf_counter() - began) * 1000 - timings["split"], 1)
+        timings["total"] = round((time.perf_counter() - began) * 1000 + timings.get("decode", 0.0), 1)
+        sizes["sent"] = sum(segment.bytes_sent for segment in segments)
+        return Transcription(text, segments, timings, sizes)
+
+    def transcribe_pcm(self, pcm, sample_rate, channels=1):
+        """
+        Transcription of 16-bit PCM as captured (bytes, memoryview or int16
+        array). Short recordings are only given a WAV header; long ones are
+        converted to samples and segmented.
+        """
+        began = time.perf_counter()
+        size = memoryview(pcm).nbytes
+        duration = size / (2 * channels * sample_rate)
+        if duration <= self.max_segment_seconds:
+            wav = pcm16_to_wav(pcm, sample_rate, channels)
+            timings = {"encode": round((time.perf_counter() - began) * 1000, 1)}
+            return self._single(wav, "audio.wav", duration, timings, {"input": size}, began)
+        samples = pcm16_to_float(pcm, channels)
+        timings = {"decode": round((time.perf_counter() - began) * 1000, 1)}
+        return self.transcribe(samples, sample_rate, timings, {"input": size})
+
+    def transcribe_encoded(self, data, format):
+        """
+        Transcription of an encoded recording (e.g. an upload). WAV and FLAC
+        short enough for one request are sent exactly as they came; anything
+        else is decoded and segmented.
+        """
+        began = time.perf_counter()
+        size = memoryview(data).nbytes
+        info = probe_audio(data, format)
+        if info is not None:
+            sample_rate, _, frames = info
+            duration = frames / sample_rate
+            if duration <= self.max_segment_seconds:
+                return self._single(data, f"audio.{format}", duration, {}, {"input": size}, began)
+        samples, sample_rate = decode_audio(data, format)
+        timings = {"decode": round((time.perf_counter() - began) * 1000, 1)}
+        return self.transcribe(samples, sample_rate, timings, {"input": size})
+
+    def transcribe_file(self, audio_filepath):
+        with open(audio_filepath, "rb") as f:
+            data = f.read()
+        return self.transcribe_encoded(data, os.path.splitext(audio_filepath)[1].lstrip(".").lower())
+
+
+_transcriber = None
+_transcriber_lock = threading.Lock()
+
+
+def get_transcriber():
+    """The process-wide SegmentedTranscriber for STT_BACKEND, created on first use."""
+    global _transcriber
+    with _transcriber_lock:
+        if _transcriber is None:
+            _transcriber = SegmentedTranscriber(create_speech_backend())
+        return _transcriber
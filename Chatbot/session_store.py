@@ -0,0 +1,288 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from emotion_trends import EmotionSeries
+from risk_timeline import RiskTimeline
+
+logger = logging.getLogger(__name__)
+
+# Which session store the chat service uses:
+#   sqlite - sessions.db shared by every worker process, written behind in batches (default)
+#   memory - per-process LRU, lost on restart
+SESSION_STORE = os.environ.get("SESSION_STORE", "sqlite")
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", "sessions.db")
+SESSION_MAX_SESSIONS = int(os.environ.get("SESSION_MAX_SESSIONS", "10000"))
+SESSION_TTL_SECONDS = float(os.environ.get("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+SESSION_FLUSH_INTERVAL_MS = float(os.environ.get("SESSION_FLUSH_INTERVAL_MS", "200"))
+SESSION_FLUSH_BATCH = int(os.environ.get("SESSION_FLUSH_BATCH", "64"))
+
+# Objects stored inside session state that know how to serialise themselves.
+_CODECS = {"__risk_timeline__": RiskTimeline, "__emotion_series__": EmotionSeries}
+
+
+def _encode_value(obj):
+    for tag, cls in _CODECS.items():
+        if isinstance(obj, cls):
+            return {tag: obj.to_dict()}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _decode_value(data):
+    if len(data) == 1:
+        for tag, cls in _CODECS.items():
+            if tag in data:
+                return cls.from_dict(data[tag])
+    return data
+
+
+def encode_state(state):
+    return json.dumps(state, separators=(",", ":"), default=_encode_value)
+
+
+def decode_state(text):
+    return json.loads(text, object_hook=_decode_value)
+
+
+class SessionStore:
+    """Interface shared by the session store backends."""
+
+    def get(self, session_id):
+        """Returns the session's state dict, or None if it doesn't exist or has expired."""
+        raise NotImplementedError
+
+    def put(self, session_id, state):
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def metrics(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process LRU of live session dicts.
+
+    Holds at most max_sessions sessions; the least recently used one is
+    evicted first and sessions idle for longer than ttl_seconds expire.
+    """
+
+    def __init__(self, max_sessions=SESSION_MAX_SESSIONS, ttl_seconds=SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # session id -> (state, last touched, serialised size when last put)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            state, touched_at, size = entry
+            if self.ttl_seconds and time.time() - touched_at > self.ttl_seconds:
+                del self._sessions[session_id]
+                self.bytes -= size
+                self.expirations += 1
+                return None
+            self._sessions[session_id] = (state, time.time(), size)
+            self._sessions.move_to_end(session_id)
+            return state
+
+    def put(self, session_id, state):
+        # Serialised size is a stable, allocator-independent estimate of what the session holds.
+        size = len(encode_state(state))
+        with self._lock:
+            previous = self._sessions.pop(session_id, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._sessions[session_id] = (state, time.time(), size)
+            self.bytes += size
+            while len(self._sessions) > self.max_sessions:
+                _, (_, _, evicted) = self._sessions.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def delete(self, session_id):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self.bytes -= entry[2]
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "approx_bytes": self.bytes,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite database shared by several worker processes.
+
+    The database runs in WAL mode, so readers in other workers are not blocked
+    by a writer. Writes are buffered and flushed by a background thread in
+    one transaction every flush_interval_ms, or sooner once flush_batch
+    sessions are waiting. Reads check this process's buffer first, so a
+    worker always sees its own writes. The last write wins when two workers
+    update the same session at the same time.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, ttl_seconds=SESSION_TTL_SECONDS,
+                 flush_interval_ms=SESSION_FLUSH_INTERVAL_MS, flush_batch=SESSION_FLUSH_BATCH):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_batch = flush_batch
+        self._local = threading.local()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self.flushes = 0
+        self.rows_written = 0
+        self.expired_rows = 0
+        self._last_purge = 0.0
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        conn.commit()
+
+        self._flusher = threading.Thread(target=self._run, name="session-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _conn(self):
+        # sqlite3 connections can't be shared across threads, so each thread opens its own.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id):
+        with self._lock:
+            pending = self._pending.get(session_id)
+        if pending is not None:
+            text, _ = pending
+            return None if text is None else decode_state(text)
+        row = self._conn().execute(
+            "SELECT state, updated_at FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self.ttl_seconds and time.time() - row[1] > self.ttl_seconds:
+            return None
+        return decode_state(row[0])
+
+    def put(self, session_id, state):
+        # Serialise now so later in-place changes by the caller can't race the flusher.
+        text = encode_state(state)
+        with self._lock:
+            self._pending[session_id] = (text, time.time())
+            if len(self._pending) >= self.flush_batch:
+                self._wake.set()
+
+    def delete(self, session_id):
+        with self._lock:
+            self._pending[session_id] = (None, time.time())
+
+    def flush(self):
+        """Writes every buffered session in one transaction."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        upserts = [(sid, text, ts) for sid, (text, ts) in batch.items() if text is not None]
+        deletes = [(sid,) for sid, (text, _) in batch.items() if text is None]
+        conn = self._conn()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO sessions (id, state, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                    upserts,
+                )
+                conn.executemany("DELETE FROM sessions WHERE id = ?", deletes)
+        except sqlite3.Error:
+            # Put the batch back (without clobbering newer writes) and retry on the next tick.
+            with self._lock:
+                for sid, entry in batch.items():
+                    self._pending.setdefault(sid, entry)
+            raise
+        self.flushes += 1
+        self.rows_written += len(batch)
+
+    def _purge_expired(self):
+        if not self.ttl_seconds or time.monotonic() - self._last_purge < 60:
+            return
+        self._last_purge = time.monotonic()
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+        self.expired_rows += cursor.rowcount
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                self._purge_expired()
+            except sqlite3.Error:
+                logger.exception("Session store flush failed")
+
+    def metrics(self):
+        with self._lock:
+            pending = len(self._pending)
+        count = self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "sessions": count,
+            "pending_writes": pending,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "expired_rows": self.expired_rows,
+            "db_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+
+
+def create_session_store(kind=SESSION_STORE):
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown SESSION_STORE: {kind}")
@@ -0,0 +1,116 @@
+import queue
+import re
+import threading
+
+# Sentences shorter than this are joined with the next one, so the TTS engine
+# isn't called for fragments like "Okay." and prosody stays natural.
+MIN_SENTENCE_CHARS = 12
+
+# A sentence ends at ., ! or ? (optionally followed by closing quotes or
+# brackets) and then whitespace.
+_BOUNDARY_RE = re.compile(r"[.!?]+[\"')\]]*\s+")
+# Words whose trailing period doesn't end a sentence.
+_ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "prof", "st", "vs", "etc", "e.g", "i.e", "approx"}
+# Abbreviations only when a number follows ("No. 5"); otherwise ordinary words ("I said no. Then...").
+_NUMBER_ABBREVIATIONS = {"no"}
+
+
+class SentenceSplitter:
+    """
+    Turns a stream of text pieces (LLM tokens) into complete sentences.
+
+    feed() returns the sentences completed by a piece; flush() returns
+    whatever is left once the stream ends.
+    """
+
+    def __init__(self, min_chars=MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+        self._scan_from = 0
+
+    def feed(self, piece):
+        self._buffer += piece
+        sentences = []
+        start = 0
+        for match in _BOUNDARY_RE.finditer(self._buffer, self._scan_from):
+            end = match.end()
+            candidate = self._buffer[start:end]
+            last_word = candidate[:match.start() - start].rsplit(None, 1)[-1].lower() if candidate.strip() else ""
+            word = last_word.rstrip(".")
+            if word in _ABBREVIATIONS or len(candidate.strip()) < self.min_chars:
+                continue
+            if word in _NUMBER_ABBREVIATIONS and match.group().startswith(". "):
+                following = self._buffer[end:end + 1]
+                # Wait for the next piece if it may still bring the number.
+                if not following or following.isdigit():
+                    continue
+            sentences.append(candidate.strip())
+            start = end
+        self._buffer = self._buffer[start:]
+        # Resume scanning near the end; a boundary needs the whitespace that follows it.
+        self._scan_from = max(0, len(self._buffer) - 8)
+        return sentences
+
+    def flush(self):
+        rest, self._buffer, self._scan_from = self._buffer.strip(), "", 0
+        return [rest] if rest else []
+
+
+def stream_speech(text_pieces, tts_service, on_text=None, cancel=None):
+    """
+    Synthesises a streaming reply sentence by sentence.
+
+    A background thread reads text_pieces (e.g. the LLM token stream), splits
+    it into sentences and submits each one to tts_service the moment it is
+    complete, so synthesis of early sentences overlaps generation of later
+    ones. This generator yields (index, sentence, audio bytes) strictly in
+    order, each as soon as its audio is ready. on_text, if given, is called
+    with every text piece as it arrives. Errors from the text stream or TTS
+    are re-raised here.
+
+    cancel, if given, is a threading.Event: once set, no further text is read
+    (the text stream is closed, which drops the LLM connection), no further
+    sentences are submitted and the generator stops. Sentences already
+    submitted finish into the TTS cache.
+    """
+    futures = queue.Queue()
+    done = object()
+
+    def cancelled():
+        return cancel is not None and cancel.is_set()
+
+    def produce():
+        splitter = SentenceSplitter()
+        try:
+            for piece in text_pieces:
+                if cancelled():
+                    break
+                if on_text is not None:
+                    on_text(piece)
+                for sentence in splitter.feed(piece):
+                    futures.put((sentence, tts_service.submit(sentence)[1]))
+            else:
+                for sentence in splitter.flush():
+                    futures.put((sentence, tts_service.submit(sentence)[1]))
+        except Exception as e:
+            futures.put(e)
+        finally:
+            if cancelled() and hasattr(text_pieces, "close"):
+                text_pieces.close()
+        futures.put(done)
+
+    threading.Thread(target=produce, name="speech-pipeline", daemon=True).start()
+    index = 0
+    while True:
+        item = futures.get()
+        if item is done or cancelled():
+            return
+        if isinstance(item, Exception):
+            raise item
+        sentence, future = item
+        audio = future.result()
+        if cancelled():
+            return
+        yield index, sentence, audio
+        index += 1
+
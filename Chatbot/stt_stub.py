@@ -0,0 +1,89 @@
+"""
+Offline stand-in for the speech-to-text API.
+
+ToneSpeechBackend.render() turns text into "speech" where every word is a
+short tone at its own frequency, with short gaps between words and longer
+pauses after sentences. Its transcribe() recovers the words from such audio
+by finding the tones and their frequencies, so splitting, overlap and
+stitching can be checked exactly against the source text without a network
+or a model. An optional latency models the remote API.
+"""
+import threading
+import time
+
+import numpy as np
+
+from audio_processing import read_wav
+
+STUB_SAMPLE_RATE = 16000
+_WORD_SECONDS = 0.22
+_WORD_GAP_SECONDS = 0.08
+_SENTENCE_GAP_SECONDS = 0.5
+_BASE_HZ = 300.0
+_STEP_HZ = 10.0
+# Tones clipped shorter than this at a segment edge are dropped, as a
+# recogniser drops a cut-off syllable.
+_MIN_TONE_SECONDS = 0.06
+_FRAME_SECONDS = 0.01
+
+
+class ToneSpeechBackend:
+    name = "stub"
+
+    def __init__(self, latency_ms=0.0, ms_per_audio_second=0.0):
+        self.latency = latency_ms / 1000.0
+        self.per_audio_second = ms_per_audio_second / 1000.0
+        self._words = []
+        self._index = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def _word_index(self, word):
+        with self._lock:
+            if word not in self._index:
+                self._index[word] = len(self._words)
+                self._words.append(word)
+            return self._index[word]
+
+    def render(self, text, sample_rate=STUB_SAMPLE_RATE):
+        """float32 samples in which each word of text is one tone."""
+        t = np.arange(int(_WORD_SECONDS * sample_rate)) / sample_rate
+        fade = np.minimum(1.0, np.minimum(t, t[::-1]) / 0.01)
+        parts = []
+        for word in text.split():
+            frequency = _BASE_HZ + _STEP_HZ * self._word_index(word)
+            if frequency >= sample_rate / 2:
+                raise ValueError("Vocabulary too large for the stub's sample rate")
+            parts.append((0.5 * fade * np.sin(2 * np.pi * frequency * t)).astype(np.float32))
+            gap = _SENTENCE_GAP_SECONDS if word[-1] in ".!?" else _WORD_GAP_SECONDS
+            parts.append(np.zeros(int(gap * sample_rate), dtype=np.float32))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    def transcribe(self, audio, language=None, filename="segment.wav"):
+        if not filename.endswith(".wav"):
+            raise ValueError(f"The stub reads WAV only, got {filename}")
+        samples, sample_rate = read_wav(audio)
+        if samples.ndim > 1:
+            samples = samples.mean(axis=1)
+        duration = len(samples) / sample_rate
+        time.sleep(self.latency + self.per_audio_second * duration)
+        with self._lock:
+            self.requests += 1
+
+        hop = int(_FRAME_SECONDS * sample_rate)
+        n = len(samples) // hop
+        if n == 0:
+            return ""
+        loud = np.sqrt(np.mean(samples[:n * hop].reshape(n, hop) ** 2, axis=1)) > 0.02
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], loud.astype(np.int8), [0]))))
+        words = []
+        for start, end in zip(edges[::2] * hop, edges[1::2] * hop):
+            if (end - start) / sample_rate < _MIN_TONE_SECONDS:
+                continue
+            tone = samples[start:end] * np.hanning(end - start)
+            # Zero-padded to one second, so bins are 1 Hz apart.
+            spectrum = np.abs(np.fft.rfft(tone, n=max(sample_rate, end - start)))
+            frequency = np.argmax(spectrum) * sample_rate / max(sample_rate, end - start)
+            index = int(round((frequency - _BASE_HZ) / _STEP_HZ))
+            words.append(self._words[index] if 0 <= index < len(self._words) else "<unk>")
+        return " ".join(words)
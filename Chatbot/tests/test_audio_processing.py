@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from audio_processing import (change_speed, float_to_pcm16, pcm16_to_float, read_wav, time_stretch, to_float32,
+                              write_wav)
+
+RATE = 16000
+
+
+def tone(freq=220.0, seconds=1.0, rate=RATE):
+    t = np.arange(int(seconds * rate)) / rate
+    return (0.5 * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def dominant_frequency(samples, rate=RATE):
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples))))
+    return np.fft.rfftfreq(len(samples), 1 / rate)[np.argmax(spectrum)]
+
+
+def test_pcm16_round_trip():
+    samples = np.array([0.0, 0.5, -0.5, 1.0, -1.0], dtype=np.float32)
+    assert np.allclose(pcm16_to_float(float_to_pcm16(samples)), samples, atol=1e-4)
+    # Out-of-range samples are clipped rather than wrapped.
+    assert pcm16_to_float(float_to_pcm16(np.array([2.0, -2.0])))[0] > 0.99
+
+
+def test_to_float32_scales_integers():
+    assert to_float32(np.array([16384, -32768], dtype=np.int16)).tolist() == [0.5, -1.0]
+
+
+def test_wav_round_trip():
+    samples = tone(seconds=0.1)
+    decoded, rate = read_wav(write_wav(samples, RATE))
+    assert rate == RATE
+    assert np.allclose(decoded, samples, atol=1e-4)
+
+
+@pytest.mark.parametrize("speed", [0.8, 1.25, 1.5])
+def test_time_stretch_changes_duration_but_not_pitch(speed):
+    samples = tone(220.0, seconds=2.0)
+    stretched = time_stretch(samples, speed, RATE)
+    assert len(stretched) == round(len(samples) / speed)
+    assert abs(dominant_frequency(stretched) - 220.0) < 2.0
+    # A steady tone keeps its level: no gaps or doubled-up frames.
+    middle = stretched[len(stretched) // 4:-len(stretched) // 4]
+    assert np.sqrt(np.mean(middle ** 2)) == pytest.approx(0.5 / np.sqrt(2), rel=0.05)
+
+
+def test_time_stretch_keeps_channels():
+    stereo = np.stack((tone(220.0), tone(330.0)), axis=1)
+    stretched = time_stretch(stereo, 1.25, RATE)
+    assert stretched.shape == (round(len(stereo) / 1.25), 2)
+    assert abs(dominant_frequency(stretched[:, 1]) - 330.0) < 2.0
+
+
+def test_time_stretch_at_normal_speed_copies():
+    samples = tone(seconds=0.1)
+    stretched = time_stretch(samples, 1.0, RATE)
+    assert stretched is not samples
+    assert np.array_equal(stretched, samples)
+    assert len(time_stretch(np.zeros(0, dtype=np.float32), 1.5, RATE)) == 0
+
+
+def test_time_stretch_rejects_non_positive_speeds():
+    with pytest.raises(ValueError, match="speed must be positive"):
+        time_stretch(tone(seconds=0.1), 0, RATE)
+
+
+def test_change_speed_of_raw_pcm():
+    data = float_to_pcm16(tone(seconds=1.0, rate=22050))
+    faster = change_speed(data, 1.25, "pcm_22050")
+    assert len(faster) == 2 * round(22050 / 1.25)
+    assert change_speed(data, 1.0, "pcm_22050") is data
+
+
+def test_change_speed_of_wav():
+    faster = change_speed(write_wav(tone(seconds=1.0), RATE), 1.25, "wav_16000")
+    samples, rate = read_wav(faster)
+    assert rate == RATE
+    assert len(samples) == round(RATE / 1.25)
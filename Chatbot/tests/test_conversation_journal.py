@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+from conversation_journal import ConversationJournal
+from emotion_trends import EmotionSeries
+from risk_timeline import RiskTimeline
+from session_store import encode_state
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = ConversationJournal(str(tmp_path), fsync_interval_ms=3600 * 1000)
+    yield journal
+    journal.close()
+
+
+def new_state():
+    return {"messages": [{"role": "system", "content": "You are a doctor."}],
+            "risk_timeline": RiskTimeline(5), "emotion_series": EmotionSeries(), "session_id": "s1"}
+
+
+def play_turn(state, i):
+    state["emotion_series"].append({"Sadness": 0.5, "Joy": i / 10}, timestamp=1000.0 + i)
+    state["messages"].append({"role": "system", "content": f"Mood Report: turn {i}"})
+    state["risk_timeline"].add(i / 10, timestamp=1000.0 + i)
+    state["messages"].append({"role": "user", "content": f"message {i}"})
+    state["messages"].append({"role": "assistant", "content": f"reply {i}"})
+
+
+def test_replay_rebuilds_the_state(journal, tmp_path):
+    state = new_state()
+    for i in range(5):
+        play_turn(state, i)
+        journal.append("s1", state)
+    journal.flush()
+
+    rebuilt = ConversationJournal(str(tmp_path)).load("s1")
+    assert encode_state(rebuilt) == encode_state(state)
+    assert rebuilt["risk_timeline"].average == pytest.approx(state["risk_timeline"].average)
+
+
+def test_each_turn_only_appends_what_is_new(journal):
+    state = new_state()
+    play_turn(state, 0)
+    journal.append("s1", state)
+    play_turn(state, 1)
+    journal.append("s1", state)
+    journal.append("s1", state)
+    journal.flush()
+    with open(journal.path("s1"), encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    # One snapshot, then 3 messages, a risk score and a mood report for turn 1.
+    assert len(lines) == 1 + 5
+
+
+def test_compaction_replaces_the_journal_with_a_snapshot(tmp_path):
+    journal = ConversationJournal(str(tmp_path), fsync_interval_ms=3600 * 1000, compact_records=10)
+    state = new_state()
+    for i in range(6):
+        play_turn(state, i)
+        journal.append("s1", state)
+    journal.close()
+    assert journal.compactions == 1
+    assert encode_state(ConversationJournal(str(tmp_path)).load("s1")) == encode_state(state)
+
+
+def test_a_torn_last_record_is_dropped(journal, tmp_path):
+    state = new_state()
+    play_turn(state, 0)
+    journal.append("s1", state)
+    journal.flush()
+    expected = encode_state(state)
+    path = journal.path("s1")
+    with open(path, "ab") as f:
+        f.write(b'{"type":"message","role":"user","cont')
+    size = os.path.getsize(path)
+
+    reader = ConversationJournal(str(tmp_path), fsync_interval_ms=3600 * 1000)
+    rebuilt = reader.load("s1")
+    assert encode_state(rebuilt) == expected
+    assert os.path.getsize(path) < size
+
+    # Appending after the cut starts on a fresh line.
+    play_turn(rebuilt, 1)
+    reader.append("s1", rebuilt)
+    reader.close()
+    assert encode_state(ConversationJournal(str(tmp_path)).load("s1")) == encode_state(rebuilt)
+
+
+def test_a_corrupt_record_mid_journal_is_an_error(journal):
+    state = new_state()
+    journal.append("s1", state)
+    journal.flush()
+    with open(journal.path("s1"), "ab") as f:
+        f.write(b"not json\n")
+    with pytest.raises(ValueError):
+        journal.load("s1")
+
+
+def test_unknown_session(journal):
+    assert journal.load("nobody") is None
+
+
+def test_unsafe_session_ids_are_hashed(journal, tmp_path):
+    path = journal.path("../../etc/passwd")
+    assert os.path.dirname(path) == str(tmp_path)
+    assert ".." not in os.path.basename(path)
@@ -0,0 +1,66 @@
+import pytest
+
+from crisis_keywords import CrisisMatcher, expand_pattern, get_matcher, normalize
+
+
+def kinds(text):
+    return {match.phrase: match.kind for match in get_matcher().find(text)}
+
+
+@pytest.mark.parametrize("text", [
+    "I want to kill myself",
+    "I cut my wrists last night",
+    "I want to hurt myself",
+    "This is my final goodbye",
+    "No, I want to die",
+    "I'm not just sad, I'm suicidal",
+    # A negation in an earlier clause doesn't carry over.
+    "I am not okay and I want to die",
+    "I did not sleep and I want to die",
+    "I dont care anymore I want to die",
+])
+def test_crisis_statements_force(text):
+    assert "crisis" in kinds(text).values()
+
+
+@pytest.mark.parametrize("text", [
+    "I burn myself out cooking every weekend",
+    "I keep thinking about death since grandma passed",
+    "This is my last day at this job",
+    "I want to kill someone in this game, they camp the spawn",
+])
+def test_everyday_phrases_are_only_suggestive(text):
+    found = kinds(text)
+    assert found
+    assert set(found.values()) == {"suggestive"}
+
+
+@pytest.mark.parametrize("text", [
+    "I'm not suicidal",
+    "I don't want to kill myself",
+    "I never thought about suicide",
+])
+def test_negated_statements_do_not_force(text):
+    found = kinds(text)
+    assert found
+    assert set(found.values()) == {"negated"}
+
+
+def test_slang_no_longer_matches():
+    assert kinds("lol kys") == {}
+
+
+def test_normalize_folds_case_and_apostrophes_and_marks_clauses():
+    assert normalize("  I DON’T   want to DIE!! ") == "i dont want to die"
+    assert normalize("No, I want to die.", clauses=True) == "no\ni want to die"
+
+
+def test_expand_pattern():
+    assert sorted(expand_pattern("(want|wanna) to (die|disappear)")) == [
+        "wanna to die", "wanna to disappear", "want to die", "want to disappear",
+    ]
+
+
+def test_a_phrase_found_twice_reports_its_strongest_kind():
+    matcher = CrisisMatcher({"kill myself": "kill myself"})
+    assert [m.kind for m in matcher.find("I won't kill myself. I will kill myself.")] == ["crisis"]
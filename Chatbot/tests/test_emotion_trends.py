@@ -0,0 +1,59 @@
+import math
+
+import pytest
+
+from emotion_trends import (EmotionSeries, format_mood_report, parse_mood_report, process_mood_report,
+                            record_mood_report)
+
+
+def test_csv_report_round_trip():
+    report = format_mood_report("job-1", "I feel low, and tired", ["Sadness", "Joy"], [0.61234, 0.1])
+    assert parse_mood_report(report) == {"Sadness": 0.6123, "Joy": 0.1}
+
+
+def test_unquoted_commas_in_the_text_column():
+    report = "id,text,Sadness,Joy\njob-1,low, tired,0.6,0.1\n"
+    assert parse_mood_report(report) == {"Sadness": 0.6, "Joy": 0.1}
+
+
+@pytest.mark.parametrize("report", ["⚠️ Mood API timed out", "id,text\n", "id,text,Sadness\njob,hi,high\n", None])
+def test_not_a_report(report):
+    assert parse_mood_report(report) is None
+
+
+def test_process_mood_report_lists_the_strongest_emotions():
+    report = format_mood_report("job", "text", ["Joy", "Fear", "Sadness", "Anger"], [0.05, 0.2, 0.6, 0.15])
+    assert process_mood_report(report) == "Sadness: 60.00%, Fear: 20.00%, Anger: 15.00%"
+
+
+def test_record_mood_report_from_csv_into_the_series():
+    state = {"messages": []}
+    record_mood_report(state, format_mood_report("a", "x", ["Sadness", "Joy"], [0.7, 0.3]))
+    record_mood_report(state, format_mood_report("b", "y", ["Fear", "Sadness"], [0.5, 0.5]))
+    series = state["emotion_series"]
+    assert series.labels == ["Sadness", "Joy", "Fear"]
+    assert len(series) == 2
+    assert math.isnan(series.values[0, 2])
+    assert state["messages"][0]["content"].startswith("Mood Report: Sadness: 70.00%")
+
+
+def test_series_dict_round_trip():
+    series = EmotionSeries()
+    series.append({"Sadness": 0.7, "Joy": 0.3}, timestamp=10.0)
+    series.append({"Fear": 0.5, "Sadness": 0.25}, timestamp=20.0)
+    restored = EmotionSeries.from_dict(series.to_dict())
+    assert restored.labels == series.labels
+    assert restored.timestamps.tolist() == [10.0, 20.0]
+    assert restored.to_dict() == series.to_dict()
+    restored.append({"Joy": 1.0}, timestamp=30.0)
+    assert len(restored) == 3
+
+
+def test_shifts():
+    series = EmotionSeries()
+    for ts in range(3):
+        series.append({"Joy": 0.9, "Sadness": 0.1}, timestamp=ts)
+    series.append({"Joy": 0.1, "Sadness": 0.9}, timestamp=3)
+    shifts = series.shifts()
+    assert [(s["index"], s["from"], s["to"]) for s in shifts] == [(3, "Joy", "Sadness")]
+    assert shifts[0]["distance"] == pytest.approx(0.8)
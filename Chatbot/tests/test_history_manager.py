@@ -0,0 +1,73 @@
+from history_manager import (ALERT_PREFIX, MOOD_PREFIX, SUMMARY_PREFIX, HistoryManager, count_message_tokens,
+                             split_turns)
+
+SYSTEM = {"role": "system", "content": "You are a doctor."}
+
+
+def conversation(turns, words=3):
+    messages = [SYSTEM]
+    for i in range(turns):
+        messages.append({"role": "system", "content": f"{MOOD_PREFIX} Sadness: {i}%"})
+        messages.append({"role": "user", "content": f"Patient turn {i}. " + "word " * words})
+        messages.append({"role": "assistant", "content": f"Doctor turn {i}. " + "reply " * words})
+    return messages
+
+
+def contents(prompt):
+    return [message["content"] for message in prompt]
+
+
+def test_split_turns():
+    system_prompt, turns = split_turns(conversation(2) + [{"role": "system", "content": "pending note"}])
+    assert system_prompt is SYSTEM
+    assert len(turns) == 3
+    assert turns[0]["user"]["content"].startswith("Patient turn 0")
+    assert turns[2]["user"] is None
+
+
+def test_short_conversation_is_sent_verbatim_with_only_the_newest_mood():
+    state = {"messages": conversation(3)}
+    prompt, stats = HistoryManager(token_budget=10000).build_prompt(state)
+    moods = [c for c in contents(prompt) if c.startswith(MOOD_PREFIX)]
+    assert moods == [f"{MOOD_PREFIX} Sadness: 2%"]
+    assert len([m for m in prompt if m["role"] == "user"]) == 3
+    assert stats["after"] < stats["before"]
+
+
+def test_old_turns_are_folded_into_the_summary_within_the_budget():
+    state = {"messages": conversation(20, words=20)}
+    manager = HistoryManager(token_budget=400, keep_turns=6)
+    prompt, stats = manager.build_prompt(state)
+    assert stats["after"] <= 400
+    assert prompt[0] is SYSTEM
+    assert prompt[1]["content"].startswith(SUMMARY_PREFIX)
+    assert contents(prompt)[-1].startswith("Doctor turn 19")
+    assert state["history_summary"]["turns"] >= 14
+    # The transcript itself is left alone.
+    assert len(state["messages"]) == 61
+
+
+def test_summarised_turns_are_not_resent_verbatim():
+    state = {"messages": conversation(4)}
+    # One long turn forces everything before the newest turn into the summary.
+    state["messages"][-2]["content"] = "Patient turn 3. " + "long " * 200
+    HistoryManager(token_budget=300, keep_turns=6).build_prompt(state)
+    summarised = state["history_summary"]["turns"]
+    assert summarised == 3
+
+    state["messages"].append({"role": "user", "content": "Patient turn 4. short"})
+    prompt, _ = HistoryManager(token_budget=10000, keep_turns=6).build_prompt(state)
+    verbatim = [c for c in contents(prompt) if c.startswith("Patient turn")]
+    assert verbatim == [state["messages"][-3]["content"], "Patient turn 4. short"]
+
+
+def test_only_the_latest_alert_is_kept():
+    messages = conversation(3)
+    messages.insert(4, {"role": "system", "content": f"{ALERT_PREFIX} first"})
+    messages.insert(8, {"role": "system", "content": f"{ALERT_PREFIX} second"})
+    prompt, _ = HistoryManager(token_budget=10000).build_prompt({"messages": messages})
+    assert [c for c in contents(prompt) if c.startswith(ALERT_PREFIX)] == [f"{ALERT_PREFIX} second"]
+
+
+def test_count_message_tokens_includes_the_per_message_overhead():
+    assert count_message_tokens([{"role": "user", "content": ""}]) > 0
@@ -0,0 +1,60 @@
+import pytest
+
+from micro_batching import MicroBatcher
+
+
+def test_concurrent_items_share_a_batch():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=200)
+    futures = [batcher.submit(i) for i in range(5)]
+    assert [future.result(timeout=5) for future in futures] == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+    assert batcher.stats() == {"batches": 1, "items": 5, "avg_batch_size": 5.0}
+    batcher.close()
+
+
+def test_batches_never_exceed_max_batch_size():
+    sizes = []
+    batcher = MicroBatcher(lambda items: sizes.append(len(items)) or items, max_batch_size=3, max_wait_ms=100)
+    futures = [batcher.submit(i) for i in range(7)]
+    assert [future.result(timeout=5) for future in futures] == list(range(7))
+    assert max(sizes) <= 3
+    assert sum(sizes) == 7
+    batcher.close()
+
+
+def test_a_failing_batch_fails_every_future_in_it():
+    def batch_fn(items):
+        raise RuntimeError("model crashed")
+
+    batcher = MicroBatcher(batch_fn, max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            future.result(timeout=5)
+    # The worker keeps serving later batches.
+    batcher.batch_fn = lambda items: items
+    assert batcher("ok", timeout=5) == "ok"
+    batcher.close()
+
+
+def test_a_wrong_number_of_results_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:-1], max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(2)]
+    with pytest.raises(ValueError, match="returned 1 results for 2 items"):
+        futures[0].result(timeout=5)
+    batcher.close()
+
+
+def test_close_processes_queued_items_then_refuses_new_ones():
+    batcher = MicroBatcher(lambda items: items, max_wait_ms=50)
+    future = batcher.submit("queued")
+    batcher.close()
+    assert future.result(timeout=5) == "queued"
+    with pytest.raises(RuntimeError, match="closed"):
+        batcher.submit("late")
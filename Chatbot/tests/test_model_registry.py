@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from model_registry import ModelRegistry, start_warmup  # noqa: E402
+
+
+def test_models_load_on_first_use_only():
+    loads = []
+    registry = ModelRegistry()
+    registry.register("model", lambda: loads.append(1) or "weights")
+    assert loads == []
+    assert registry.status()["models"]["model"]["state"] == "pending"
+    assert registry.get("model") == "weights"
+    assert registry.get("model") == "weights"
+    assert loads == [1]
+    assert registry.is_ready()
+
+
+def test_concurrent_first_calls_load_once():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.1)
+        return "weights"
+
+    registry = ModelRegistry()
+    registry.register("model", loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("model"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["weights"] * 8
+    assert loads == [1]
+
+
+def test_warm_up_runs_after_loading():
+    warmed = []
+    registry = ModelRegistry()
+    registry.register("model", lambda: "weights", warm_up=warmed.append)
+    registry.warm_up(background=False)
+    assert warmed == ["weights"]
+    status = registry.status()
+    assert status["ready"]
+    assert status["warmup_seconds"] is not None
+    assert status["models"]["model"]["load_seconds"] is not None
+
+
+def test_a_failed_load_is_reported_and_retried():
+    attempts = []
+
+    def loader():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("download failed")
+        return "weights"
+
+    registry = ModelRegistry()
+    registry.register("flaky", loader)
+    registry.register("fine", lambda: "other")
+    # Warming up carries on past a failure.
+    registry.warm_up(background=False)
+    status = registry.status()
+    assert not status["ready"]
+    assert status["models"]["flaky"] == {"state": "failed", "load_seconds": None, "error": "download failed"}
+    assert status["models"]["fine"]["state"] == "ready"
+    assert registry.get("flaky") == "weights"
+    assert registry.is_ready()
+
+
+def test_background_warm_up_returns_at_once():
+    release = threading.Event()
+    registry = ModelRegistry()
+    registry.register("slow", lambda: release.wait(5) and "weights")
+    thread = registry.warm_up(background=True)
+    assert registry.status()["models"]["slow"]["state"] in ("pending", "loading")
+    release.set()
+    thread.join(5)
+    assert registry.is_ready()
+
+
+def test_unknown_warmup_mode():
+    with pytest.raises(ValueError, match="Unknown MODEL_WARMUP mode"):
+        start_warmup("sometimes")
@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from emotion_trends import format_mood_report  # noqa: E402
+from mood_backends import MoodRouter, _chain  # noqa: E402
+
+LABELS = ["Anger", "Joy", "Sadness"]
+
+
+def report(source, scores):
+    return format_mood_report(source, "hello", LABELS, scores)
+
+
+class FakeBackend:
+    """Answers after delay seconds with a fixed report, an error string or an exception."""
+
+    def __init__(self, outcome, delay=0.0):
+        self.outcome = outcome
+        self.delay = delay
+        self.calls = 0
+
+    def submit(self, text):
+        self.calls += 1
+        future = Future()
+
+        def finish():
+            if isinstance(self.outcome, Exception):
+                future.set_exception(self.outcome)
+            else:
+                future.set_result(self.outcome)
+
+        if self.delay:
+            threading.Timer(self.delay, finish).start()
+        else:
+            finish()
+        return future
+
+    def stats(self):
+        return {}
+
+
+def router(mode, remote, local, fallback_after_ms=100):
+    mood_router = MoodRouter(mode=mode, fallback_after_ms=fallback_after_ms)
+    mood_router.remote, mood_router.local = remote, local
+    return mood_router
+
+
+REMOTE = report("remote", [0.1, 0.2, 0.7])
+LOCAL = report("local", [0.1, 0.6, 0.3])
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError, match="Unknown MOOD_LOCAL_MODE"):
+        MoodRouter(mode="sometimes")
+
+
+def test_chain_copies_results_and_errors():
+    source, target = Future(), Future()
+    _chain(source, target)
+    source.set_result("done")
+    assert target.result(timeout=1) == "done"
+    source, target = Future(), Future()
+    _chain(source, target)
+    source.set_exception(RuntimeError("boom"))
+    with pytest.raises(RuntimeError, match="boom"):
+        target.result(timeout=1)
+
+
+def test_primary_uses_only_the_local_backend():
+    remote, local = FakeBackend(REMOTE), FakeBackend(LOCAL)
+    assert router("primary", remote, local).analyze("hello") == LOCAL
+    assert remote.calls == 0
+
+
+def test_fallback_serves_a_fast_remote():
+    local = FakeBackend(LOCAL)
+    mood_router = router("fallback", FakeBackend(REMOTE), local)
+    assert mood_router.analyze("hello") == REMOTE
+    assert local.calls == 0
+    assert mood_router.stats()["fallbacks"] == 0
+
+
+def test_fallback_after_the_remote_budget():
+    mood_router = router("fallback", FakeBackend(REMOTE, delay=0.5), FakeBackend(LOCAL), fallback_after_ms=50)
+    assert mood_router.submit("hello").result(timeout=0.4) == LOCAL
+    assert mood_router.stats()["fallbacks"] == 1
+
+
+@pytest.mark.parametrize("outcome", [RuntimeError("connection refused"), "⚠️ Error: API returned 503"])
+def test_fallback_when_the_remote_fails(outcome):
+    mood_router = router("fallback", FakeBackend(outcome), FakeBackend(LOCAL), fallback_after_ms=5000)
+    assert mood_router.submit("hello").result(timeout=1) == LOCAL
+    assert mood_router.stats()["fallbacks"] == 1
+
+
+def test_a_remote_answer_after_the_fallback_is_ignored():
+    remote = FakeBackend(REMOTE, delay=0.15)
+    mood_router = router("fallback", remote, FakeBackend(LOCAL), fallback_after_ms=20)
+    future = mood_router.submit("hello")
+    assert future.result(timeout=1) == LOCAL
+    time.sleep(0.3)
+    assert future.result() == LOCAL
+    assert mood_router.stats()["fallbacks"] == 1
+
+
+def test_shadow_serves_the_remote_and_compares():
+    mood_router = router("shadow", FakeBackend(REMOTE), FakeBackend(LOCAL))
+    assert mood_router.analyze("hello") == REMOTE
+    mood_router.analyze("hello")
+    shadow = mood_router.stats()["shadow"]
+    assert shadow["compared"] == 2
+    # Sadness tops the remote report, Joy the local one.
+    assert shadow["top_emotion_agreement"] == 0.0
+    assert shadow["mean_abs_diff"] == pytest.approx((0 + 0.4 + 0.4) / 3, abs=1e-4)
+
+
+def test_shadow_skips_failed_reports():
+    mood_router = router("shadow", FakeBackend("⚠️ Error"), FakeBackend(LOCAL))
+    assert mood_router.analyze("hello") == "⚠️ Error"
+    mood_router = router("shadow", FakeBackend(REMOTE), FakeBackend(RuntimeError("model missing")))
+    assert mood_router.analyze("hello") == REMOTE
+    assert mood_router.stats()["shadow"]["compared"] == 0
@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+import time
+
+from risk_cache import RiskCache, normalize_message
+
+
+def test_normalize_message_only_changes_whitespace_and_composition():
+    assert normalize_message("  I feel\tso\n\nlow  ") == "I feel so low"
+    assert normalize_message("café") == "café"
+    assert normalize_message("Case Stays") == "Case Stays"
+
+
+def test_keys_depend_on_the_model_and_the_text():
+    key = RiskCache.key("mental@abc/torch", "hello")
+    assert key == RiskCache.key("mental@abc/torch", "hello")
+    assert key != RiskCache.key("mental@def/torch", "hello")
+    assert key != RiskCache.key("mental@abc/torch", "hello!")
+
+
+def test_lru_eviction():
+    cache = RiskCache(max_entries=2)
+    cache.put("a", [0.1])
+    cache.put("b", [0.2])
+    assert cache.get("a") == [0.1]
+    cache.put("c", [0.3])
+    assert cache.get("b") is None
+    assert cache.get("a") == [0.1]
+    assert cache.get("c") == [0.3]
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 3, 1)
+
+
+def test_entries_expire():
+    cache = RiskCache(ttl_seconds=60)
+    cache.put("a", [0.1])
+    cache._entries["a"] = ([0.1], time.time() - 120)
+    assert cache.get("a") is None
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "risk_cache.json")
+    cache = RiskCache(path=path, save_interval=3600)
+    cache.put("a", [0.1, 0.2])
+    cache.put("b", [0.3])
+    cache.save()
+    restored = RiskCache(path=path)
+    assert restored.get("a") == [0.1, 0.2]
+    assert restored.get("b") == [0.3]
+    assert restored.stats()["persistent"]
+
+
+def test_expired_entries_are_not_loaded(tmp_path):
+    path = tmp_path / "risk_cache.json"
+    path.write_text(json.dumps({"version": 1, "entries": [["old", [0.5], time.time() - 1000],
+                                                          ["new", [0.6], time.time()]]}))
+    cache = RiskCache(ttl_seconds=100, path=str(path))
+    assert cache.get("old") is None
+    assert cache.get("new") == [0.6]
+
+
+def test_an_unreadable_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "risk_cache.json"
+    path.write_text("{not json")
+    assert RiskCache(path=str(path)).stats()["entries"] == 0
+
+
+def test_concurrent_saves_leave_a_valid_snapshot(tmp_path):
+    path = str(tmp_path / "risk_cache.json")
+    cache = RiskCache(path=path, save_interval=3600)
+    for i in range(2000):
+        cache.put(str(i), [i / 2000])
+
+    def save():
+        cache._dirty = True
+        cache.save()
+
+    threads = [threading.Thread(target=save) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(path, encoding="utf-8") as f:
+        assert len(json.load(f)["entries"]) == 2000
+    assert os.listdir(tmp_path) == ["risk_cache.json"]
@@ -0,0 +1,53 @@
+import math
+
+import pytest
+
+from risk_timeline import RiskTimeline
+
+
+def test_sliding_window_average():
+    timeline = RiskTimeline(window_size=3)
+    averages = [timeline.add(score, timestamp=i) for i, score in enumerate([0.1, 0.2, 0.3, 0.9])]
+    assert averages == pytest.approx([0.1, 0.15, 0.2, (0.2 + 0.3 + 0.9) / 3])
+    assert timeline.window() == [0.2, 0.3, 0.9]
+
+
+def test_ewma():
+    timeline = RiskTimeline(window_size=5, ewma_alpha=0.5)
+    timeline.add(0.0, timestamp=0)
+    timeline.add(1.0, timestamp=1)
+    assert timeline.ewma == pytest.approx(0.5)
+
+
+def test_decayed_average_halves_the_weight_of_old_scores():
+    timeline = RiskTimeline(window_size=5, half_life_seconds=60)
+    timeline.add(1.0, timestamp=0)
+    timeline.add(0.0, timestamp=60)
+    # The first score now counts half as much as the second.
+    assert timeline.decayed_average == pytest.approx(0.5 / 1.5)
+
+
+def test_query():
+    timeline = RiskTimeline(window_size=2)
+    for i in range(5):
+        timeline.add(i / 10, timestamp=100 + i)
+    assert [entry["timestamp"] for entry in timeline.query(since=102)] == [103, 104]
+    assert [entry["score"] for entry in timeline.query(limit=2)] == [0.3, 0.4]
+
+
+def test_dict_round_trip_is_identical():
+    timeline = RiskTimeline(window_size=3, history_size=4)
+    for i, score in enumerate([0.2, 0.7, 0.4, 0.9, 0.1]):
+        timeline.add(score, timestamp=1000 + 30 * i)
+    restored = RiskTimeline.from_dict(timeline.to_dict())
+    assert restored.summary() == pytest.approx(timeline.summary())
+    assert list(restored.history) == list(timeline.history)
+    # Both carry on the same way.
+    assert restored.add(0.5, timestamp=1200) == pytest.approx(timeline.add(0.5, timestamp=1200))
+    assert restored.decayed_average == pytest.approx(timeline.decayed_average)
+
+
+def test_from_scores_reads_the_legacy_list():
+    timeline = RiskTimeline.from_scores([0.2, 0.4], window_size=5)
+    assert timeline.average == pytest.approx(0.3)
+    assert not math.isnan(timeline.decayed_average)
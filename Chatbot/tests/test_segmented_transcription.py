@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from segmented_transcription import SegmentedTranscriber, merge_overlap, plan_segments
+from stt_stub import STUB_SAMPLE_RATE, ToneSpeechBackend
+
+
+@pytest.mark.parametrize("left, right, expected", [
+    ("I have not been sleeping", "been sleeping well lately", "I have not been sleeping well lately"),
+    # Case and punctuation are ignored when matching the overlap.
+    ("work has been hard.", "Been hard, and I", "work has been hard. and I"),
+    ("work has been hard.", "has been hard. I", "work has been hard. I"),
+    # A misheard word at either edge is skipped.
+    ("I feel tired all thu", "tired all the time", "I feel tired all the time"),
+    ("no overlap here", "at all", "no overlap here at all"),
+    ("", "first segment", "first segment"),
+])
+def test_merge_overlap(left, right, expected):
+    assert merge_overlap(left, right) == expected
+
+
+def test_single_word_overlap_needs_no_skip():
+    assert merge_overlap("I said yes", "yes I did") == "I said yes I did"
+    # One shared word after a skipped one is too weak to count as overlap.
+    assert merge_overlap("I said yes um", "yes I did") == "I said yes um yes I did"
+
+
+def test_short_recordings_are_one_segment():
+    samples = np.zeros(10 * STUB_SAMPLE_RATE, dtype=np.float32)
+    assert plan_segments(samples, STUB_SAMPLE_RATE) == [(0, len(samples))]
+
+
+def test_long_recordings_are_stitched_back_exactly():
+    backend = ToneSpeechBackend()
+    sentences = [f"Sentence {i} is about sleep and work and how the week went." for i in range(12)]
+    text = " ".join(sentences)
+    samples = backend.render(text)
+    transcriber = SegmentedTranscriber(backend, segment_seconds=6, max_segment_seconds=8, overlap_seconds=1.0)
+    transcription = transcriber.transcribe(samples, STUB_SAMPLE_RATE)
+    assert len(transcription.segments) > 3
+    assert transcription.text == text
+
+
+def test_cuts_without_a_pause_are_covered_by_the_overlap():
+    backend = ToneSpeechBackend()
+    # No sentence breaks, so segments are cut mid-speech.
+    text = " ".join(f"w{i}" for i in range(80))
+    transcriber = SegmentedTranscriber(backend, segment_seconds=5, max_segment_seconds=6, overlap_seconds=1.0)
+    assert transcriber.transcribe(backend.render(text), STUB_SAMPLE_RATE).text == text
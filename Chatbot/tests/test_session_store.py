@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from emotion_trends import EmotionSeries
+from risk_timeline import RiskTimeline
+from session_store import (MemorySessionStore, SQLiteSessionStore, create_session_store, decode_state,
+                           encode_state)
+
+
+def make_state(text="hello"):
+    timeline = RiskTimeline(5)
+    timeline.add(0.4, timestamp=100.0)
+    series = EmotionSeries()
+    series.append({"Sadness": 0.7}, timestamp=100.0)
+    return {"messages": [{"role": "user", "content": text}], "risk_timeline": timeline, "emotion_series": series}
+
+
+def test_state_encoding_round_trip():
+    state = make_state()
+    decoded = decode_state(encode_state(state))
+    assert isinstance(decoded["risk_timeline"], RiskTimeline)
+    assert isinstance(decoded["emotion_series"], EmotionSeries)
+    assert encode_state(decoded) == encode_state(state)
+
+
+def test_memory_store_evicts_the_least_recently_used():
+    store = MemorySessionStore(max_sessions=2, ttl_seconds=0)
+    store.put("a", make_state("a"))
+    store.put("b", make_state("b"))
+    store.get("a")
+    store.put("c", make_state("c"))
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.metrics()["evictions"] == 1
+
+
+def test_memory_store_expires_idle_sessions():
+    store = MemorySessionStore(ttl_seconds=60)
+    store.put("a", make_state())
+    state, _, size = store._sessions["a"]
+    store._sessions["a"] = (state, time.time() - 120, size)
+    assert store.get("a") is None
+    assert store.metrics()["expirations"] == 1
+
+
+def test_memory_store_byte_count_follows_puts_and_removals():
+    store = MemorySessionStore(max_sessions=2, ttl_seconds=0)
+    store.put("a", make_state("short"))
+    store.put("a", make_state("a much longer message than before"))
+    store.put("b", make_state("b"))
+    expected = len(encode_state(make_state("a much longer message than before"))) + len(encode_state(make_state("b")))
+    assert store.metrics()["approx_bytes"] == expected
+    store.put("c", make_state("c"))
+    store.delete("b")
+    assert store.metrics()["approx_bytes"] == len(encode_state(make_state("c")))
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), flush_interval_ms=3600 * 1000)
+    yield store
+    store.close()
+
+
+def test_sqlite_store_reads_its_own_buffered_writes(sqlite_store):
+    sqlite_store.put("a", make_state())
+    assert sqlite_store.metrics()["pending_writes"] == 1
+    assert sqlite_store.get("a")["messages"][0]["content"] == "hello"
+    sqlite_store.delete("a")
+    assert sqlite_store.get("a") is None
+
+
+def test_sqlite_store_is_shared_across_instances(sqlite_store, tmp_path):
+    state = make_state()
+    sqlite_store.put("a", state)
+    sqlite_store.flush()
+    other = SQLiteSessionStore(str(tmp_path / "sessions.db"), flush_interval_ms=3600 * 1000)
+    try:
+        assert encode_state(other.get("a")) == encode_state(state)
+        assert other.metrics()["sessions"] == 1
+    finally:
+        other.close()
+
+
+def test_sqlite_store_expires_old_rows(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=60, flush_interval_ms=3600 * 1000)
+    try:
+        store.put("a", make_state())
+        store._pending["a"] = (store._pending["a"][0], time.time() - 120)
+        store.flush()
+        assert store.get("a") is None
+        # Purges run at most once a minute.
+        store._last_purge = time.monotonic() - 61
+        store._purge_expired()
+        assert store.metrics()["sessions"] == 0
+    finally:
+        store.close()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown SESSION_STORE"):
+        create_session_store("redis")
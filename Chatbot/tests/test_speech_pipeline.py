@@ -0,0 +1,114 @@
+import re
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from speech_pipeline import SentenceSplitter, stream_speech
+
+
+def split(pieces):
+    splitter = SentenceSplitter()
+    sentences = []
+    for piece in pieces:
+        sentences += splitter.feed(piece)
+    return sentences, splitter.flush()
+
+
+def tokens(text):
+    return re.findall(r"\S+\s*", text)
+
+
+def test_sentences_come_out_as_soon_as_they_end():
+    splitter = SentenceSplitter()
+    assert splitter.feed("I hear you. It sounds") == []
+    assert splitter.feed(" really hard. ") == ["I hear you. It sounds really hard."]
+    assert splitter.feed("How long has this been going on? ") == ["How long has this been going on?"]
+    assert splitter.flush() == []
+
+
+def test_token_streams_split_like_whole_text():
+    text = "That must be exhausting. Have you been able to rest at all? I'm here to listen! Tell me more."
+    assert split(tokens(text)) == split([text])
+    assert split(tokens(text)) == (
+        ["That must be exhausting.", "Have you been able to rest at all?", "I'm here to listen!"],
+        ["Tell me more."],
+    )
+
+
+def test_short_sentences_are_joined_with_the_next():
+    assert split(["Okay. I understand what you mean. "]) == (["Okay. I understand what you mean."], [])
+
+
+def test_abbreviations_do_not_end_a_sentence():
+    assert split(["You could talk to Dr. Tan about it, e.g. at your next visit. "]) == (
+        ["You could talk to Dr. Tan about it, e.g. at your next visit."], [])
+
+
+def test_closing_quotes_stay_with_their_sentence():
+    assert split(['She said "I am fine." Then she left the room. ']) == (
+        ['She said "I am fine."', "Then she left the room."], [])
+
+
+def test_no_is_a_word_unless_a_number_follows():
+    assert split(["I told them that the answer was no. ", "Then I left the room. "]) == (
+        ["I told them that the answer was no.", "Then I left the room."], [])
+    assert split(["Please call the clinic on line No. ", "3 if you need help. "]) == (
+        ["Please call the clinic on line No. 3 if you need help."], [])
+    assert split(["You can always say no! ", "Nobody will mind that at all. "]) == (
+        ["You can always say no!", "Nobody will mind that at all."], [])
+
+
+class FakeTTS:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, text):
+        self.submitted.append(text)
+        future = Future()
+        future.set_result(text.upper().encode("utf-8"))
+        return text, future
+
+
+def test_stream_speech_yields_audio_in_order():
+    tts = FakeTTS()
+    seen = []
+    text = "I hear you. It sounds really hard. How long has this been going on?"
+    spoken = list(stream_speech(iter(tokens(text)), tts, on_text=seen.append))
+    assert [index for index, _, _ in spoken] == [0, 1]
+    assert [sentence for _, sentence, _ in spoken] == tts.submitted
+    assert spoken[1][2] == b"HOW LONG HAS THIS BEEN GOING ON?"
+    assert "".join(seen) == text
+
+
+def test_stream_speech_reraises_text_stream_errors():
+    def pieces():
+        yield "That must be exhausting. "
+        raise ConnectionError("stream dropped")
+
+    stream = stream_speech(pieces(), FakeTTS())
+    assert next(stream)[1] == "That must be exhausting."
+    with pytest.raises(ConnectionError, match="stream dropped"):
+        next(stream)
+
+
+def test_cancel_stops_reading_and_closes_the_stream():
+    cancel = threading.Event()
+    closed = threading.Event()
+
+    def pieces():
+        try:
+            yield "That must be exhausting. "
+            cancel.wait(5)
+            yield "You are not alone in this. "
+            yield "More text that should never be read. "
+        finally:
+            closed.set()
+
+    tts = FakeTTS()
+    stream = stream_speech(pieces(), tts, cancel=cancel)
+    assert next(stream)[1] == "That must be exhausting."
+    cancel.set()
+    assert list(stream) == []
+    assert closed.wait(5)
+    assert "More text that should never be read." not in tts.submitted
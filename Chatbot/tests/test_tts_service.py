@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+
+import pytest
+
+import tts_service
+from tts_service import AudioCache, AudioFiles, TTSService
+
+
+def test_audio_cache_is_an_lru_bounded_by_bytes():
+    cache = AudioCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.stats() == {"entries": 2, "bytes": 8, "max_bytes": 10, "hits": 2, "misses": 1, "evictions": 1}
+
+
+def test_audio_cache_skips_audio_larger_than_the_cache():
+    cache = AudioCache(max_bytes=4)
+    cache.put("a", b"too long")
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_audio_files_delete_the_least_recently_used(tmp_path):
+    files = AudioFiles(str(tmp_path), max_bytes=10)
+    files.put("a.pcm", b"aaaa")
+    files.put("b.pcm", b"bbbb")
+    assert files.get("a.pcm") == str(tmp_path / "a.pcm")
+    files.put("c.pcm", b"cccc")
+    assert sorted(os.listdir(tmp_path)) == ["a.pcm", "c.pcm"]
+    assert files.get("b.pcm") is None
+    assert files.stats() == {"files": 2, "bytes": 8, "max_bytes": 10, "evictions": 1}
+
+
+def test_audio_files_pick_up_an_earlier_run(tmp_path):
+    for i, name in enumerate(["old.pcm", "new.pcm"]):
+        (tmp_path / name).write_bytes(b"xxxx")
+        os.utime(tmp_path / name, (1000 + i, 1000 + i))
+    files = AudioFiles(str(tmp_path), max_bytes=6)
+    assert files.get("new.pcm") is not None
+    assert files.get("old.pcm") is None
+    assert os.listdir(tmp_path) == ["new.pcm"]
+
+
+def test_audio_files_forget_deleted_files(tmp_path):
+    files = AudioFiles(str(tmp_path), max_bytes=100)
+    path = files.put("a.pcm", b"aaaa")
+    os.remove(path)
+    assert files.get("a.pcm") is None
+    assert files.stats()["bytes"] == 0
+
+
+@pytest.fixture
+def counting_engine(monkeypatch):
+    calls = []
+
+    def synthesize(text, voice, output_format):
+        calls.append(text)
+        time.sleep(0.05)
+        return text.encode("utf-8")
+
+    monkeypatch.setitem(tts_service.ENGINES, "stub", synthesize)
+    return calls
+
+
+def test_concurrent_requests_share_one_synthesis(counting_engine, tmp_path):
+    service = TTSService(engine="stub", output_dir=str(tmp_path))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.synthesize("hello", timeout=5)))
+               for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [b"hello"] * 6
+    assert counting_engine == ["hello"]
+    assert service.synthesize("hello") == b"hello"
+    assert counting_engine == ["hello"]
+    assert service.stats()["syntheses"] == 1
+
+
+def test_keys_depend_on_the_voice_format_and_speed(tmp_path):
+    base = TTSService(engine="stub", output_dir=str(tmp_path))
+    assert base.key("hi") == TTSService(engine="stub", output_dir=str(tmp_path)).key("hi")
+    assert base.key("hi") != base.key("hello")
+    assert base.key("hi") != TTSService(engine="stub", voice="other", output_dir=str(tmp_path)).key("hi")
+    assert base.key("hi") != TTSService(engine="stub", output_format="pcm_24000", output_dir=str(tmp_path)).key("hi")
+    assert base.key("hi") != TTSService(engine="stub", speed=1.25, output_dir=str(tmp_path)).key("hi")
+
+
+def test_lookup_returns_audio_by_key(counting_engine, tmp_path):
+    service = TTSService(engine="stub", output_dir=str(tmp_path))
+    key, _ = service.submit("hello")
+    assert service.lookup(key, timeout=5) == b"hello"
+    assert service.lookup("unknown") is None
+
+
+def test_render_to_file_writes_each_text_once(counting_engine, tmp_path):
+    service = TTSService(engine="stub", output_format="pcm_16000", output_dir=str(tmp_path))
+    path = service.render_to_file("hello", timeout=5)
+    assert path == str(tmp_path / f"{service.key('hello')}.pcm")
+    with open(path, "rb") as f:
+        assert f.read() == b"hello"
+    mtime = os.stat(path).st_mtime_ns
+    assert service.render_to_file("hello", timeout=5) == path
+    assert os.stat(path).st_mtime_ns == mtime
+
+
+def test_failures_are_counted_and_not_cached(monkeypatch, tmp_path):
+    def synthesize(text, voice, output_format):
+        raise RuntimeError("engine down")
+
+    monkeypatch.setitem(tts_service.ENGINES, "stub", synthesize)
+    service = TTSService(engine="stub", output_dir=str(tmp_path))
+    with pytest.raises(RuntimeError, match="engine down"):
+        service.synthesize("hello", timeout=5)
+    stats = service.stats()
+    assert (stats["failures"], stats["inflight"], stats["cache"]["entries"]) == (1, 0, 0)
+
+
+def test_stub_engine_renders_pcm():
+    audio = tts_service.synthesize_stub("hello there", output_format="pcm_16000")
+    # Two words of 220 ms tone and 80 ms gap, as 16-bit samples at 16 kHz.
+    assert len(audio) == round(2 * 0.3 * 16000) * 2
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError, match="Unknown TTS_ENGINE"):
+        TTSService(engine="festival")
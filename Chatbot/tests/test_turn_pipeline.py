@@ -0,0 +1,96 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from turn_pipeline import TurnPipeline, time_stage
+
+
+def instant(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def test_time_stage_records_milliseconds():
+    timings = {}
+    with time_stage(timings, "stage"):
+        time.sleep(0.02)
+    assert 15 <= timings["stage"] < 500
+
+
+def test_mood_and_risk_run_in_parallel():
+    def mood_submit(text):
+        future = Future()
+        threading.Timer(0.2, future.set_result, [{"mood": text}]).start()
+        return future
+
+    def risk_fn(text):
+        time.sleep(0.2)
+        return {"score": 0.1}
+
+    pipeline = TurnPipeline(mood_submit, risk_fn, mood_budget_ms=1000, risk_budget_ms=1000)
+    analysis = pipeline.analyze("s", "hello")
+    assert analysis.risk == {"score": 0.1}
+    assert analysis.mood == {"mood": "hello"}
+    assert analysis.carried_moods == []
+    assert set(analysis.timings) == {"risk", "mood", "analysis"}
+    # Both stages take 200 ms; run one after the other they would take 400.
+    assert analysis.timings["analysis"] < 350
+
+
+def test_a_late_mood_is_carried_to_the_next_turn():
+    pending = Future()
+    submitted = iter([pending, instant({"mood": "second"})])
+    pipeline = TurnPipeline(lambda text: next(submitted), lambda text: {"score": 0.0}, mood_budget_ms=50)
+    first = pipeline.analyze("s", "first")
+    assert first.mood is None
+    assert first.timings["mood"] is None
+    assert first.timings["analysis"] < 500
+    assert pipeline.stats() == {"late_moods": 1, "pending_late_moods": 1, "risk_overruns": 0}
+
+    pending.set_result({"mood": "first"})
+    second = pipeline.analyze("s", "second")
+    assert second.carried_moods == [{"mood": "first"}]
+    assert second.mood == {"mood": "second"}
+    assert pipeline.stats()["pending_late_moods"] == 0
+
+
+def test_late_moods_stay_with_their_session():
+    pending = Future()
+    submitted = iter([pending, instant({"mood": "other"})])
+    pipeline = TurnPipeline(lambda text: next(submitted), lambda text: {"score": 0.0}, mood_budget_ms=50)
+    pipeline.analyze("a", "first")
+    pending.set_result({"mood": "first"})
+    assert pipeline.analyze("b", "hello").carried_moods == []
+    assert pipeline.stats()["pending_late_moods"] == 1
+
+
+def test_a_failed_late_mood_is_dropped():
+    pending = Future()
+    submitted = iter([pending, instant({"mood": "second"})])
+    pipeline = TurnPipeline(lambda text: next(submitted), lambda text: {"score": 0.0}, mood_budget_ms=50)
+    pipeline.analyze("s", "first")
+    pending.set_exception(RuntimeError("mood API down"))
+    assert pipeline.analyze("s", "second").carried_moods == []
+
+
+def test_a_failed_mood_does_not_fail_the_turn():
+    failed = Future()
+    failed.set_exception(RuntimeError("mood API down"))
+    pipeline = TurnPipeline(lambda text: failed, lambda text: {"score": 0.3})
+    analysis = pipeline.analyze("s", "hello")
+    assert analysis.mood is None
+    assert analysis.risk == {"score": 0.3}
+    assert pipeline.stats()["late_moods"] == 0
+
+
+def test_risk_overruns_are_counted_but_still_awaited():
+    def risk_fn(text):
+        time.sleep(0.15)
+        return {"score": 0.9}
+
+    pipeline = TurnPipeline(lambda text: instant({}), risk_fn, risk_budget_ms=50)
+    analysis = pipeline.analyze("s", "hello")
+    assert analysis.risk == {"score": 0.9}
+    assert analysis.timings["risk"] >= 100
+    assert pipeline.stats()["risk_overruns"] == 1
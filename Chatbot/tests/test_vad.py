@@ -0,0 +1,149 @@
+import os
+
+import numpy as np
+
+from audio_processing import read_wav, write_wav
+from stt_stub import STUB_SAMPLE_RATE, ToneSpeechBackend
+from vad import (VAD_FRAME_MS, VAD_MIN_FLOOR_DB, VAD_MIN_SPEECH_MS, EndpointDetector, _features, _is_speech,
+                 apply_vad, speech_frames)
+
+RATE = STUB_SAMPLE_RATE
+TEXT = "I have not been sleeping well. Work has been really hard lately."
+
+
+def noise(seconds, seed=0):
+    return np.random.default_rng(seed).normal(0, 0.001, int(seconds * RATE)).astype(np.float32)
+
+
+def speech(text=TEXT):
+    return ToneSpeechBackend().render(text, RATE)
+
+
+def test_silence_has_no_speech():
+    kept, report = apply_vad(noise(2), RATE)
+    assert len(kept) == 0
+    assert report.kept == 0.0
+    assert not speech_frames(noise(2), RATE).any()
+
+
+def test_leading_and_trailing_silence_is_trimmed():
+    voice = speech()
+    samples = np.concatenate((noise(2), voice + noise(len(voice) / RATE, seed=1), noise(2, seed=2)))
+    kept, report = apply_vad(samples, RATE)
+    assert report.leading > 1.5
+    assert report.trailing > 1.5
+    assert abs(report.kept - len(voice) / RATE) < 0.5
+    assert report.original == len(samples) / RATE
+
+
+def test_long_pauses_are_shortened_and_the_transcript_is_unchanged():
+    backend = ToneSpeechBackend()
+    first, second = backend.render("I have not been sleeping well.", RATE), backend.render("Work is hard.", RATE)
+    samples = np.concatenate((first, noise(3), second))
+    kept, report = apply_vad(samples, RATE, max_pause_ms=400)
+    assert report.pauses_shortened == 1
+    assert report.pause_removed > 2.5
+    assert backend.transcribe(write_wav(kept, RATE)) == "I have not been sleeping well. Work is hard."
+
+
+def test_int16_input_stays_int16():
+    pcm = (np.concatenate((noise(1), speech())) * 32767).astype(np.int16)
+    kept, _ = apply_vad(pcm, RATE)
+    assert kept.dtype == np.int16
+
+
+
+def load_final_wav():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "final.wav")
+    with open(path, "rb") as f:
+        return read_wav(f.read())
+
+
+def raw_speech(samples, rate, floor=None):
+    """Per-frame energy/ZCR decision without hangover or click removal, and the floor it used."""
+    hop = int(rate * VAD_FRAME_MS / 1000)
+    n = len(samples) // hop
+    energy, zcr = _features(samples[:n * hop].reshape(n, hop))
+    if floor is None:
+        floor = max(min(np.percentile(energy, 10), energy.max() - 20), VAD_MIN_FLOOR_DB)
+    return _is_speech(energy, zcr, floor), floor
+
+
+def kept_spans(samples, kept, window=32):
+    """(start, end) sample ranges of samples that kept was cut from, in order."""
+    spans, position, done = [], 0, 0
+    while done < len(kept):
+        piece = kept[done:done + window]
+        for start in np.flatnonzero(samples[position:] == piece[0]) + position:
+            if np.array_equal(samples[start:start + len(piece)], piece):
+                break
+        else:
+            raise AssertionError(f"kept audio at sample {done} is not in the original")
+        length = min(len(kept) - done, len(samples) - start)
+        differs = np.flatnonzero(samples[start:start + length] != kept[done:done + length])
+        run = int(differs[0]) if len(differs) else length
+        spans.append((int(start), int(start) + run))
+        position, done = int(start) + run, done + run
+    return spans
+
+
+def test_final_wav_only_loses_silence():
+    samples, rate = load_final_wav()
+    kept, report = apply_vad(samples, rate)
+    assert report.pauses_shortened > 0
+
+    speech, floor = raw_speech(samples, rate)
+    hop = int(rate * VAD_FRAME_MS / 1000)
+    bounds = [0] + [edge for span in kept_spans(samples, kept) for edge in span] + [len(samples)]
+    removed = [(a, b) for a, b in zip(bounds[::2], bounds[1::2]) if b > a]
+    assert sum(b - a for a, b in removed) == len(samples) - len(kept)
+    for a, b in removed:
+        # Frames wholly inside a removed span may only hold bursts too short to be speech (clicks).
+        inside = speech[-(-a // hop):b // hop]
+        assert np.count_nonzero(inside) * VAD_FRAME_MS < VAD_MIN_SPEECH_MS, f"speech removed at {a / rate:.2f}s"
+
+    # Judged against the original's noise floor, the trimmed audio holds as much speech.
+    kept_speech, _ = raw_speech(kept, rate, floor)
+    assert abs(int(np.count_nonzero(kept_speech)) - int(np.count_nonzero(speech))) <= 0.02 * np.count_nonzero(speech)
+
+
+def feed_frames(detector, samples):
+    """Feeds 20 ms frames; returns the time in ms at which feed() first returned True, or None."""
+    hop = int(RATE * VAD_FRAME_MS / 1000)
+    for start in range(0, len(samples), hop):
+        if detector.feed(samples[start:start + hop]):
+            return (start + hop) * 1000 // RATE
+    return None
+
+
+def test_endpoint_after_end_silence():
+    voice = speech()
+    samples = np.concatenate((noise(0.5), voice, noise(2, seed=1)))
+    detector = EndpointDetector(RATE, end_silence_ms=600)
+    ended_at = feed_frames(detector, samples)
+    assert detector.speech_started
+    speech_end_ms = (0.5 * RATE + len(np.trim_zeros(voice, "b"))) * 1000 / RATE
+    assert 600 <= ended_at - speech_end_ms <= 700
+
+
+def test_pauses_between_sentences_do_not_end_the_utterance():
+    detector = EndpointDetector(RATE, end_silence_ms=600)
+    # The stub leaves 500 ms between sentences.
+    assert feed_frames(detector, np.concatenate((noise(0.5), speech()))) is None
+
+
+def test_silence_alone_ends_only_at_the_maximum_length():
+    detector = EndpointDetector(RATE, end_silence_ms=600, max_utterance_ms=1000)
+    assert feed_frames(detector, noise(2)) == 1000
+    assert not detector.speech_started
+
+
+def test_reset_keeps_the_noise_floor_on_request():
+    detector = EndpointDetector(RATE)
+    feed_frames(detector, noise(0.5))
+    floor = detector.floor
+    detector.reset(keep_floor=True)
+    assert detector.floor == floor
+    assert not detector.ended
+    detector.reset()
+    assert detector.floor is None
@@ -0,0 +1,335 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from audio_processing import change_speed, encode_audio, float_to_pcm16
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ELEVENLABS_API_KEY = os.environ.get("ELEVENLABS_API_KEY")
+
+# Which engine synthesises speech: elevenlabs (default), gtts, or stub (offline tones; use a pcm_* TTS_FORMAT).
+TTS_ENGINE = os.environ.get("TTS_ENGINE", "elevenlabs")
+# Defaults to the engine's own default voice (see DEFAULT_VOICES).
+TTS_VOICE = os.environ.get("TTS_VOICE")
+TTS_FORMAT = os.environ.get("TTS_FORMAT", "mp3_22050_32")
+TTS_MODEL = os.environ.get("TTS_MODEL", "eleven_turbo_v2")
+# Pitch-preserving tempo change applied to synthesised audio (1.25 = 25% faster).
+TTS_SPEED = float(os.environ.get("TTS_SPEED", "1.0"))
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", "4"))
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Where render_to_file() writes audio for clients that need a path (Gradio).
+TTS_OUTPUT_DIR = os.environ.get("TTS_OUTPUT_DIR", "tts_audio")
+# Once the files there add up to more than this, the least recently rendered are deleted.
+TTS_OUTPUT_MAX_BYTES = int(os.environ.get("TTS_OUTPUT_MAX_BYTES", str(256 * 1024 * 1024)))
+TTS_PRERENDER = os.environ.get("TTS_PRERENDER", "1") != "0"
+
+# Spoken as-is often enough that they are rendered once at startup.
+CRISIS_MESSAGE = (
+    "It sounds like you are going through something very painful. You don't have to face this alone. "
+    "Please call the Samaritans of Singapore on 1767, any time of day, or 995 if you are in immediate danger."
+)
+GREETINGS = [
+    "Hello, I'm here to listen. How are you feeling today?",
+    "Thank you for sharing that with me.",
+    "Take your time. I'm here whenever you're ready.",
+]
+PRERENDERED_PHRASES = [CRISIS_MESSAGE] + GREETINGS
+
+_elevenlabs_client = None
+
+
+def synthesize_elevenlabs(text, voice="Charlotte", output_format=TTS_FORMAT):
+    """Returns the encoded audio for text from ElevenLabs."""
+    global _elevenlabs_client
+    if _elevenlabs_client is None:
+        from elevenlabs.client import ElevenLabs
+        _elevenlabs_client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
+    audio = _elevenlabs_client.generate(text=text, voice=voice, output_format=output_format, model=TTS_MODEL)
+    # generate() returns the audio as an iterator of byte chunks.
+    return audio if isinstance(audio, bytes) else b"".join(audio)
+
+
+def synthesize_gtts(text, voice="en", output_format="mp3"):
+    """Returns MP3 audio for text from Google Translate's TTS (voice is the language code)."""
+    from gtts import gTTS
+    buffer = io.BytesIO()
+    gTTS(text=text, lang=voice, slow=False).write_to_fp(buffer)
+    return buffer.getvalue()
+
+
+def synthesize_stub(text, voice="tone", output_format="pcm_16000"):
+    """
+    Offline stand-in: every word is a short tone (see stt_stub), so audio
+    arrives with realistic durations without a network or a model. Raw PCM
+    is produced in-process; other codecs go through pydub/ffmpeg.
+    """
+    from stt_stub import ToneSpeechBackend
+    codec, *rest = output_format.split("_")
+    sample_rate = int(rest[0]) if rest else 16000
+    samples = ToneSpeechBackend().render(text, sample_rate)
+    if codec == "pcm":
+        return float_to_pcm16(samples)
+    return encode_audio(samples, sample_rate, codec)
+
+
+ENGINES = {"elevenlabs": synthesize_elevenlabs, "gtts": synthesize_gtts, "stub": synthesize_stub}
+DEFAULT_VOICES = {"elevenlabs": "Charlotte", "gtts": "en", "stub": "tone"}
+
+
+class AudioCache:
+    """LRU of synthesised audio bounded by the total number of bytes held."""
+
+    def __init__(self, max_bytes=TTS_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def put(self, key, audio):
+        if len(audio) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous)
+            self._entries[key] = audio
+            self.bytes += len(audio)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class AudioFiles:
+    """
+    Audio files in a directory, kept as an LRU bounded by their total size:
+    writing a file deletes the least recently rendered ones beyond max_bytes.
+    Files left by an earlier run are picked up, oldest first, on first use.
+    """
+
+    def __init__(self, directory=TTS_OUTPUT_DIR, max_bytes=TTS_OUTPUT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = None
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.evictions = 0
+
+    def _load(self):
+        self._entries = OrderedDict()
+        if not os.path.isdir(self.directory):
+            return
+        files = [entry for entry in os.scandir(self.directory) if entry.is_file() and not entry.name.endswith(".tmp")]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            self._entries[entry.name] = entry.stat().st_size
+            self.bytes += entry.stat().st_size
+        self._evict()
+
+    def _evict(self):
+        # The newest file is kept even if it alone is over the limit: it is about to be served.
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def get(self, name):
+        """The path of a file already written, marked as recently used; None if there is none."""
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            if name not in self._entries:
+                return None
+            if not os.path.exists(path):
+                self.bytes -= self._entries.pop(name)
+                return None
+            self._entries.move_to_end(name)
+        return path
+
+    def put(self, name, audio):
+        """Writes audio to a file called name and returns its path."""
+        path = os.path.join(self.directory, name)
+        os.makedirs(self.directory, exist_ok=True)
+        # Written under a temporary name so a reader never sees a partial file.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            previous = self._entries.pop(name, None)
+            if previous is not None:
+                self.bytes -= previous
+            self._entries[name] = len(audio)
+            self.bytes += len(audio)
+            self._evict()
+        return path
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._entries or ()),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+class TTSService:
+    """
+    Text-to-speech off the request thread, with a shared audio cache.
+
+    submit() returns a Future for the encoded audio right away; synthesis runs
+    on a small thread pool and concurrent requests for the same text share one
+    synthesis. Audio is cached by sha256 of (text, voice, format, speed), so the key
+    doubles as a stable, unique name for serving or writing the audio. Nothing
+    is ever played on the server.
+    """
+
+    def __init__(self, engine=TTS_ENGINE, voice=TTS_VOICE, output_format=TTS_FORMAT, speed=TTS_SPEED,
+                 cache_max_bytes=TTS_CACHE_MAX_BYTES, max_workers=TTS_WORKERS, output_dir=TTS_OUTPUT_DIR,
+                 output_max_bytes=TTS_OUTPUT_MAX_BYTES):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown TTS_ENGINE: {engine} (expected one of {', '.join(ENGINES)})")
+        self.engine = engine
+        self.voice = voice or DEFAULT_VOICES[engine]
+        self.output_format = output_format
+        self.speed = speed
+        self.output_dir = output_dir
+        self.cache = AudioCache(cache_max_bytes)
+        self.files = AudioFiles(output_dir, output_max_bytes)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.syntheses = 0
+        self.failures = 0
+
+    @property
+    def extension(self):
+        return self.output_format.split("_", 1)[0]
+
+    @property
+    def mimetype(self):
+        return {"mp3": "audio/mpeg", "pcm": "audio/L16", "ulaw": "audio/basic"}.get(self.extension, "application/octet-stream")
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.engine}\0{self.voice}\0{self.output_format}\0{self.speed:g}\0{text}".encode("utf-8")).hexdigest()
+
+    def submit(self, text):
+        """Returns (key, Future of the audio bytes) for text."""
+        key = self.key(text)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                audio = self.cache.get(key)
+                if audio is not None:
+                    future = Future()
+                    future.set_result(audio)
+                else:
+                    future = self._executor.submit(self._synthesize, key, text)
+                    self._inflight[key] = future
+        return key, future
+
+    def _synthesize(self, key, text):
+        try:
+            audio = ENGINES[self.engine](text, self.voice, self.output_format)
+            if self.speed != 1.0:
+                audio = change_speed(audio, self.speed, self.output_format)
+            self.cache.put(key, audio)
+            with self._lock:
+                self.syntheses += 1
+            return audio
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            logger.exception("Speech synthesis failed")
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def synthesize(self, text, timeout=None):
+        """Blocking convenience wrapper: the audio bytes for text."""
+        return self.submit(text)[1].result(timeout=timeout)
+
+    def lookup(self, key, timeout=None):
+        """Audio for a key handed out by submit(), waiting for it if still being synthesised; None if unknown."""
+        # In-flight first: a finished synthesis is cached before it leaves _inflight.
+        with self._lock:
+            future = self._inflight.get(key)
+        if future is not None:
+            return future.result(timeout=timeout)
+        return self.cache.get(key)
+
+    def render_to_file(self, text, timeout=None):
+        """Writes the audio for text to a file named after its key (see AudioFiles) and returns the path."""
+        key, future = self.submit(text)
+        name = f"{key}.{self.extension}"
+        path = self.files.get(name)
+        if path is None:
+            path = self.files.put(name, future.result(timeout=timeout))
+        return path
+
+    def prerender(self, phrases=PRERENDERED_PHRASES):
+        """Starts synthesising fixed phrases in the background so they are served from cache."""
+        return [self.submit(phrase)[1] for phrase in phrases]
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "engine": self.engine,
+                "syntheses": self.syntheses,
+                "failures": self.failures,
+                "inflight": len(self._inflight),
+            }
+        stats["cache"] = self.cache.stats()
+        stats["files"] = self.files.stats()
+        return stats
+
+
+tts_service = TTSService()
+
+
+def start_prerender():
+    """Renders PRERENDERED_PHRASES in the background if TTS_PRERENDER is on; called by each entry point."""
+    if TTS_PRERENDER:
+        tts_service.prerender()
@@ -0,0 +1,137 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# How long a turn waits for each stage, counted from the start of the turn.
+# Risk scoring is on the critical path (alerts depend on it), so overrunning
+# its budget is only logged; a mood report that misses its budget is attached
+# to the user's next turn instead.
+TURN_MOOD_BUDGET_MS = float(os.environ.get("TURN_MOOD_BUDGET_MS", "1000"))
+TURN_RISK_BUDGET_MS = float(os.environ.get("TURN_RISK_BUDGET_MS", "2000"))
+# Late mood reports older than this are dropped instead of carried over.
+TURN_MOOD_CARRY_SECONDS = float(os.environ.get("TURN_MOOD_CARRY_SECONDS", "600"))
+TURN_PIPELINE_WORKERS = int(os.environ.get("TURN_PIPELINE_WORKERS", "8"))
+
+
+@contextmanager
+def time_stage(timings, name):
+    """Records how long the block took, in milliseconds, as timings[name]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+class TurnAnalysis:
+    """What the pre-LLM stages produced for one turn."""
+
+    def __init__(self, risk, mood, carried_moods, timings):
+        self.risk = risk
+        # None when the mood report missed its budget; it arrives with the next turn.
+        self.mood = mood
+        # Reports for earlier messages that finished after their own turn.
+        self.carried_moods = carried_moods
+        self.timings = timings
+
+
+class TurnPipeline:
+    """
+    Runs the stages of a chat turn concurrently, each against a deadline.
+
+    Mood analysis and risk scoring are independent, so they start together
+    and the turn waits only as long as its critical stage. mood_submit(text)
+    returns a Future (mood_backends.submit_mood), so a slow mood API holds no
+    thread; risk_fn(text) is blocking and runs on the pipeline's own thread
+    pool. Mood futures that miss their deadline keep running; they are kept
+    per session (in this process) and handed over by the session's next
+    analyze() call once they have finished.
+    """
+
+    def __init__(self, mood_submit, risk_fn, mood_budget_ms=TURN_MOOD_BUDGET_MS,
+                 risk_budget_ms=TURN_RISK_BUDGET_MS, max_workers=TURN_PIPELINE_WORKERS):
+        self.mood_submit = mood_submit
+        self.risk_fn = risk_fn
+        self.mood_budget = mood_budget_ms / 1000.0
+        self.risk_budget = risk_budget_ms / 1000.0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="turn-risk")
+        self._late_moods = {}
+        self._lock = threading.Lock()
+        self.late_mood_count = 0
+        self.risk_overruns = 0
+
+    def _timed(self, fn, text):
+        start = time.perf_counter()
+        result = fn(text)
+        return result, round((time.perf_counter() - start) * 1000, 1)
+
+    def _take_late_moods(self, session_id):
+        """Pops the session's late mood reports that are ready; unfinished ones stay pending."""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            pending = self._late_moods.pop(session_id, [])
+            still_pending = []
+            for future, submitted_at in pending:
+                if future.done():
+                    if future.exception() is None:
+                        ready.append(future.result())
+                elif now - submitted_at < TURN_MOOD_CARRY_SECONDS:
+                    still_pending.append((future, submitted_at))
+            if still_pending:
+                self._late_moods[session_id] = still_pending
+            # Forget sessions that never came back.
+            for sid in [sid for sid, entries in self._late_moods.items()
+                        if all(now - submitted_at >= TURN_MOOD_CARRY_SECONDS for _, submitted_at in entries)]:
+                del self._late_moods[sid]
+        return ready
+
+    def analyze(self, session_id, text):
+        """Runs mood analysis and risk scoring for text in parallel and returns a TurnAnalysis."""
+        start = time.perf_counter()
+        timings = {}
+        mood_future = self.mood_submit(text)
+        mood_done = {}
+        mood_future.add_done_callback(lambda _: mood_done.setdefault("ms", round((time.perf_counter() - start) * 1000, 1)))
+        risk_future = self._executor.submit(self._timed, self.risk_fn, text)
+        carried_moods = self._take_late_moods(session_id)
+
+        try:
+            risk, timings["risk"] = risk_future.result(timeout=self.risk_budget)
+        except TimeoutError:
+            self.risk_overruns += 1
+            logger.warning(f"Risk scoring exceeded its {self.risk_budget * 1000:.0f} ms budget")
+            risk, timings["risk"] = risk_future.result()
+
+        mood = None
+        try:
+            remaining = max(0.0, self.mood_budget - (time.perf_counter() - start))
+            mood = mood_future.result(timeout=remaining)
+            # The done callback may not have run yet when result() returns.
+            timings["mood"] = mood_done.get("ms", round((time.perf_counter() - start) * 1000, 1))
+        except TimeoutError:
+            with self._lock:
+                self._late_moods.setdefault(session_id, []).append((mood_future, time.monotonic()))
+            self.late_mood_count += 1
+            timings["mood"] = None
+            logger.info(f"Mood report for {session_id} missed its budget, carrying it to the next turn")
+        except Exception as e:
+            logger.error(f"Mood analysis failed: {e}")
+            timings["mood"] = None
+
+        timings["analysis"] = round((time.perf_counter() - start) * 1000, 1)
+        return TurnAnalysis(risk, mood, carried_moods, timings)
+
+    def stats(self):
+        with self._lock:
+            pending = sum(len(entries) for entries in self._late_moods.values())
+        return {
+            "late_moods": self.late_mood_count,
+            "pending_late_moods": pending,
+            "risk_overruns": self.risk_overruns,
+        }
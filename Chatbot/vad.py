@@ -0,0 +1,275 @@
+"""
+Voice-activity detection for voice turns, from frame energy and zero-crossing rate.
+
+apply_vad() trims the silence before and after speech (and optionally
+shortens long pauses) before a recording is sent to speech-to-text;
+EndpointDetector tells live capture when the speaker has finished.
+
+    python vad.py final.wav
+
+reports how much of a recording would be removed and, with GROQ_API_KEY set,
+checks that the transcript of the trimmed audio matches the original's.
+"""
+import argparse
+import os
+import re
+import sys
+
+import numpy as np
+
+from audio_processing import pcm16_to_wav, read_wav, to_float32, write_wav
+
+VAD_FRAME_MS = 20
+# A frame is speech when its energy is VAD_ENERGY_MARGIN_DB above the noise
+# floor, or VAD_WEAK_MARGIN_DB above it with a zero-crossing rate over
+# VAD_ZCR_THRESHOLD (quiet fricatives such as s, f and th).
+VAD_ENERGY_MARGIN_DB = float(os.environ.get("VAD_ENERGY_MARGIN_DB", "12"))
+VAD_WEAK_MARGIN_DB = float(os.environ.get("VAD_WEAK_MARGIN_DB", "6"))
+VAD_ZCR_THRESHOLD = float(os.environ.get("VAD_ZCR_THRESHOLD", "0.25"))
+# The noise floor is never taken lower than this, so digital silence doesn't
+# turn breaths and hiss into speech.
+VAD_MIN_FLOOR_DB = float(os.environ.get("VAD_MIN_FLOOR_DB", "-60"))
+# Speech is extended by the hangover on both sides so soft onsets and word
+# tails are kept; bursts shorter than the minimum (clicks) are ignored.
+VAD_HANGOVER_MS = float(os.environ.get("VAD_HANGOVER_MS", "200"))
+VAD_MIN_SPEECH_MS = float(os.environ.get("VAD_MIN_SPEECH_MS", "60"))
+# Audio kept before the first and after the last speech.
+VAD_PAD_MS = float(os.environ.get("VAD_PAD_MS", "150"))
+# Pauses longer than this are shortened to it when compressing; still long
+# enough for the recogniser to hear a sentence break.
+VAD_MAX_PAUSE_MS = float(os.environ.get("VAD_MAX_PAUSE_MS", "400"))
+# Live capture: the utterance ends after this much silence following speech.
+VAD_END_SILENCE_MS = float(os.environ.get("VAD_END_SILENCE_MS", "800"))
+VAD_MAX_UTTERANCE_MS = float(os.environ.get("VAD_MAX_UTTERANCE_MS", "60000"))
+
+
+def _mono(samples):
+    samples = to_float32(samples)
+    return samples if samples.ndim == 1 else samples.mean(axis=1)
+
+
+def _features(frames):
+    """Energy (dB) and zero-crossing rate of each row of frames."""
+    energy = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / max(1, frames.shape[1] - 1)
+    return energy, zcr
+
+
+def _is_speech(energy, zcr, floor):
+    return (energy > floor + VAD_ENERGY_MARGIN_DB) | ((energy > floor + VAD_WEAK_MARGIN_DB) & (zcr > VAD_ZCR_THRESHOLD))
+
+
+def _runs(mask):
+    """(starts, ends) of the runs of True in a boolean array."""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return edges[::2], edges[1::2]
+
+
+def speech_frames(samples, sample_rate, frame_ms=VAD_FRAME_MS):
+    """Boolean per frame_ms frame: whether it is (or borders) speech."""
+    mono = _mono(samples)
+    hop = int(sample_rate * frame_ms / 1000)
+    n = len(mono) // hop
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    energy, zcr = _features(mono[:n * hop].reshape(n, hop))
+    # The quietest tenth is taken as noise, but never within 20 dB of the
+    # loudest frame, in case the recording is speech throughout.
+    floor = max(min(np.percentile(energy, 10), energy.max() - 20), VAD_MIN_FLOOR_DB)
+    speech = _is_speech(energy, zcr, floor)
+
+    starts, ends = _runs(speech)
+    for start, end in zip(starts, ends):
+        if (end - start) * frame_ms < VAD_MIN_SPEECH_MS:
+            speech[start:end] = False
+    hangover = int(VAD_HANGOVER_MS / frame_ms)
+    if hangover:
+        speech = np.convolve(speech, np.ones(2 * hangover + 1), mode="same") > 0
+    return speech
+
+
+class VadReport:
+    """How much of a recording apply_vad() kept, in seconds."""
+
+    def __init__(self, original, kept, leading, trailing, pauses_shortened, pause_removed):
+        self.original = original
+        self.kept = kept
+        self.leading = leading
+        self.trailing = trailing
+        self.pauses_shortened = pauses_shortened
+        self.pause_removed = pause_removed
+
+    @property
+    def removed(self):
+        return self.original - self.kept
+
+    def to_dict(self):
+        return {
+            "original_seconds": round(self.original, 2),
+            "kept_seconds": round(self.kept, 2),
+            "removed_seconds": round(self.removed, 2),
+            "removed_fraction": round(self.removed / self.original, 3) if self.original else 0.0,
+            "leading_seconds": round(self.leading, 2),
+            "trailing_seconds": round(self.trailing, 2),
+            "pauses_shortened": self.pauses_shortened,
+            "pause_seconds_removed": round(self.pause_removed, 2),
+        }
+
+
+def apply_vad(samples, sample_rate, compress_pauses=True, pad_ms=VAD_PAD_MS, max_pause_ms=VAD_MAX_PAUSE_MS):
+    """
+    Returns (kept samples, VadReport): samples without the silence before the
+    first and after the last speech (keeping pad_ms of each), and with pauses
+    longer than max_pause_ms shortened to it if compress_pauses. The samples
+    keep their dtype and shape, so int16 PCM stays int16.
+    """
+    total = len(samples)
+    speech = speech_frames(samples, sample_rate)
+    if not speech.any():
+        return samples[:0], VadReport(total / sample_rate, 0.0, total / sample_rate, 0.0, 0, 0.0)
+    hop = int(sample_rate * VAD_FRAME_MS / 1000)
+    pad = int(sample_rate * pad_ms / 1000)
+    starts, ends = _runs(speech)
+    first, last = max(0, int(starts[0]) * hop - pad), min(total, int(ends[-1]) * hop + pad)
+
+    keep = [[first, last]]
+    pauses_shortened, pause_removed = 0, 0
+    if compress_pauses:
+        half_pause = int(sample_rate * max_pause_ms / 2000)
+        keep = [[first, None]]
+        for gap_start, gap_end in zip((ends[:-1] * hop).tolist(), (starts[1:] * hop).tolist()):
+            if gap_end - gap_start > 2 * half_pause:
+                keep[-1][1] = gap_start + half_pause
+                keep.append([gap_end - half_pause, None])
+                pauses_shortened += 1
+                pause_removed += gap_end - gap_start - 2 * half_pause
+        keep[-1][1] = last
+
+    kept = np.concatenate([samples[a:b] for a, b in keep]) if len(keep) > 1 else samples[first:last]
+    report = VadReport(total / sample_rate, len(kept) / sample_rate, first / sample_rate,
+                       (total - last) / sample_rate, pauses_shortened, pause_removed / sample_rate)
+    return kept, report
+
+
+class EndpointDetector:
+    """
+    Decides when a live speaker has finished.
+
+    feed() takes audio chunks as they are captured and returns True once
+    speech has been heard and then VAD_END_SILENCE_MS of non-speech, or
+    VAD_MAX_UTTERANCE_MS has passed. The noise floor follows the quietest
+    recent frames: it drops at once and rises slowly, so speech never
+    raises it much.
+    """
+
+    _FLOOR_RISE_DB = 0.05
+
+    def __init__(self, sample_rate, end_silence_ms=VAD_END_SILENCE_MS, max_utterance_ms=VAD_MAX_UTTERANCE_MS):
+        self.sample_rate = sample_rate
+        self.end_silence_ms = end_silence_ms
+        self.max_utterance_ms = max_utterance_ms
+        self._hop = int(sample_rate * VAD_FRAME_MS / 1000)
+        self.reset()
+
+    def reset(self, keep_floor=False):
+        """Starts a new utterance; keep_floor carries the noise floor over on a continuous stream."""
+        self._carry = np.zeros(0, dtype=np.float32)
+        # Taken from the first frame, then tracked.
+        if not keep_floor:
+            self.floor = None
+        self.elapsed_ms = 0.0
+        self.speech_ms = 0.0
+        self.silence_ms = 0.0
+        self.speech_started = False
+        self.ended = False
+
+    def feed(self, chunk):
+        if self.ended:
+            return True
+        x = np.concatenate((self._carry, _mono(chunk)))
+        n = len(x) // self._hop
+        self._carry = x[n * self._hop:]
+        if n == 0:
+            return False
+        energy, zcr = _features(x[:n * self._hop].reshape(n, self._hop))
+        for e, z in zip(energy, zcr):
+            if self.floor is None or e < self.floor:
+                self.floor = max(VAD_MIN_FLOOR_DB, e)
+            else:
+                self.floor += self._FLOOR_RISE_DB
+            self.elapsed_ms += VAD_FRAME_MS
+            if _is_speech(e, z, self.floor):
+                self.speech_ms += VAD_FRAME_MS
+                self.silence_ms = 0.0
+                if self.speech_ms >= VAD_MIN_SPEECH_MS:
+                    self.speech_started = True
+            else:
+                self.silence_ms += VAD_FRAME_MS
+                if not self.speech_started:
+                    # Isolated blips before the speaker starts don't add up.
+                    self.speech_ms = 0.0
+            if (self.speech_started and self.silence_ms >= self.end_silence_ms) or self.elapsed_ms >= self.max_utterance_ms:
+                self.ended = True
+                break
+        return self.ended
+
+
+def _words(text):
+    return re.findall(r"[\w']+", text.lower())
+
+
+def _offline_check():
+    """Transcript equivalence on tone speech (stt_stub) padded with noisy silence and a long pause."""
+    from stt_stub import STUB_SAMPLE_RATE, ToneSpeechBackend
+    backend = ToneSpeechBackend()
+    text = "I have not been sleeping well. Work has been really hard lately. Thank you for listening."
+    rate = STUB_SAMPLE_RATE
+    speech = backend.render(text, rate)
+    silence = np.zeros(2 * rate, dtype=np.float32)
+    noisy = np.concatenate((silence, speech[:len(speech) // 2], silence, speech[len(speech) // 2:], silence, silence))
+    noisy += np.random.default_rng(0).normal(0, 0.001, len(noisy)).astype(np.float32)
+    kept, report = apply_vad(noisy, rate)
+    original, trimmed = backend.transcribe(write_wav(noisy, rate)), backend.transcribe(write_wav(kept, rate))
+    print(f"stub: removed {report.removed:.2f} of {report.original:.2f} s; "
+          f"transcripts {'match' if original == trimmed == text else 'DIFFER'}")
+    if not original == trimmed == text:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", nargs="?", default="final.wav")
+    parser.add_argument("--no-compress", action="store_true", help="only trim the ends, keep pauses")
+    args = parser.parse_args()
+
+    with open(args.file, "rb") as f:
+        samples, sample_rate = read_wav(f.read())
+    kept, report = apply_vad(samples, sample_rate, compress_pauses=not args.no_compress)
+    for key, value in report.to_dict().items():
+        print(f"{key:>22}: {value}")
+    print(f"{'upload bytes':>22}: {len(write_wav(samples, sample_rate))} -> {len(write_wav(kept, sample_rate))}")
+
+    # The endpoint detector on the same file, fed in 100 ms chunks as a microphone would.
+    detector = EndpointDetector(sample_rate)
+    chunk = sample_rate // 10
+    ended_at = next((i + chunk for i in range(0, len(samples), chunk) if detector.feed(samples[i:i + chunk])), None)
+    print(f"{'endpoint at':>22}: {ended_at / sample_rate:.2f} s" if ended_at else f"{'endpoint at':>22}: none")
+
+    if not os.environ.get("GROQ_API_KEY"):
+        print("\nGROQ_API_KEY not set; checking transcript equivalence offline with stt_stub instead.")
+        _offline_check()
+        return
+    from segmented_transcription import GroqSpeechBackend
+    backend = GroqSpeechBackend()
+    original = backend.transcribe(write_wav(samples, sample_rate))
+    trimmed = backend.transcribe(pcm16_to_wav((np.clip(kept, -1, 1) * 32767).astype("<i2"), sample_rate))
+    print(f"\noriginal: {original.strip()}\ntrimmed:  {trimmed.strip()}")
+    if _words(original) != _words(trimmed):
+        print("Transcripts differ.")
+        sys.exit(1)
+    print("Transcripts match (ignoring case and punctuation).")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,57 @@ load_dotenv()
 
 
 import logging
+import os
+import time
+import wave
+import numpy as np
 import speech_recognition as sr
-from pydub import AudioSegment
 from io import BytesIO
 
+from audio_processing import read_wav, write_wav
+from vad import VAD_MAX_UTTERANCE_MS, EndpointDetector, apply_vad
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def capture_audio(timeout=20, phrase_time_limit=None, sample_rate=16000, trim=True):
+    """
+    Records one utterance from the microphone and returns (pcm, sample_rate):
+    16-bit mono PCM bytes, ready for get_transcriber().transcribe_pcm().
+    Nothing is encoded or written to disk. 16 kHz is the rate Whisper works
+    at, so recording at it also shrinks the upload.
+
+    The utterance ends when vad.EndpointDetector hears VAD_END_SILENCE_MS of
+    silence after speech (or after phrase_time_limit seconds). With trim, the
+    silence around the speech and long pauses are cut before returning.
+    """
+    max_utterance_ms = phrase_time_limit * 1000 if phrase_time_limit else VAD_MAX_UTTERANCE_MS
+    detector = EndpointDetector(sample_rate, max_utterance_ms=max_utterance_ms)
+    chunks = []
+    with sr.Microphone(sample_rate=sample_rate) as source:
+        logging.info("Start speaking now...")
+        started = time.monotonic()
+        while True:
+            chunk = source.stream.read(source.CHUNK)
+            chunks.append(chunk)
+            if detector.feed(np.frombuffer(chunk, dtype="<i2")):
+                break
+            if not detector.speech_started and time.monotonic() - started > timeout:
+                raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+    logging.info("Recording complete.")
+    samples = np.frombuffer(b"".join(chunks), dtype="<i2")
+    if trim:
+        samples, report = apply_vad(samples, sample_rate)
+        logging.info(f"Voice activity detection: {report.to_dict()}")
+    return samples.tobytes(), sample_rate
+
 def record_audio(file_path, timeout=20, phrase_time_limit=None):
     """
-    Simplified function to record audio from the microphone and save it as an MP3 file.
+    Simplified function to record audio from the microphone and save it to a file.
 
     Args:
-    file_path (str): Path to save the recorded audio file.
+    file_path (str): Path to save the recorded audio file. .flac and .wav are
+        written straight from the recogniser; anything else (e.g. .mp3) is
+        encoded with pydub.
     timeout (int): Maximum time to wait for a phrase to start (in seconds).
     phrase_time_lfimit (int): Maximum time for the phrase to be recorded (in seconds).
     """
@@ -30,33 +69,64 @@ def record_audio(file_path, timeout=20, phrase_time_limit=None):
             audio_data = recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
             logging.info("Recording complete.")
             
-            # Convert the recorded audio to an MP3 file
-            wav_data = audio_data.get_wav_data()
-            audio_segment = AudioSegment.from_wav(BytesIO(wav_data))
-            audio_segment.export(file_path, format="mp3", bitrate="128k")
+            extension = os.path.splitext(file_path)[1].lower()
+            if extension in (".flac", ".wav"):
+                with open(file_path, "wb") as f:
+                    f.write(audio_data.get_flac_data() if extension == ".flac" else audio_data.get_wav_data())
+            else:
+                from pydub import AudioSegment
+                audio_segment = AudioSegment.from_wav(BytesIO(audio_data.get_wav_data()))
+                audio_segment.export(file_path, format=extension.lstrip(".") or "mp3", bitrate="128k")
             
             logging.info(f"Audio saved to {file_path}")
 
     except Exception as e:
         logging.error(f"An error occurred: {e}")
 
-audio_filepath="patient_voice_test_for_patient.mp3"
+audio_filepath="patient_voice_test_for_patient.flac"
 
 #Step2: Setup Speech to text–STT–model for transcription
-import os
 from groq import Groq
 
 GROQ_API_KEY=os.environ.get("GROQ_API_KEY")
 stt_model="whisper-large-v3"
 
-def transcribe_with_groq(stt_model, audio_filepath, GROQ_API_KEY):
+def transcribe_with_groq(stt_model, audio_filepath, GROQ_API_KEY, trim_silence=True):
+    """
+    Transcribes the whole file in one request. For long recordings use
+    segmented_transcription.get_transcriber().transcribe_file(), which splits
+    at pauses and transcribes the segments in parallel.
+
+    With trim_silence, WAV files have the silence around the speech and long
+    pauses cut in memory (vad.apply_vad) before upload. WAVs that can't be
+    decoded here (anything but 16-bit PCM) are uploaded as they are.
+    """
     client=Groq(api_key=GROQ_API_KEY)
     
-    audio_file=open(audio_filepath, "rb")
-    transcription=client.audio.transcriptions.create(
-        model=stt_model,
-        file=audio_file,
-        language="en"
-    )
+    samples = None
+    if trim_silence and audio_filepath.lower().endswith(".wav"):
+        with open(audio_filepath, "rb") as f:
+            data = f.read()
+        try:
+            samples, sample_rate = read_wav(data)
+        except (wave.Error, EOFError, ValueError) as e:
+            logging.info(f"Not trimming silence from {audio_filepath}: {e}")
+    if samples is not None:
+        samples, report = apply_vad(samples, sample_rate)
+        logging.info(f"Voice activity detection: {report.to_dict()}")
+        if not len(samples):
+            return ""
+        transcription=client.audio.transcriptions.create(
+            model=stt_model,
+            file=("audio.wav", write_wav(samples, sample_rate)),
+            language="en"
+        )
+    else:
+        with open(audio_filepath, "rb") as audio_file:
+            transcription=client.audio.transcriptions.create(
+                model=stt_model,
+                file=audio_file,
+                language="en"
+            )
 
     return transcription.text
\ No newline at end of file
@@ -0,0 +1,321 @@
+"""
+Full-duplex voice conversations over a WebSocket (/voice/ws in app.py).
+
+The client streams microphone audio as binary messages of 16-bit mono PCM
+at the sample rate it asked for (?sample_rate=, default VOICE_SAMPLE_RATE)
+and receives JSON events, with each sentence's audio as a binary message:
+
+    {"type": "ready", "sample_rate": ..., "mimetype": ...}
+    {"type": "partial", "turn": n, "text": ...}      - transcript so far, at each pause
+    {"type": "final", "turn": n, "text": ..., "timings": ...}
+    {"type": "meta", "turn": n, ...}                 - mood report and risk scores
+    {"type": "audio", "turn": n, "index": i, "text": sentence, "mimetype": ..., "bytes": size}
+                                                     - followed by one binary message of that size
+    {"type": "done", "turn": n, "doctor_response": ..., "timings": ...}
+    {"type": "stop", "turn": n, "reason": "barge_in" | "cancel"}
+                                                     - stop playing turn n at once
+    {"type": "error", "turn": n, "error": ...}
+
+The client may send {"type": "end"} to end the utterance at once (push to
+talk), {"type": "cancel"} to stop the reply, and {"type": "played", "turn": n}
+once it has finished playing a reply.
+
+Utterances are endpointed with vad.EndpointDetector. Each time the speaker
+pauses for VOICE_PAUSE_MS, the audio since the last pause is transcribed in
+the background, so the transcript is normally complete by the time the
+end-of-utterance silence has passed and the reply starts straight away.
+Speech of VOICE_BARGE_IN_MS while a reply is being generated or played
+cancels it (barge-in); if none of it had been sent yet, the interrupted
+utterance is carried into the next one. Clients must capture with echo
+cancellation (getUserMedia's echoCancellation), or the avatar's own voice
+barges in.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from segmented_transcription import get_transcriber
+from vad import EndpointDetector, apply_vad
+
+logger = logging.getLogger(__name__)
+
+VOICE_SAMPLE_RATE = int(os.environ.get("VOICE_SAMPLE_RATE", "16000"))
+# Shorter than VAD_END_SILENCE_MS: in conversation a reply that starts too
+# early can simply be barged into. Still longer than most pauses between
+# sentences.
+VOICE_END_SILENCE_MS = float(os.environ.get("VOICE_END_SILENCE_MS", "600"))
+# A pause this long sends the audio before it for transcription.
+VOICE_PAUSE_MS = float(os.environ.get("VOICE_PAUSE_MS", "250"))
+# Speech needed to interrupt a reply; shorter utterances during a reply are
+# treated as noise (coughs, "mm-hm") and dropped.
+VOICE_BARGE_IN_MS = float(os.environ.get("VOICE_BARGE_IN_MS", "200"))
+# Audio kept from before speech is detected, so the first syllable isn't clipped.
+VOICE_PREROLL_MS = float(os.environ.get("VOICE_PREROLL_MS", "300"))
+VOICE_STT_WORKERS = int(os.environ.get("VOICE_STT_WORKERS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=VOICE_STT_WORKERS, thread_name_prefix="voice-stt")
+
+_stats_lock = threading.Lock()
+_counts = {"sessions": 0, "active_sessions": 0, "turns": 0, "barge_ins": 0, "dropped_utterances": 0, "stt_chunks": 0}
+_latencies = deque(maxlen=500)
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _counts[name] += n
+
+
+def voice_stats():
+    """Session and turn counters, and the response latency (last speech to first audio) over recent turns."""
+    with _stats_lock:
+        stats = dict(_counts)
+        latencies = list(_latencies)
+    if latencies:
+        stats["response_latency_ms"] = {
+            "p50": round(float(np.percentile(latencies, 50)), 1),
+            "p90": round(float(np.percentile(latencies, 90)), 1),
+            "turns": len(latencies),
+        }
+    return stats
+
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+class Reply:
+    """One utterance's transcript and the reply to it, generated on its own thread."""
+
+    def __init__(self, turn, chunks, previous, timings):
+        self.turn = turn
+        self.chunks = chunks
+        self.previous = previous
+        self.timings = timings
+        self.cancel = threading.Event()
+        self.barged_in = False
+        self.generating = True
+        self.text = ""
+        self.audio_sent = 0
+        self.thread = None
+
+
+class VoiceSession:
+    """
+    The state of one voice connection. handle() is called with every message
+    from the client on the receiving thread; replies run on their own
+    threads and everything is sent through send (str for JSON, bytes for
+    audio) under one lock.
+
+    respond(text, cancel) produces a reply as the events of app.speak_turn:
+    dicts with a "type", where "audio" events carry the audio bytes.
+    """
+
+    def __init__(self, send, respond, transcriber=None, sample_rate=VOICE_SAMPLE_RATE, mimetype=None,
+                 end_silence_ms=VOICE_END_SILENCE_MS, pause_ms=VOICE_PAUSE_MS, barge_in_ms=VOICE_BARGE_IN_MS):
+        self._send = send
+        self.respond = respond
+        self.transcriber = transcriber or get_transcriber()
+        self.sample_rate = sample_rate
+        self.mimetype = mimetype
+        self.pause_ms = pause_ms
+        self.barge_in_ms = barge_in_ms
+        self.detector = EndpointDetector(sample_rate, end_silence_ms=end_silence_ms)
+        self._preroll = int(sample_rate * VOICE_PREROLL_MS / 1000)
+        self._send_lock = threading.Lock()
+        # 16-bit PCM of the current utterance, and how much of it has been sent for transcription.
+        self._audio = bytearray()
+        self._cut = 0
+        self._chunks = []
+        self._turn = 0
+        # The reply that speech would barge into: generating, or sent and not yet reported played.
+        self._reply = None
+        self._last = None
+        self.closed = False
+
+    def start(self):
+        _count("sessions")
+        _count("active_sessions")
+        self._emit({"type": "ready", "sample_rate": self.sample_rate, "mimetype": self.mimetype})
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        _count("active_sessions", -1)
+        if self._reply is not None:
+            self._reply.cancel.set()
+
+    def handle(self, message):
+        if isinstance(message, str):
+            self._control(json.loads(message))
+        else:
+            self.feed(message)
+
+    def _control(self, event):
+        kind = event.get("type")
+        if kind == "end":
+            if self.detector.speech_started:
+                self._end_utterance()
+        elif kind == "cancel":
+            if self._reply is not None:
+                self._stop("cancel")
+        elif kind == "played":
+            if self._reply is not None and self._reply.turn == event.get("turn") and not self._reply.generating:
+                self._reply = None
+        else:
+            self._emit({"type": "error", "error": f"Unknown message type: {kind}"})
+
+    def feed(self, data):
+        """Takes a frame of captured PCM; endpoints, transcribes at pauses and barges in as speech comes."""
+        self._audio += data
+        ended = self.detector.feed(np.frombuffer(data, dtype="<i2"))
+        detector = self.detector
+        if not detector.speech_started:
+            if ended:
+                # VAD_MAX_UTTERANCE_MS of silence; keep listening.
+                detector.reset(keep_floor=True)
+            excess = len(self._audio) // 2 - self._preroll
+            if excess > 0:
+                del self._audio[:2 * excess]
+            return
+        if self._reply is not None and detector.speech_ms >= self.barge_in_ms:
+            self._stop("barge_in")
+        if ended:
+            self._end_utterance()
+            return
+        total = len(self._audio) // 2
+        pause_start = total - int(self.sample_rate * detector.silence_ms / 1000)
+        if detector.silence_ms >= self.pause_ms and self._cut < pause_start:
+            self._transcribe_until(total)
+
+    def _transcribe_until(self, end):
+        """Sends the audio from the last cut to end for transcription."""
+        chunks, turn = self._chunks, self._turn + 1
+        future = _executor.submit(self._transcribe_chunk, bytes(self._audio[2 * self._cut:2 * end]))
+        chunks.append(future)
+        future.add_done_callback(lambda done: self._send_partial(turn, chunks, done))
+        self._cut = end
+        _count("stt_chunks")
+
+    def _transcribe_chunk(self, pcm):
+        kept, _ = apply_vad(np.frombuffer(pcm, dtype="<i2"), self.sample_rate)
+        if not len(kept):
+            return ""
+        return self.transcriber.transcribe(kept, self.sample_rate).text
+
+    def _send_partial(self, turn, chunks, done):
+        if done.exception() is not None or not done.result():
+            return
+        texts = []
+        for future in list(chunks):
+            if not future.done() or future.exception() is not None:
+                break
+            texts.append(future.result())
+        text = " ".join(t for t in texts if t)
+        if text:
+            self._emit({"type": "partial", "turn": turn, "text": text})
+
+    def _end_utterance(self):
+        detector = self.detector
+        timings = {"end_silence": detector.silence_ms, "speech_ms": detector.speech_ms}
+        ended_at = time.perf_counter()
+        if self._reply is not None and detector.speech_ms < self.barge_in_ms:
+            _count("dropped_utterances")
+            chunks = None
+        else:
+            total = len(self._audio) // 2
+            if self._cut < total:
+                self._transcribe_until(total)
+            chunks = self._chunks
+        self._audio = bytearray()
+        self._cut = 0
+        self._chunks = []
+        detector.reset(keep_floor=True)
+        if chunks is None:
+            return
+        if self._reply is not None:
+            self._stop("barge_in")
+
+        self._turn += 1
+        reply = Reply(self._turn, chunks, self._last, timings)
+        reply.thread = threading.Thread(target=self._run_reply, args=(reply, ended_at),
+                                        name=f"voice-reply-{reply.turn}", daemon=True)
+        self._reply = self._last = reply
+        reply.thread.start()
+
+    def _stop(self, reason):
+        reply, self._reply = self._reply, None
+        with self._send_lock:
+            reply.cancel.set()
+            reply.barged_in = reason == "barge_in"
+        if reason == "barge_in":
+            _count("barge_ins")
+        self._emit({"type": "stop", "turn": reply.turn, "reason": reason})
+
+    def _run_reply(self, reply, ended_at):
+        timings = reply.timings
+        try:
+            previous = reply.previous
+            texts = []
+            if previous is not None:
+                # Conversation state is committed in order, so the interrupted turn finishes first.
+                previous.thread.join()
+                if previous.barged_in and previous.audio_sent == 0:
+                    texts.append(previous.text)
+            texts += [future.result() for future in reply.chunks]
+            reply.text = " ".join(t for t in texts if t)
+            timings["stt_wait"] = _ms(ended_at)
+            self._emit({"type": "final", "turn": reply.turn, "text": reply.text, "timings": dict(timings)}, reply)
+            if not reply.text or reply.cancel.is_set():
+                return
+            _count("turns")
+
+            speak_start = time.perf_counter()
+            for event in self.respond(reply.text, reply.cancel):
+                if event["type"] == "audio":
+                    self._send_audio(reply, event, ended_at, speak_start)
+                elif event["type"] == "done":
+                    self._emit({**event, "turn": reply.turn, "timings": {**event.get("timings", {}), **timings}}, reply)
+                else:
+                    self._emit({**event, "turn": reply.turn}, reply)
+        except Exception as e:
+            logger.exception(f"Voice turn {reply.turn} failed")
+            self._emit({"type": "error", "turn": reply.turn, "error": str(e) or type(e).__name__}, reply)
+        finally:
+            reply.generating = False
+
+    def _send_audio(self, reply, event, ended_at, speak_start):
+        audio = event["audio"]
+        header = {key: value for key, value in event.items() if key != "audio"}
+        header.update(turn=reply.turn, bytes=len(audio))
+        with self._send_lock:
+            # Checked under the lock, so nothing of a stopped turn follows its "stop".
+            if reply.cancel.is_set() or self.closed:
+                return
+            if reply.audio_sent == 0:
+                timings = reply.timings
+                timings["first_audio"] = _ms(ended_at)
+                timings["llm_tts_first_audio"] = _ms(speak_start)
+                # What the patient perceives: from their last word to the avatar's first.
+                timings["response_latency"] = round(timings["end_silence"] + timings["first_audio"], 1)
+                with _stats_lock:
+                    _latencies.append(timings["response_latency"])
+            self._send(json.dumps(header))
+            self._send(audio)
+            reply.audio_sent += 1
+
+    def _emit(self, event, reply=None):
+        with self._send_lock:
+            if self.closed or (reply is not None and reply.cancel.is_set() and event["type"] != "final"):
+                return
+            try:
+                self._send(json.dumps(event))
+            except Exception as e:
+                # The client went away; the receiving thread will see the close.
+                logger.info(f"Voice event not sent: {e}")
@@ -1,5 +1,4 @@
 from flask import Flask, render_template, request, jsonify
-import requests
 import json
 import os
 import logging
@@ -7,6 +6,8 @@ import traceback
 import re
 from dotenv import load_dotenv
 from datetime import datetime
+
+from shared.llm_gateway import get_gateway, LLMGatewayError
 # Add this at the beginning with other imports
 from therapist_routes import register_therapist_routes
 from flask_cors import CORS
@@ -25,8 +26,7 @@ CORS(app)
 # Register therapist routes
 register_therapist_routes(app)
 
-# Configure Groq API
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+# Configure Groq API (requests go through the shared LLM gateway, see LLM_BASE_URL)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama3-8b-8192")  # Default to Llama 3 8B model
 
@@ -344,19 +344,8 @@ def analyze_text(text):
     }
     """
     
-    # Configure headers for the API request
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {GROQ_API_KEY}"
-    }
-    
     # Prepare the payload for Groq API
     payload = {
-        "model": model_config["model"],
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
         "temperature": model_config.get("temperature", 0.1),
         "max_tokens": model_config.get("max_tokens", 2000),
         "top_p": model_config.get("top_p", 0.95),
@@ -366,23 +355,19 @@ def analyze_text(text):
     }
     
     try:
-        # Make the API request to Groq
+        # Make the API request to Groq (the "analysis" call type has an extended timeout)
         app.logger.info(f"Sending request to Groq API")
-        response = requests.post(
-            GROQ_API_URL,
-            headers=headers,
-            json=payload,
-            timeout=90  # Extended timeout for more complex analysis
+        result = get_gateway().chat_completion(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            model_config["model"],
+            call_type="analysis",
+            **payload
         )
         
-        # Check for successful response
-        if response.status_code != 200:
-            error_msg = f"API request failed with status code {response.status_code}: {response.text}"
-            app.logger.error(error_msg)
-            raise Exception(error_msg)
-        
         # Parse the response
-        result = response.json()
         content = result["choices"][0]["message"]["content"]
         
         # Try to parse the response as JSON
@@ -529,10 +514,15 @@ def analyze_text(text):
             }
         }
         
-    except requests.RequestException as e:
-        error_msg = f"Network error contacting Groq API: {str(e)}"
+    except LLMGatewayError as e:
+        # Raised for network errors, and for error statuses once retries are used up
+        error_msg = f"Error contacting Groq API: {str(e)}"
         app.logger.error(error_msg)
         raise Exception(error_msg)
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({'llm': get_gateway().metrics()})
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
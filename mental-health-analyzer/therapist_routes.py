@@ -6,9 +6,10 @@ import traceback
 import logging
 from datetime import datetime
 from flask import render_template, request, jsonify
-import requests
 from text_processing import preprocess_text
 
+from shared.llm_gateway import get_gateway
+
 # Define DSM-5 Level 2 assessment tools mapping
 DSM5_LEVEL2_TOOLS = {
     "Depression": {
@@ -433,7 +434,6 @@ def analyze_session_with_groq(session_content, domain, tool, app):
     if not api_key:
         raise Exception("Groq API key is missing. Please set the GROQ_API_KEY environment variable.")
     
-    api_url = "https://api.groq.com/openai/v1/chat/completions"
     model = os.environ.get("GROQ_MODEL", "llama3-8b-8192")
     
     # Create system prompt
@@ -487,42 +487,23 @@ def analyze_session_with_groq(session_content, domain, tool, app):
     If no evidence is found for a question, use "No specific evidence found in the session." as the evidence string.
     """
     
-    # Configure headers for the API request
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
-    # Prepare the payload for Groq API
-    payload = {
-        "model": model,
-        "messages": [
+    # Make the API request through the shared gateway (pooled connection, retries on 429/5xx)
+    result = get_gateway().chat_completion(
+        [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ],
-        "temperature": 0.1,
-        "max_tokens": 2000,
-        "top_p": 0.95,
-        "response_format": {"type": "json_object"}
-    }
-    
-    # Make the API request
-    response = requests.post(
-        api_url,
-        headers=headers,
-        json=payload,
-        timeout=90
+        model,
+        call_type="session_analysis",
+        temperature=0.1,
+        max_tokens=2000,
+        top_p=0.95,
+        response_format={"type": "json_object"}
     )
     
     # Log API response
-    app.logger.info(f"Received response from Groq API with status: {response.status_code}")
-    
-    # Check for successful response
-    if response.status_code != 200:
-        raise Exception(f"API request failed with status code {response.status_code}: {response.text}")
+    app.logger.info(f"Received response from Groq API ({result.get('usage', {}).get('total_tokens', '?')} tokens)")
     
-    # Parse the response
-    result = response.json()
     content = result["choices"][0]["message"]["content"]
     
     # Log parsed content
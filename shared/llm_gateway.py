@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Any OpenAI-compatible endpoint works; point this at shared/llm_stub.py to run offline.
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+LLM_POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", "16"))
+LLM_BACKOFF_BASE_SECONDS = float(os.environ.get("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.environ.get("LLM_BACKOFF_MAX_SECONDS", "8"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("LLM_CONNECT_TIMEOUT_SECONDS", "3.05"))
+
+# Read timeout per call type: chat replies are short and interactive, the
+# DSM-5 analyses ask for up to 2000 tokens of JSON.
+CALL_TIMEOUTS = {
+    "chat": float(os.environ.get("LLM_CHAT_TIMEOUT_SECONDS", "30")),
+    "analysis": float(os.environ.get("LLM_ANALYSIS_TIMEOUT_SECONDS", "90")),
+    "session_analysis": float(os.environ.get("LLM_SESSION_ANALYSIS_TIMEOUT_SECONDS", "90")),
+}
+DEFAULT_TIMEOUT_SECONDS = 60.0
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+LATENCY_SAMPLES = 1000
+
+
+class LLMGatewayError(Exception):
+    """Raised when a completion fails for good (non-retryable status or retries used up)."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _CallStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        # Time to first token of streamed calls.
+        self.ttfts = deque(maxlen=LATENCY_SAMPLES)
+
+    def summary(self):
+        def percentile(samples, p):
+            samples = sorted(samples)
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 1) if samples else None
+
+        summary = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_p50_ms": percentile(self.latencies, 0.5),
+            "latency_p95_ms": percentile(self.latencies, 0.95),
+        }
+        if self.ttfts:
+            summary["ttft_p50_ms"] = percentile(self.ttfts, 0.5)
+            summary["ttft_p95_ms"] = percentile(self.ttfts, 0.95)
+        return summary
+
+
+class LLMGateway:
+    """
+    One long-lived client for every LLM call a process makes.
+
+    Requests go through a single requests.Session, so TCP/TLS connections to
+    the provider are kept alive and pooled (up to pool_size per host) instead
+    of being set up again for every completion. Each call names its call type,
+    which picks the read timeout and the bucket its metrics are recorded in.
+    Connection errors, timeouts, 429 and 5xx responses are retried with full
+    jitter exponential backoff, waiting at least as long as a Retry-After
+    header asks for.
+    """
+
+    def __init__(self, base_url=LLM_BASE_URL, api_key=None, max_retries=LLM_MAX_RETRIES,
+                 pool_size=LLM_POOL_SIZE, backoff_base=LLM_BACKOFF_BASE_SECONDS,
+                 backoff_max=LLM_BACKOFF_MAX_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        # Retries are handled here so they can honour Retry-After and be counted.
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        api_key = api_key or os.environ.get("LLM_API_KEY") or os.environ.get("GROQ_API_KEY")
+        self.session.headers["Content-Type"] = "application/json"
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _timeout(self, call_type):
+        return (LLM_CONNECT_TIMEOUT_SECONDS, CALL_TIMEOUTS.get(call_type, DEFAULT_TIMEOUT_SECONDS))
+
+    def _backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+            except ValueError:
+                pass
+        return delay
+
+    def _record(self, call_type, **changes):
+        with self._lock:
+            stats = self._stats.setdefault(call_type, _CallStats())
+            for name, value in changes.items():
+                if name == "latency":
+                    stats.latencies.append(value)
+                elif name == "ttft":
+                    if value is not None:
+                        stats.ttfts.append(value)
+                else:
+                    setattr(stats, name, getattr(stats, name) + value)
+
+    def _post(self, call_type, payload, stream=False):
+        """POSTs a chat completion request, retrying transient failures. Returns the response."""
+        url = f"{self.base_url}/chat/completions"
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            try:
+                response = self.session.post(url, json=payload, timeout=self._timeout(call_type), stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last:
+                    self._record(call_type, errors=1)
+                    raise LLMGatewayError(f"Network error contacting LLM API: {e}") from e
+                delay = self._backoff(attempt)
+                logger.warning(f"LLM {call_type} call failed ({e}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code == 200:
+                    return response
+                if response.status_code not in RETRY_STATUS_CODES or last:
+                    self._record(call_type, errors=1)
+                    raise LLMGatewayError(
+                        f"API request failed with status code {response.status_code}: {response.text}",
+                        status_code=response.status_code,
+                    )
+                delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                logger.warning(f"LLM {call_type} call got {response.status_code}, retrying in {delay:.2f}s")
+                response.close()
+            self._record(call_type, retries=1)
+            time.sleep(delay)
+
+    def chat_completion(self, messages, model, call_type="chat", **params):
+        """Returns the full completion response (parsed JSON) for messages."""
+        payload = {"model": model, "messages": messages, **params}
+        start = time.perf_counter()
+        result = self._post(call_type, payload).json()
+        usage = result.get("usage") or {}
+        self._record(
+            call_type,
+            calls=1,
+            latency=time.perf_counter() - start,
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+        )
+        return result
+
+    def chat(self, messages, model, call_type="chat", **params):
+        """Returns just the text of the first choice."""
+        result = self.chat_completion(messages, model, call_type=call_type, **params)
+        return result["choices"][0]["message"]["content"]
+
+    def stream_chat(self, messages, model, call_type="chat", **params):
+        """
+        Yields the reply text in pieces as the provider streams them.
+
+        Retries only happen before the stream starts. Closing the generator
+        early closes the connection and records nothing.
+        """
+        payload = {"model": model, "messages": messages, "stream": True, **params}
+        start = time.perf_counter()
+        response = self._post(call_type, payload, stream=True)
+        first_token = None
+        usage = {}
+        try:
+            for raw in response.iter_lines():
+                line = raw.decode("utf-8")
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                # OpenAI sends usage on the last chunk, Groq under x_groq.
+                usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or usage
+                for choice in chunk.get("choices", []):
+                    text = (choice.get("delta") or {}).get("content")
+                    if text:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        yield text
+        except (requests.RequestException, ValueError) as e:
+            self._record(call_type, errors=1)
+            raise LLMGatewayError(f"LLM stream interrupted: {e}") from e
+        finally:
+            response.close()
+        self._record(
+            call_type,
+            calls=1,
+            latency=time.perf_counter() - start,
+            ttft=first_token,
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+        )
+
+    def metrics(self):
+        with self._lock:
+            per_type = {call_type: stats.summary() for call_type, stats in self._stats.items()}
+        return {"base_url": self.base_url, "calls": per_type}
+
+    def close(self):
+        self.session.close()
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Returns the process-wide gateway, creating it on first use."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
@@ -0,0 +1,172 @@
+"""
+Local OpenAI-compatible chat completions server for running without a provider.
+
+    python -m shared.llm_stub --port 8001 --latency-ms 150 --token-ms 20 --fail-rate 0.1
+    LLM_BASE_URL=http://127.0.0.1:8001/v1 python app.py
+
+POST /v1/chat/completions (or /openai/v1/chat/completions) returns a canned
+reply with a usage block. Requests asking for a JSON object get "{}" back,
+which the analyzers treat as "no evidence found". With "stream": true the
+reply is sent as Server-Sent Events, one word per chunk every --token-ms
+after the --latency-ms first-token delay; without it the whole reply is
+sent once the same generation time has passed. --fail-rate answers that
+share of requests with 429 or 503 (with a Retry-After header) to exercise the
+gateway's retries.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def _count_tokens(text):
+    return len(_WORD_RE.findall(text))
+
+
+def _reply_text(payload):
+    if (payload.get("response_format") or {}).get("type") == "json_object":
+        return "{}"
+    messages = payload.get("messages", [])
+    last_user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    return f"I hear you. You said: {last_user[:200]}. Can you tell me more about how that feels?"
+
+
+def _usage(payload, content):
+    prompt_tokens = sum(_count_tokens(str(m.get("content", ""))) + 4 for m in payload.get("messages", []))
+    completion_tokens = _count_tokens(content)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def make_completion(payload):
+    """Builds an OpenAI-style completion response for a request payload."""
+    content = _reply_text(payload)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": _usage(payload, content),
+    }
+
+
+def make_stream_chunks(payload):
+    """Yields OpenAI-style chat.completion.chunk dicts, one per word, usage on the last."""
+    content = _reply_text(payload)
+    base = {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": payload.get("model", "stub"),
+    }
+    yield {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}
+    for piece in re.findall(r"\S+\s*", content):
+        yield {**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+    yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": _usage(payload, content)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests.
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without this, delayed ACKs add ~40 ms per response.
+    disable_nagle_algorithm = True
+    latency = 0.0
+    token_delay = 0.0
+    fail_rate = 0.0
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, payload):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, chunk in enumerate(make_stream_chunks(payload)):
+                if i > 1:
+                    time.sleep(self.token_delay)
+                data = f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            done = b"data: [DONE]\n\n"
+            self.wfile.write(f"{len(done):x}\r\n".encode("ascii") + done + b"\r\n0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading (e.g. the user navigated away).
+            self.close_connection = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "invalid JSON body"}})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        if random.random() < self.fail_rate:
+            status = random.choice([429, 503])
+            self._send_json(status, {"error": {"message": "stub injected failure"}}, {"Retry-After": "0.1"})
+            return
+        time.sleep(self.latency)
+        if payload.get("stream"):
+            self._send_stream(payload)
+        else:
+            completion = make_completion(payload)
+            # Same generation time as streaming, just delivered at the end.
+            time.sleep(self.token_delay * max(0, len(re.findall(r"\S+\s*", completion["choices"][0]["message"]["content"])) - 1))
+            self._send_json(200, completion)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=8001, latency_ms=0.0, fail_rate=0.0, token_ms=0.0):
+    """Starts the stub on a background thread and returns the server (port=0 picks a free port)."""
+    handler = type("Handler", (StubHandler,), {
+        "latency": latency_ms / 1000.0,
+        "token_delay": token_ms / 1000.0,
+        "fail_rate": fail_rate,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--token-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.latency_ms, args.fail_rate, args.token_ms)
+    print(f"LLM stub listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
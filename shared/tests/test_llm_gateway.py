@@ -0,0 +1,81 @@
+import pytest
+
+from shared.llm_gateway import LLMGateway, LLMGatewayError
+from shared.llm_stub import serve
+
+MESSAGES = [{"role": "system", "content": "Be kind."}, {"role": "user", "content": "I feel low"}]
+
+
+def start_stub(**options):
+    server = serve(port=0, **options)
+    gateway = LLMGateway(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="stub",
+                         max_retries=2, backoff_base=0.01, backoff_max=0.01)
+    return server, gateway
+
+
+@pytest.fixture
+def stub():
+    server, gateway = start_stub()
+    yield gateway
+    gateway.close()
+    server.shutdown()
+
+
+def test_chat_returns_the_reply_and_records_usage(stub):
+    reply = stub.chat(MESSAGES, "stub-model")
+    assert reply.startswith("I hear you. You said: I feel low.")
+    stats = stub.metrics()["calls"]["chat"]
+    assert stats["calls"] == 1
+    assert stats["errors"] == 0
+    assert stats["prompt_tokens"] > 0
+    assert stats["completion_tokens"] > 0
+    assert stats["latency_p50_ms"] is not None
+
+
+def test_stream_chat_yields_the_same_reply(stub):
+    pieces = list(stub.stream_chat(MESSAGES, "stub-model"))
+    assert len(pieces) > 1
+    assert "".join(pieces) == stub.chat(MESSAGES, "stub-model")
+    stats = stub.metrics()["calls"]["chat"]
+    assert stats["calls"] == 2
+    assert stats["ttft_p50_ms"] is not None
+
+
+def test_call_types_are_recorded_separately(stub):
+    stub.chat(MESSAGES, "stub-model", call_type="analysis", response_format={"type": "json_object"})
+    assert stub.chat(MESSAGES, "stub-model", call_type="analysis", response_format={"type": "json_object"}) == "{}"
+    assert set(stub.metrics()["calls"]) == {"analysis"}
+    assert stub.metrics()["calls"]["analysis"]["calls"] == 2
+
+
+def test_connections_are_reused(stub):
+    for _ in range(3):
+        stub.chat(MESSAGES, "stub-model")
+    pool = next(iter(stub.session.get_adapter("http://").poolmanager.pools._container.values()))
+    assert pool.num_connections == 1
+
+
+def test_failures_are_retried_then_raised():
+    server, gateway = start_stub(fail_rate=1.0)
+    try:
+        with pytest.raises(LLMGatewayError) as error:
+            gateway.chat(MESSAGES, "stub-model")
+        assert error.value.status_code in (429, 503)
+        stats = gateway.metrics()["calls"]["chat"]
+        assert (stats["retries"], stats["errors"], stats["calls"]) == (2, 1, 0)
+    finally:
+        gateway.close()
+        server.shutdown()
+
+
+def test_unreachable_provider_is_a_gateway_error():
+    server, gateway = start_stub()
+    server.shutdown()
+    server.server_close()
+    try:
+        with pytest.raises(LLMGatewayError, match="Network error"):
+            gateway.chat(MESSAGES, "stub-model")
+        assert gateway.metrics()["calls"]["chat"]["retries"] == 2
+    finally:
+        gateway.close()
+